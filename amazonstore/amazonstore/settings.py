@@ -90,14 +90,28 @@ from dotenv import load_dotenv
 
 load_dotenv()
 
+# DB_POOL=1 takes connections from a per-process pool (store/db_pool) with
+# health checks on checkout; by default Django keeps persistent connections
+DB_POOL = os.getenv('DB_POOL', '0') == '1'
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.postgresql',
+        'ENGINE': 'store.db_pool' if DB_POOL else 'django.db.backends.postgresql',
         'NAME': os.getenv('POSTGRES_DB'),
         'USER': os.getenv('POSTGRES_USER'),
         'PASSWORD': os.getenv('POSTGRES_PASSWORD'),
         'HOST': os.getenv('POSTGRES_HOST'),
         'PORT': os.getenv('POSTGRES_PORT'),
+        'CONN_MAX_AGE': 0 if DB_POOL else int(os.getenv('DB_CONN_MAX_AGE', 60)),
+        'CONN_HEALTH_CHECKS': True,
+        'POOL': {
+            'MIN_SIZE': int(os.getenv('DB_POOL_MIN_SIZE', 0)),
+            'MAX_SIZE': int(os.getenv('DB_POOL_MAX_SIZE', 4)),
+            'TIMEOUT': float(os.getenv('DB_POOL_TIMEOUT', 10)),
+            'MAX_LIFETIME': float(os.getenv('DB_POOL_MAX_LIFETIME', 1800)),
+            'MAX_IDLE': float(os.getenv('DB_POOL_MAX_IDLE', 300)),
+            'CHECK_AFTER': float(os.getenv('DB_POOL_CHECK_AFTER', 5)),
+        },
     }
 }
 
@@ -141,5 +155,12 @@ STATIC_URL = 'static/'
 STATICFILES_DIRS = [BASE_DIR / 'static']  # Для разработки
 STATIC_ROOT = BASE_DIR / 'staticfiles'  # Для production/collectstatic
 
+# Dashboard HTTP caching: responses carry an ETag derived from the store data
+# version, clients/proxies revalidate after this many seconds
+DASHBOARD_CACHE_MAX_AGE = int(os.getenv('DASHBOARD_CACHE_MAX_AGE', 0))
+
+# Pre-rendered dashboard pages, written by extract_from_csv / build_snapshots
+DASHBOARD_SNAPSHOT_ROOT = BASE_DIR / 'snapshots'
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
\ No newline at end of file
@@ -0,0 +1,52 @@
+"""
+Production profile for the web process: DJANGO_SETTINGS_MODULE=amazonstore.settings_production
+
+Only what the dashboard and the JSON API use is installed. The admin and the
+apps, middleware and Django template backend it needs are added back with
+DJANGO_ADMIN_ENABLED=1, e.g. for a separate back-office process.
+"""
+import os
+
+from .settings import *  # noqa: F401,F403
+
+
+DEBUG = os.getenv('DJANGO_DEBUG') == '1'
+
+SECRET_KEY = os.getenv('DJANGO_SECRET_KEY', SECRET_KEY)
+
+ALLOWED_HOSTS = [
+    host.strip() for host in os.getenv('DJANGO_ALLOWED_HOSTS', 'localhost').split(',') if host.strip()
+]
+
+ADMIN_ENABLED = os.getenv('DJANGO_ADMIN_ENABLED') == '1'
+
+ADMIN_APPS = [
+    "django.contrib.admin",
+    "django.contrib.auth",
+    "django.contrib.sessions",
+    "django.contrib.messages",
+]
+
+ADMIN_MIDDLEWARE = [
+    "django.contrib.sessions.middleware.SessionMiddleware",
+    "django.contrib.auth.middleware.AuthenticationMiddleware",
+    "django.contrib.messages.middleware.MessageMiddleware",
+]
+
+JINJA2_TEMPLATES = TEMPLATES[0]
+
+if ADMIN_ENABLED:
+    # the admin renders with DjangoTemplates from its app directories only
+    TEMPLATES = [JINJA2_TEMPLATES, {**TEMPLATES[1], 'DIRS': []}]
+else:
+    INSTALLED_APPS = [app for app in INSTALLED_APPS if app not in ADMIN_APPS]
+    MIDDLEWARE = [middleware for middleware in MIDDLEWARE if middleware not in ADMIN_MIDDLEWARE]
+    TEMPLATES = [JINJA2_TEMPLATES]
+    AUTH_PASSWORD_VALIDATORS = []
+
+# The dashboard isn't translated; skips loading Django's message catalogs
+USE_I18N = False
+
+# Warm templates, lookup caches and the DB backend in wsgi.py (see
+# store.preload) so a pre-forking server does it once, before forking
+PRELOAD_ON_STARTUP = os.getenv('DJANGO_PRELOAD', '1') == '1'
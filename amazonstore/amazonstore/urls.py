@@ -15,11 +15,25 @@ Including another URLconf
     2. Add a URL to urlpatterns:  path('blog/', include('blog.urls'))
 """
 
-from django.contrib import admin
+from django.apps import apps
 from django.urls import path
 from store import views
 
 urlpatterns = [
-    path("admin/", admin.site.urls),
     path('', views.index, name='index'),
+    path('api/typeahead/', views.typeahead, name='typeahead'),
+    path('api/unique-buyers/', views.unique_buyers, name='unique_buyers'),
+    path('api/timeseries/', views.sales_timeseries, name='sales_timeseries'),
+    path('api/orders/', views.orders_detail, name='orders_detail'),
+    path('api/products/<str:product_id>/sellers/', views.product_sellers, name='product_sellers'),
+    path('api/sellers/<str:seller_id>/catalog/', views.seller_catalog, name='seller_catalog'),
+    path('api/jobs/', views.job_list, name='job_list'),
+    path('api/jobs/<int:pk>/', views.job_detail, name='job_detail'),
+    path('api/db-pool/', views.db_pool, name='db_pool'),
 ]
+
+# The admin is optional (see settings_production); import it only when installed
+if apps.is_installed('django.contrib.admin'):
+    from django.contrib import admin
+
+    urlpatterns.insert(0, path("admin/", admin.site.urls))
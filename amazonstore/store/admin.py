@@ -1,19 +1,48 @@
 from django.contrib import admin
 from .models import (
-    Customer, Seller, Brand, Category, Product,
-    ProductSeller, Order, OrderItem
+    Location, Customer, Seller, Brand, Category, Product,
+    ProductSeller, Order, OrderItem, Job
 )
+from . import catalog
+from .paginators import EstimatedCountPaginator
+
+
+class ScalableModelAdmin(admin.ModelAdmin):
+    """
+    Changelist defaults for large tables: estimated counts, no second
+    full-table COUNT(*), and an only() projection of the listed columns.
+    """
+    paginator = EstimatedCountPaginator
+    show_full_result_count = False
+    list_only = None
+
+    def get_queryset(self, request):
+        queryset = super().get_queryset(request)
+        match = getattr(request, 'resolver_match', None)
+        if self.list_only and match and match.url_name.endswith('_changelist'):
+            queryset = queryset.only(*self.list_only)
+        return queryset
+
+
+@admin.register(Location)
+class LocationAdmin(ScalableModelAdmin):
+    list_display = ('id', 'City', 'State', 'Country')
+    search_fields = ('City', 'State', 'Country')
+    list_filter = ('Country',)
 
 
 @admin.register(Customer)
-class CustomerAdmin(admin.ModelAdmin):
-    list_display = ('CustomerID', 'CustomerName', 'City', 'Country')
+class CustomerAdmin(ScalableModelAdmin):
+    list_display = ('CustomerID', 'CustomerName', 'location')
     search_fields = ('CustomerName', 'CustomerID')
-    list_filter = ('Country', 'State')
+    list_filter = ('location__Country', 'location__State')
+    list_select_related = ('location',)
+    autocomplete_fields = ('location',)
+    ordering = ('CustomerID',)
 
 
 @admin.register(Seller)
-class SellerAdmin(admin.ModelAdmin):
+class SellerAdmin(ScalableModelAdmin):
     list_display = ('SellerID',)
     search_fields = ('SellerID',)
 
@@ -31,29 +60,68 @@ class CategoryAdmin(admin.ModelAdmin):
 
 
 @admin.register(Product)
-class ProductAdmin(admin.ModelAdmin):
+class ProductAdmin(ScalableModelAdmin):
     list_display = ('ProductID', 'ProductName', 'Brand', 'Category')
     search_fields = ('ProductName', 'ProductID')
     list_filter = ('Brand', 'Category')
+    list_select_related = ('Brand', 'Category')
+    autocomplete_fields = ('Brand', 'Category')
+    ordering = ('ProductID',)
 
 
 @admin.register(ProductSeller)
-class ProductSellerAdmin(admin.ModelAdmin):
+class ProductSellerAdmin(ScalableModelAdmin):
     list_display = ('product', 'seller', 'IsActive')
     list_filter = ('IsActive',)
     search_fields = ('product__ProductName', 'seller__SellerID')
+    list_select_related = ('product', 'seller')
+    list_only = ('id', 'IsActive', 'product__ProductID', 'product__ProductName', 'seller__SellerID')
+    autocomplete_fields = ('product', 'seller')
+    actions = ('activate_listings', 'deactivate_listings')
+
+    @admin.action(description='Activate selected listings')
+    def activate_listings(self, request, queryset):
+        changed = catalog.set_active(queryset, True)
+        self.message_user(request, f'{changed} listing(s) activated.')
+
+    @admin.action(description='Deactivate selected listings')
+    def deactivate_listings(self, request, queryset):
+        changed = catalog.set_active(queryset, False)
+        self.message_user(request, f'{changed} listing(s) deactivated.')
 
 
 @admin.register(Order)
-class OrderAdmin(admin.ModelAdmin):
-    list_display = ('OrderID', 'OrderDate', 'customer', 'OrderStatus', 'TotalAmount')
+class OrderAdmin(ScalableModelAdmin):
+    list_display = ('OrderID', 'OrderDate', 'customer', 'OrderStatus', 'item_count', 'TotalAmount')
+    readonly_fields = ('item_count', 'unit_count', 'items_total')
     list_filter = ('OrderStatus', 'PaymentMethod', 'OrderDate')
     search_fields = ('OrderID', 'customer__CustomerName')
     date_hierarchy = 'OrderDate'
+    list_select_related = ('customer',)
+    list_only = (
+        'OrderID', 'OrderDate', 'OrderStatus', 'item_count', 'TotalAmount',
+        'customer__CustomerID', 'customer__CustomerName',
+    )
+    autocomplete_fields = ('customer',)
 
 
 @admin.register(OrderItem)
-class OrderItemAdmin(admin.ModelAdmin):
+class OrderItemAdmin(ScalableModelAdmin):
     list_display = ('OrderItemID', 'order', 'product', 'Quantity', 'LineTotal')
     search_fields = ('order__OrderID', 'product__ProductName')
-    list_filter = ('product__Category',)
\ No newline at end of file
+    list_filter = ('product__Category',)
+    list_select_related = ('order', 'product')
+    list_only = (
+        'OrderItemID', 'Quantity', 'LineTotal',
+        'order__OrderID', 'order__OrderStatus',
+        'product__ProductID', 'product__ProductName',
+    )
+    autocomplete_fields = ('order', 'product', 'seller')
+    readonly_fields = ('OrderDate',)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+    list_display = ('id', 'JobType', 'Status', 'Progress', 'Attempts', 'LockedBy', 'CreatedAt', 'FinishedAt')
+    list_filter = ('Status', 'JobType')
+    readonly_fields = ('Attempts', 'Progress', 'ProgressMessage', 'Error', 'LockedBy', 'LockedAt', 'CreatedAt', 'FinishedAt')
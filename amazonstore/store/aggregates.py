@@ -0,0 +1,107 @@
+import threading
+from contextlib import contextmanager
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, DecimalField, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+from .models import Order, OrderItem
+
+
+_state = threading.local()
+
+
+def _items_subquery(expression, output_field):
+    return Subquery(
+        OrderItem.objects
+        # the OrderDate match keeps the lookup to one OrderItems partition
+        .filter(order=OuterRef('pk'), OrderDate=OuterRef('OrderDate'))
+        .order_by()
+        .values('order')
+        .annotate(value=expression)
+        .values('value'),
+        output_field=output_field,
+    )
+
+
+def aggregate_updates():
+    return {
+        'item_count': Coalesce(
+            _items_subquery(Count('OrderItemID'), IntegerField()), Value(0)
+        ),
+        'unit_count': Coalesce(
+            _items_subquery(Sum('Quantity'), IntegerField()), Value(0)
+        ),
+        'items_total': Coalesce(
+            _items_subquery(Sum('LineTotal'), DecimalField(max_digits=14, decimal_places=2)),
+            Value(Decimal('0.00')),
+            output_field=DecimalField(max_digits=14, decimal_places=2),
+        ),
+    }
+
+
+def refresh_orders(order_ids):
+    """Recompute item_count/unit_count/items_total for the given orders in one UPDATE."""
+    order_ids = list(order_ids)
+    if not order_ids:
+        return 0
+    return Order.objects.filter(pk__in=order_ids).update(**aggregate_updates())
+
+
+def rebuild_all(batch_size=5000, progress=None):
+    """Recompute aggregates for every order, one set-based UPDATE per key range."""
+    updated = 0
+    last_id = None
+    while True:
+        keys = Order.objects.order_by('pk').values_list('pk', flat=True)
+        if last_id is not None:
+            keys = keys.filter(pk__gt=last_id)
+        batch = list(keys[:batch_size])
+        if not batch:
+            break
+
+        with transaction.atomic():
+            updated += Order.objects.filter(
+                pk__gte=batch[0], pk__lte=batch[-1]
+            ).update(**aggregate_updates())
+
+        last_id = batch[-1]
+        if progress:
+            progress(updated)
+    return updated
+
+
+def is_deferred():
+    return getattr(_state, 'pending', None) is not None
+
+
+@contextmanager
+def deferred():
+    """
+    Collect orders touched by OrderItem writes and refresh them once on exit.
+
+    Used by bulk writers (the CSV importer) so each item save doesn't issue
+    its own UPDATE.
+    """
+    if is_deferred():
+        yield
+        return
+
+    _state.pending = set()
+    try:
+        yield
+        pending = _state.pending
+    finally:
+        _state.pending = None
+
+    pending = sorted(pending)
+    for i in range(0, len(pending), 5000):
+        refresh_orders(pending[i:i + 5000])
+
+
+def order_items_changed(order_id):
+    if is_deferred():
+        _state.pending.add(order_id)
+    else:
+        refresh_orders([order_id])
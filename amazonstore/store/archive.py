@@ -0,0 +1,285 @@
+"""
+Hot/cold archival of old orders.
+
+archive_before() moves orders older than a cutoff, in batches, into
+ArchivedOrders (one row per order, items packed as zlib-compressed JSON) and
+folds them into ArchiveMonthlyTotals so all-time dashboard figures stay
+correct after the rows leave Orders/OrderItems. Leaderboard entries are left
+as they are, so archived orders keep counting there too.
+"""
+import json
+import zlib
+from collections import defaultdict
+from datetime import date, timedelta
+from decimal import Decimal
+
+from django.db import transaction
+from django.db.models import Count, Max, Min, Q, Sum
+from django.db.models.functions import TruncMonth
+
+from . import aggregates, leaderboards, upserts, versioning
+from .models import ArchivedOrder, ArchiveMonthlyTotal, Order, OrderItem, Product
+
+
+ITEM_FIELDS = ('OrderItemID', 'product_id', 'seller_id', 'Quantity', 'UnitPrice', 'Discount', 'Tax', 'LineTotal')
+
+
+def pack_items(items):
+    rows = [[str(item[field]) if isinstance(item[field], Decimal) else item[field] for field in ITEM_FIELDS]
+            for item in items]
+    return zlib.compress(json.dumps(rows, separators=(',', ':')).encode(), 9)
+
+
+def unpack_items(data):
+    return [dict(zip(ITEM_FIELDS, row)) for row in json.loads(zlib.decompress(bytes(data)))]
+
+
+def month_of(value):
+    return date(value.year, value.month, 1)
+
+
+def _add_to_totals(orders):
+    buckets = defaultdict(lambda: {
+        'Orders': 0, 'Items': 0, 'Units': 0, 'Revenue': Decimal('0'),
+        'MinAmount': None, 'MaxAmount': None,
+    })
+    for order in orders:
+        bucket = buckets[(month_of(order.OrderDate), order.OrderStatus, order.PaymentMethod)]
+        bucket['Orders'] += 1
+        bucket['Items'] += order.item_count
+        bucket['Units'] += order.unit_count
+        bucket['Revenue'] += order.TotalAmount
+        if bucket['MinAmount'] is None or order.TotalAmount < bucket['MinAmount']:
+            bucket['MinAmount'] = order.TotalAmount
+        if bucket['MaxAmount'] is None or order.TotalAmount > bucket['MaxAmount']:
+            bucket['MaxAmount'] = order.TotalAmount
+
+    # merged in the INSERT itself: another archive run or the job worker may
+    # be adding to the same months
+    upserts.upsert(
+        ArchiveMonthlyTotal,
+        ('Month', 'OrderStatus', 'PaymentMethod'),
+        (
+            {'Month': month, 'OrderStatus': status, 'PaymentMethod': payment, **bucket}
+            for (month, status, payment), bucket in buckets.items()
+        ),
+        {
+            'Orders': upserts.ADD, 'Items': upserts.ADD, 'Units': upserts.ADD, 'Revenue': upserts.ADD,
+            'MinAmount': upserts.MIN, 'MaxAmount': upserts.MAX,
+        },
+    )
+
+
+@transaction.atomic
+def archive_batch(cutoff, batch_size=1000):
+    """Archive up to batch_size orders dated before cutoff; returns how many were moved."""
+    orders = list(
+        Order.objects
+        .select_for_update(skip_locked=True)
+        .filter(OrderDate__lt=cutoff)
+        .order_by('OrderDate', 'OrderID')[:batch_size]
+    )
+    if not orders:
+        return 0
+
+    order_ids = [order.OrderID for order in orders]
+    items_by_order = defaultdict(list)
+    for item in (OrderItem.objects.filter(order_id__in=order_ids)
+                 .order_by('OrderItemID').values('order_id', *ITEM_FIELDS)):
+        items_by_order[item['order_id']].append(item)
+
+    ArchivedOrder.objects.bulk_create([
+        ArchivedOrder(
+            OrderID=order.OrderID,
+            OrderDate=order.OrderDate,
+            customer_id=order.customer_id,
+            PaymentMethod=order.PaymentMethod,
+            OrderStatus=order.OrderStatus,
+            ShippingCost=order.ShippingCost,
+            TotalAmount=order.TotalAmount,
+            item_count=order.item_count,
+            unit_count=order.unit_count,
+            items_total=order.items_total,
+            Items=pack_items(items_by_order[order.OrderID]),
+        )
+        for order in orders
+    ])
+    _add_to_totals(orders)
+
+    with aggregates.deferred(), leaderboards.preserved(), versioning.batch():
+        OrderItem.objects.filter(order_id__in=order_ids).delete()
+        Order.objects.filter(pk__in=order_ids).delete()
+    return len(orders)
+
+
+def archive_before(cutoff, batch_size=1000, progress=None):
+    moved = 0
+    while True:
+        count = archive_batch(cutoff, batch_size)
+        if not count:
+            break
+        moved += count
+        if progress:
+            progress(moved)
+    return moved
+
+
+TOTAL_FIELDS = ('Orders', 'Items', 'Units', 'Revenue', 'MinAmount', 'MaxAmount')
+
+
+def next_month(value):
+    return date(value.year + value.month // 12, value.month % 12 + 1, 1)
+
+
+def archived_totals(date_from=None, date_to=None):
+    """
+    Archived order totals per (Month, OrderStatus, PaymentMethod) within the date range.
+
+    Months wholly inside the range come from ArchiveMonthlyTotals; the partly
+    covered months at either end are summed from ArchivedOrders by OrderDate.
+    """
+    whole = ArchiveMonthlyTotal.objects.order_by()
+    partial = Q()
+    if date_from:
+        first_whole = date_from if date_from.day == 1 else next_month(date_from)
+        whole = whole.filter(Month__gte=first_whole)
+        partial |= Q(OrderDate__gte=date_from, OrderDate__lt=first_whole)
+    if date_to:
+        end_month = month_of(date_to + timedelta(days=1))
+        whole = whole.filter(Month__lt=end_month)
+        partial |= Q(OrderDate__gte=end_month, OrderDate__lte=date_to)
+    rows = list(whole.values('Month', 'OrderStatus', 'PaymentMethod', *TOTAL_FIELDS))
+    if not partial:
+        return rows
+
+    edges = ArchivedOrder.objects.order_by().filter(partial)
+    if date_from:
+        edges = edges.filter(OrderDate__gte=date_from)
+    if date_to:
+        edges = edges.filter(OrderDate__lte=date_to)
+    rows += edges.values('OrderStatus', 'PaymentMethod', Month=TruncMonth('OrderDate')).annotate(
+        Orders=Count('OrderID'),
+        Items=Sum('item_count'),
+        Units=Sum('unit_count'),
+        Revenue=Sum('TotalAmount'),
+        MinAmount=Min('TotalAmount'),
+        MaxAmount=Max('TotalAmount'),
+    )
+    return rows
+
+
+def merge_order_stats(stats, date_from=None, date_to=None):
+    """Fold archived orders into the dict produced by the dashboard's order_stats aggregate."""
+    rows = archived_totals(date_from, date_to)
+    if not rows:
+        return stats
+
+    live_orders = stats.get('total_orders') or 0
+    live_items = (stats.get('avg_items') or 0) * live_orders
+    orders = live_orders + sum(r['Orders'] for r in rows)
+    revenue = (stats.get('total_revenue') or Decimal('0')) + sum(r['Revenue'] for r in rows)
+    mins = [v for v in [stats.get('min_order')] + [r['MinAmount'] for r in rows] if v is not None]
+    maxes = [v for v in [stats.get('max_order')] + [r['MaxAmount'] for r in rows] if v is not None]
+
+    return {
+        **stats,
+        'total_orders': orders,
+        'total_revenue': revenue,
+        'avg_order_value': revenue / orders if orders else None,
+        'min_order': min(mins) if mins else None,
+        'max_order': max(maxes) if maxes else None,
+        'total_units': (stats.get('total_units') or 0) + sum(r['Units'] for r in rows),
+        'avg_items': (live_items + sum(r['Items'] for r in rows)) / orders if orders else None,
+    }
+
+
+def merge_grouped(rows, field, date_from=None, date_to=None):
+    """Merge archived counts into [{field, count, total}] rows grouped by OrderStatus/PaymentMethod."""
+    merged = {row[field]: {**row} for row in rows}
+    for row in archived_totals(date_from, date_to):
+        target = merged.setdefault(row[field], {field: row[field], 'count': 0, 'total': Decimal('0')})
+        target['count'] += row['Orders']
+        target['total'] = (target['total'] or Decimal('0')) + row['Revenue']
+    return sorted(merged.values(), key=lambda row: -row['count'])
+
+
+def merge_monthly(rows, date_from=None, date_to=None, limit=6):
+    """Merge archived totals into [{month, orders, revenue}] rows, newest first."""
+    merged = {month_of(row['month']): {**row, 'month': month_of(row['month'])} for row in rows}
+    for row in archived_totals(date_from, date_to):
+        month = month_of(row['Month'])
+        target = merged.setdefault(month, {'month': month, 'orders': 0, 'revenue': Decimal('0')})
+        target['orders'] += row['Orders']
+        target['revenue'] = (target['revenue'] or Decimal('0')) + row['Revenue']
+    return sorted(merged.values(), key=lambda row: row['month'], reverse=True)[:limit]
+
+
+def orders_including_archive(date_from=None, date_to=None):
+    """Live and archived orders as one values() queryset, newest first."""
+    fields = ('OrderID', 'OrderDate', 'customer__CustomerName', 'OrderStatus', 'TotalAmount')
+    live = Order.objects.order_by().values_list(*fields)
+    cold = ArchivedOrder.objects.order_by().values_list(*fields)
+    if date_from:
+        live, cold = live.filter(OrderDate__gte=date_from), cold.filter(OrderDate__gte=date_from)
+    if date_to:
+        live, cold = live.filter(OrderDate__lte=date_to), cold.filter(OrderDate__lte=date_to)
+    return live.union(cold, all=True).order_by('-OrderDate', 'OrderID')
+
+
+def archived_order_dicts(order_ids, dims):
+    """Archived orders shaped like order_details.order_to_dict()."""
+    orders = list(
+        ArchivedOrder.objects
+        .filter(pk__in=order_ids)
+        .select_related('customer__location')
+    )
+    unpacked = {order.OrderID: unpack_items(order.Items) for order in orders}
+    product_ids = {item['product_id'] for items in unpacked.values() for item in items}
+    products = {
+        product_id: (name, brand_id, category_id)
+        for product_id, name, brand_id, category_id in Product.objects.filter(pk__in=product_ids)
+        .values_list('ProductID', 'ProductName', 'Brand_id', 'Category_id')
+    }
+
+    result = {}
+    for order in orders:
+        location = order.customer.location
+        items = []
+        for item in unpacked[order.OrderID]:
+            name, brand_id, category_id = products.get(item['product_id'], ('', None, None))
+            items.append({
+                'id': item['OrderItemID'],
+                'product': {
+                    'id': item['product_id'],
+                    'name': name,
+                    'brand': dims.brands.label(brand_id),
+                    'category': dims.categories.label(category_id),
+                },
+                'seller': {'id': item['seller_id'], 'name': dims.sellers.label(item['seller_id'])},
+                'quantity': item['Quantity'],
+                'unit_price': item['UnitPrice'],
+                'discount': item['Discount'],
+                'tax': item['Tax'],
+                'line_total': item['LineTotal'],
+            })
+        result[order.OrderID] = {
+            'id': order.OrderID,
+            'date': order.OrderDate.isoformat(),
+            'status': order.get_OrderStatus_display(),
+            'payment_method': order.get_PaymentMethod_display(),
+            'shipping_cost': str(order.ShippingCost),
+            'total': str(order.TotalAmount),
+            'item_count': order.item_count,
+            'unit_count': order.unit_count,
+            'items_total': str(order.items_total),
+            'archived': True,
+            'customer': {
+                'id': order.customer.CustomerID,
+                'name': order.customer.CustomerName,
+                'city': location.City,
+                'state': location.State,
+                'country': location.Country,
+            },
+            'items': items,
+        }
+    return result
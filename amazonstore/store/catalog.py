@@ -0,0 +1,88 @@
+"""
+Seller/product listing queries over ProductSellers.
+
+Active listings are served from the partial indexes on (ProductID, SellerID)
+and (SellerID, ProductID) WHERE "IsActive". Sales figures are aggregated
+from OrderItems only for the listings on the requested page. Activation
+changes are single UPDATE statements, never per-row saves.
+"""
+from django.db.models import Count, Sum
+
+from . import versioning
+from .models import OrderItem, ProductSeller
+
+
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+
+def listings(include_inactive=False):
+    queryset = ProductSeller.objects.order_by()
+    if not include_inactive:
+        queryset = queryset.filter(IsActive=True)
+    return queryset
+
+
+def product_sellers(product_id, include_inactive=False):
+    """(SellerID, IsActive) rows for a product, in SellerID order."""
+    return (
+        listings(include_inactive)
+        .filter(product_id=product_id)
+        .order_by('seller_id')
+        .values_list('seller_id', 'IsActive')
+    )
+
+
+def seller_catalog(seller_id, include_inactive=False):
+    """(ProductID, ProductName, BrandID, CategoryID, IsActive) rows for a seller, in ProductID order."""
+    return (
+        listings(include_inactive)
+        .filter(seller_id=seller_id)
+        .order_by('product_id')
+        .values_list(
+            'product_id', 'product__ProductName', 'product__Brand_id',
+            'product__Category_id', 'IsActive',
+        )
+    )
+
+
+def _sales(rows, key):
+    return {
+        row[key]: {'orders': row['orders'], 'units': row['units'], 'revenue': row['revenue']}
+        for row in rows.values(key).annotate(
+            orders=Count('order_id', distinct=True),
+            units=Sum('Quantity'),
+            revenue=Sum('LineTotal'),
+        ).order_by()
+    }
+
+
+def sales_by_seller(product_id, seller_ids):
+    """Sales of one product per seller, for the given sellers only."""
+    return _sales(OrderItem.objects.filter(product_id=product_id, seller_id__in=seller_ids), 'seller_id')
+
+
+def sales_by_product(seller_id, product_ids):
+    """Sales of one seller per product, for the given products only."""
+    return _sales(OrderItem.objects.filter(seller_id=seller_id, product_id__in=product_ids), 'product_id')
+
+
+def select_listings(products=None, sellers=None):
+    """Listings matching any of `products` and any of `sellers` (at least one is required)."""
+    if not products and not sellers:
+        raise ValueError('Select listings by product, seller or both')
+    queryset = ProductSeller.objects.all()
+    if products:
+        queryset = queryset.filter(product_id__in=products)
+    if sellers:
+        queryset = queryset.filter(seller_id__in=sellers)
+    return queryset
+
+
+def set_active(queryset, active):
+    """Flip IsActive on every listing in `queryset` with one UPDATE; returns rows changed."""
+    changed = queryset.exclude(IsActive=active).update(IsActive=active)
+    if changed:
+        # update() sends no post_save, so bump the data version here
+        versioning.data_changed()
+    return changed
@@ -0,0 +1,310 @@
+"""
+Process-local pool of psycopg2 connections, used through ENGINE 'store.db_pool'.
+
+Django's own pool (OPTIONS['pool']) requires psycopg 3, so this backend keeps
+the stock PostgreSQL wrapper and only changes where raw connections come from.
+Django opens a connection per request and closes it at the end (CONN_MAX_AGE
+must stay 0); here "close" hands the connection back to the pool instead.
+
+Settings come from DATABASES[alias]['POOL']:
+
+    MAX_SIZE      connections open at once per process; further checkouts wait
+    MIN_SIZE      idle connections kept even past MAX_IDLE
+    TIMEOUT       seconds a checkout waits for a free connection before failing
+    MAX_LIFETIME  connections older than this are closed when returned
+    MAX_IDLE      idle connections unused for this long are closed
+    CHECK_AFTER   with CONN_HEALTH_CHECKS, connections idle at least this long
+                  are tested with SELECT 1 before being handed out
+
+Pools are per process: after fork the child starts empty and leaves the
+parent's connections alone.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+import psycopg2
+from psycopg2 import extensions
+
+
+DEFAULTS = {
+    'MIN_SIZE': 0,
+    'MAX_SIZE': 4,
+    'TIMEOUT': 10.0,
+    'MAX_LIFETIME': 1800.0,
+    'MAX_IDLE': 300.0,
+    'CHECK_AFTER': 5.0,
+}
+
+COUNTERS = (
+    'checkouts', 'reused', 'connects', 'waits', 'timeouts',
+    'failed_checks', 'recycled', 'discarded',
+)
+
+
+NEW_CONNECTION = object()
+
+
+class PoolTimeout(psycopg2.OperationalError):
+    pass
+
+
+class _Waiter:
+    __slots__ = ('ready', 'entry')
+
+    def __init__(self):
+        self.ready = threading.Event()
+        self.entry = None
+
+
+class ConnectionPool:
+    def __init__(self, name, min_size, max_size, timeout, max_lifetime, max_idle,
+                 check_after, health_checks=True):
+        self.name = name
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.max_idle = max_idle
+        self.check_after = check_after
+        self.health_checks = health_checks
+        self._lock = threading.Lock()
+        self._reset()
+
+    def _reset(self):
+        self._idle = []  # [(connection, created_at, returned_at)], most recently returned last
+        self._in_use = {}  # id(connection) -> created_at
+        self._waiting = deque()
+        self._size = 0
+        self._inherited = []
+        self._inherited_in_use = set()
+        self.counters = dict.fromkeys(COUNTERS, 0)
+        self.wait_seconds = 0.0
+        self.peak_in_use = 0
+
+    def forget_after_fork(self):
+        # Keep references so the inherited sockets are never closed from the
+        # child: psycopg2 sends Terminate on close() and on garbage collection,
+        # which would end the parent's session on the shared socket
+        inherited = [entry[0] for entry in self._idle]
+        inherited_in_use = set(self._in_use)
+        self._lock = threading.Lock()
+        self._reset()
+        self._inherited = inherited
+        self._inherited_in_use = inherited_in_use
+
+    def _release_slot(self):
+        """A connection was closed; pass its slot to the first waiter. Call with the lock held."""
+        if self._waiting:
+            waiter = self._waiting.popleft()
+            waiter.entry = NEW_CONNECTION
+            waiter.ready.set()
+        else:
+            self._size -= 1
+
+    def _discard(self, connection, counter):
+        try:
+            connection.close()
+        except psycopg2.Error:
+            pass
+        with self._lock:
+            self.counters[counter] += 1
+            self._release_slot()
+
+    def _take_idle(self, now):
+        """Pop a reusable idle connection, closing expired ones; call with the lock held."""
+        while self._idle and self._size > self.min_size and now - self._idle[0][2] >= self.max_idle:
+            connection, _, _ = self._idle.pop(0)
+            connection.close()
+            self._size -= 1
+            self.counters['recycled'] += 1
+        while self._idle:
+            connection, created_at, returned_at = self._idle.pop()
+            if connection.closed or now - created_at >= self.max_lifetime:
+                connection.close()
+                self._size -= 1
+                self.counters['recycled'] += 1
+                continue
+            return connection, created_at, returned_at
+        return None
+
+    def _healthy(self, connection):
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute('SELECT 1')
+            if connection.info.transaction_status != extensions.TRANSACTION_STATUS_IDLE:
+                connection.rollback()
+            return True
+        except psycopg2.Error:
+            return False
+
+    def _wait(self):
+        """Queue for the next returned connection or freed slot; call with the lock held."""
+        waiter = _Waiter()
+        self._waiting.append(waiter)
+        self.counters['waits'] += 1
+        started = time.monotonic()
+        self._lock.release()
+        try:
+            waiter.ready.wait(self.timeout)
+        finally:
+            self._lock.acquire()
+            self.wait_seconds += time.monotonic() - started
+        if waiter.entry is None:
+            self._waiting.remove(waiter)
+            self.counters['timeouts'] += 1
+            raise PoolTimeout(
+                f'No free connection in pool {self.name!r} after {self.timeout}s '
+                f'({self.max_size} in use)'
+            )
+        return waiter.entry
+
+    def getconn(self, connect):
+        """Check out a connection, opening one with connect() when none is idle."""
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                entry = self._take_idle(now)
+                if entry is None:
+                    if self._size < self.max_size:
+                        self._size += 1
+                        entry = NEW_CONNECTION
+                    else:
+                        # waiters are served in arrival order
+                        entry = self._wait()
+
+            if entry is NEW_CONNECTION:
+                try:
+                    connection = connect()
+                except Exception:
+                    with self._lock:
+                        self._release_slot()
+                    raise
+                created_at = time.monotonic()
+                reused = False
+            else:
+                connection, created_at, returned_at = entry
+                if (self.health_checks and now - returned_at >= self.check_after
+                        and not self._healthy(connection)):
+                    self._discard(connection, 'failed_checks')
+                    continue
+                reused = True
+
+            with self._lock:
+                self._in_use[id(connection)] = created_at
+                self.counters['checkouts'] += 1
+                self.counters['reused' if reused else 'connects'] += 1
+                self.peak_in_use = max(self.peak_in_use, len(self._in_use))
+            return connection
+
+    def putconn(self, connection):
+        now = time.monotonic()
+        with self._lock:
+            created_at = self._in_use.pop(id(connection), None)
+        if created_at is None:
+            with self._lock:
+                inherited = id(connection) in self._inherited_in_use
+                if inherited:
+                    # checked out by the parent before fork; drop it without closing
+                    self._inherited_in_use.discard(id(connection))
+                    self._inherited.append(connection)
+            if not inherited:
+                # from another pool in this process; not ours to keep
+                connection.close()
+            return
+
+        if connection.closed or now - created_at >= self.max_lifetime:
+            self._discard(connection, 'recycled')
+            return
+        status = connection.info.transaction_status
+        if status == extensions.TRANSACTION_STATUS_UNKNOWN:
+            self._discard(connection, 'discarded')
+            return
+        if status != extensions.TRANSACTION_STATUS_IDLE:
+            try:
+                connection.rollback()
+            except psycopg2.Error:
+                self._discard(connection, 'discarded')
+                return
+
+        with self._lock:
+            entry = (connection, created_at, now)
+            if self._waiting:
+                waiter = self._waiting.popleft()
+                waiter.entry = entry
+                waiter.ready.set()
+            else:
+                self._idle.append(entry)
+
+    def close(self):
+        """Close the idle connections."""
+        with self._lock:
+            idle, self._idle = self._idle, []
+            self._size -= len(idle)
+        for connection, _, _ in idle:
+            connection.close()
+
+    def stats(self):
+        with self._lock:
+            in_use = len(self._in_use)
+            return {
+                'max_size': self.max_size,
+                'size': self._size,
+                'in_use': in_use,
+                'idle': len(self._idle),
+                'peak_in_use': self.peak_in_use,
+                'saturation': round(in_use / self.max_size, 4) if self.max_size else None,
+                **self.counters,
+                'wait_seconds': round(self.wait_seconds, 6),
+            }
+
+
+_pools = {}
+_pools_lock = threading.Lock()
+
+
+def get_pool(alias, settings_dict):
+    # keyed by database name too, so the test runner's test_* database gets its own pool
+    key = (alias, settings_dict['NAME'])
+    pool = _pools.get(key)
+    if pool is None:
+        with _pools_lock:
+            pool = _pools.get(key)
+            if pool is None:
+                options = {**DEFAULTS, **settings_dict.get('POOL', {})}
+                pool = _pools[key] = ConnectionPool(
+                    name=alias,
+                    min_size=int(options['MIN_SIZE']),
+                    max_size=int(options['MAX_SIZE']),
+                    timeout=float(options['TIMEOUT']),
+                    max_lifetime=float(options['MAX_LIFETIME']),
+                    max_idle=float(options['MAX_IDLE']),
+                    check_after=float(options['CHECK_AFTER']),
+                    health_checks=settings_dict.get('CONN_HEALTH_CHECKS', True),
+                )
+    return pool
+
+
+def close_pools():
+    """Close every idle pooled connection, e.g. in a parent process before it forks."""
+    for pool in list(_pools.values()):
+        pool.close()
+
+
+def pool_stats():
+    return [
+        {'alias': alias, 'database': name, **pool.stats()}
+        for (alias, name), pool in list(_pools.items())
+    ]
+
+
+def _after_fork_in_child():
+    global _pools_lock
+    _pools_lock = threading.Lock()
+    for pool in _pools.values():
+        pool.forget_after_fork()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
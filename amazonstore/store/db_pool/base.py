@@ -0,0 +1,41 @@
+from functools import partial
+
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.base.base import NO_DB_ALIAS
+from django.db.backends.postgresql import base
+
+from . import get_pool
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    @property
+    def connection_pool(self):
+        # the no-db connection used to create/drop test databases isn't pooled
+        if self.alias == NO_DB_ALIAS:
+            return None
+        return get_pool(self.alias, self.settings_dict)
+
+    def check_settings(self):
+        super().check_settings()
+        if self.settings_dict['CONN_MAX_AGE'] != 0:
+            raise ImproperlyConfigured(
+                "store.db_pool pools connections itself; set CONN_MAX_AGE to 0."
+            )
+
+    def get_new_connection(self, conn_params):
+        pool = self.connection_pool
+        if pool is None:
+            return super().get_new_connection(conn_params)
+        return pool.getconn(partial(super().get_new_connection, conn_params))
+
+    def _close(self):
+        pool = self.connection_pool
+        if self.connection is None or pool is None:
+            return super()._close()
+        with self.wrap_database_errors:
+            pool.putconn(self.connection)
+
+    def close_if_health_check_failed(self):
+        # the pool checks connections when handing them out
+        if self.connection_pool is None:
+            super().close_if_health_check_failed()
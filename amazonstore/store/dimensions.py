@@ -0,0 +1,97 @@
+"""
+Process-local cache of the small Brand, Category and Seller tables.
+
+Each table is held as a sorted key array plus a parallel label list, so hot
+queries can fetch integer/string FK ids only and resolve names here instead
+of joining. The cache reloads when the dimensions DataVersion stamp moves;
+the stamp is checked at most every DIMENSION_CACHE_CHECK_SECONDS.
+"""
+import threading
+import time
+from array import array
+from bisect import bisect_left
+
+from django.conf import settings
+
+from . import versioning
+from .models import Brand, Category, Seller
+
+
+CHECK_INTERVAL = getattr(settings, 'DIMENSION_CACHE_CHECK_SECONDS', 5)
+
+
+class DimensionTable:
+    __slots__ = ('ids', 'labels')
+
+    def __init__(self, rows, integer_keys=True):
+        rows = sorted(rows)
+        keys = [key for key, _ in rows]
+        self.ids = array('q', keys) if integer_keys else keys
+        self.labels = [label for _, label in rows]
+
+    def __len__(self):
+        return len(self.labels)
+
+    def __getitem__(self, index):
+        # (id, label) pairs; slicing makes the table usable with Paginator
+        if isinstance(index, slice):
+            return list(zip(self.ids[index], self.labels[index]))
+        return self.ids[index], self.labels[index]
+
+    def __contains__(self, key):
+        return self._index(key) is not None
+
+    def _index(self, key):
+        i = bisect_left(self.ids, key)
+        if i < len(self.ids) and self.ids[i] == key:
+            return i
+        return None
+
+    def label(self, key, default=''):
+        i = self._index(key)
+        return default if i is None else self.labels[i]
+
+    def items(self):
+        return zip(self.ids, self.labels)
+
+
+class DimensionCache:
+    __slots__ = ('version', 'checked_at', 'brands', 'categories', 'sellers', '_lock')
+
+    def __init__(self):
+        self.version = None
+        self.checked_at = 0.0
+        self.brands = self.categories = self.sellers = None
+        self._lock = threading.Lock()
+
+    def load(self, version):
+        self.brands = DimensionTable(Brand.objects.order_by().values_list('id', 'BrandName'))
+        self.categories = DimensionTable(Category.objects.order_by().values_list('id', 'CategoryName'))
+        self.sellers = DimensionTable(
+            ((seller_id, name or f"Seller {seller_id}")
+             for seller_id, name in Seller.objects.order_by().values_list('SellerID', 'SellerName')),
+            integer_keys=False,
+        )
+        self.version = version
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self.version is not None and now - self.checked_at < CHECK_INTERVAL:
+            return self
+        with self._lock:
+            version = versioning.get_data_version(versioning.DIMENSIONS_ID).Version
+            if force or version != self.version:
+                self.load(version)
+            self.checked_at = now
+        return self
+
+
+_cache = DimensionCache()
+
+
+def get():
+    return _cache.refresh()
+
+
+def warm():
+    return _cache.refresh(force=True)
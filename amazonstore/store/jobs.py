@@ -0,0 +1,252 @@
+"""
+Background jobs stored in the Jobs table and claimed with SELECT ... FOR UPDATE SKIP LOCKED.
+
+Workers (see the run_workers command) poll for queued jobs, so several
+processes or hosts can share the queue without an external broker.
+"""
+import io
+import os
+import re
+import socket
+import traceback
+from datetime import timedelta
+
+from django.core.management import call_command
+from django.db import DEFAULT_DB_ALIAS, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Job, Order
+
+
+JOB_IMPORT_CSV = 'import_csv'
+JOB_REFRESH_AGGREGATES = 'refresh_aggregates'
+JOB_WARM_CACHE = 'warm_cache'
+JOB_ARCHIVE_ORDERS = 'archive_orders'
+
+RETRY_BASE_DELAY = 30  # seconds, doubled on every attempt
+
+HANDLERS = {}
+
+_progress_connection = None
+
+
+def register(job_type):
+    def decorator(func):
+        HANDLERS[job_type] = func
+        return func
+    return decorator
+
+
+def worker_name(index=0, pid=None):
+    return f'{socket.gethostname()}:{pid or os.getpid()}:{index}'
+
+
+def enqueue(job_type, payload=None, priority=0, max_attempts=3, run_after=None):
+    if job_type not in HANDLERS:
+        raise ValueError(f'Unknown job type: {job_type}')
+    return Job.objects.create(
+        JobType=job_type,
+        Payload=payload or {},
+        Priority=priority,
+        MaxAttempts=max_attempts,
+        RunAfter=run_after or timezone.now(),
+    )
+
+
+def claim(worker):
+    """Lock the next runnable job for `worker`, or return None if the queue is empty."""
+    with transaction.atomic():
+        job = (
+            Job.objects
+            .select_for_update(skip_locked=True)
+            .filter(Status=Job.STATUS_QUEUED, RunAfter__lte=timezone.now())
+            .order_by('-Priority', 'RunAfter', 'pk')
+            .first()
+        )
+        if job is None:
+            return None
+        job.Status = Job.STATUS_RUNNING
+        job.Attempts += 1
+        job.LockedBy = worker
+        job.LockedAt = timezone.now()
+        job.Progress = 0
+        job.ProgressMessage = ''
+        job.save(update_fields=['Status', 'Attempts', 'LockedBy', 'LockedAt', 'Progress', 'ProgressMessage'])
+        return job
+
+
+def _update_progress_outside_transaction(job, fraction, message):
+    # Handlers like the importer run inside one long transaction; progress
+    # written on that connection would stay invisible until it commits.
+    global _progress_connection
+    if _progress_connection is None:
+        _progress_connection = connections.create_connection(DEFAULT_DB_ALIAS)
+    qn = _progress_connection.ops.quote_name
+    with _progress_connection.cursor() as cursor:
+        cursor.execute(
+            f'UPDATE {qn(Job._meta.db_table)} SET {qn("Progress")} = %s, '
+            f'{qn("ProgressMessage")} = %s, {qn("LockedAt")} = %s WHERE {qn("id")} = %s',
+            [fraction, message, timezone.now(), job.pk],
+        )
+
+
+def report_progress(job, fraction, message=''):
+    fraction = max(0.0, min(1.0, fraction))
+    message = message[:255]
+    # doubles as the heartbeat checked by requeue_stale()
+    if transaction.get_connection().in_atomic_block:
+        _update_progress_outside_transaction(job, fraction, message)
+    else:
+        Job.objects.filter(pk=job.pk).update(
+            Progress=fraction, ProgressMessage=message, LockedAt=timezone.now(),
+        )
+
+
+def run(job):
+    handler = HANDLERS.get(job.JobType)
+    try:
+        if handler is None:
+            raise ValueError(f'Unknown job type: {job.JobType}')
+        handler(job, lambda fraction, message='': report_progress(job, fraction, message))
+    except Exception:
+        error = traceback.format_exc()
+        if job.Attempts < job.MaxAttempts:
+            delay = RETRY_BASE_DELAY * 2 ** (job.Attempts - 1)
+            Job.objects.filter(pk=job.pk).update(
+                Status=Job.STATUS_QUEUED, Error=error, LockedBy='', LockedAt=None,
+                RunAfter=timezone.now() + timedelta(seconds=delay),
+            )
+        else:
+            Job.objects.filter(pk=job.pk).update(
+                Status=Job.STATUS_FAILED, Error=error, FinishedAt=timezone.now(),
+            )
+        return False
+
+    Job.objects.filter(pk=job.pk).update(
+        Status=Job.STATUS_SUCCEEDED, Progress=1, Error='', FinishedAt=timezone.now(),
+    )
+    return True
+
+
+def run_next(worker):
+    job = claim(worker)
+    if job is None:
+        return None
+    run(job)
+    return job
+
+
+def close_progress_connection():
+    global _progress_connection
+    if _progress_connection is not None:
+        _progress_connection.close()
+        _progress_connection = None
+
+
+def _requeue(running, error):
+    # a job that already used its last attempt (e.g. it keeps killing its worker) fails instead
+    failed = running.filter(Attempts__gte=F('MaxAttempts')).update(
+        Status=Job.STATUS_FAILED, Error=error, FinishedAt=timezone.now(),
+    )
+    requeued = running.update(
+        Status=Job.STATUS_QUEUED, LockedBy='', LockedAt=None, Error=error,
+    )
+    return requeued + failed
+
+
+def requeue_stale(timeout):
+    """Requeue running jobs whose worker stopped reporting for `timeout` seconds."""
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    return _requeue(
+        Job.objects.filter(Status=Job.STATUS_RUNNING, LockedAt__lt=cutoff), 'Worker timed out',
+    )
+
+
+def requeue_worker(worker):
+    """Requeue the jobs held by `worker`, a process that is known to have exited."""
+    return _requeue(
+        Job.objects.filter(Status=Job.STATUS_RUNNING, LockedBy=worker), 'Worker exited',
+    )
+
+
+def job_to_dict(job):
+    return {
+        'id': job.pk,
+        'type': job.JobType,
+        'status': job.Status,
+        'progress': round(job.Progress, 4),
+        'message': job.ProgressMessage,
+        'attempts': job.Attempts,
+        'max_attempts': job.MaxAttempts,
+        'worker': job.LockedBy,
+        'error': job.Error.strip().splitlines()[-1] if job.Error else '',
+        'created_at': job.CreatedAt,
+        'run_after': job.RunAfter,
+        'finished_at': job.FinishedAt,
+    }
+
+
+class _ProgressStream(io.StringIO):
+    """Turns the importer's 'i/total' stdout lines into progress reports."""
+
+    pattern = re.compile(r'^(\d+)/(\d+)$')
+
+    def __init__(self, progress):
+        super().__init__()
+        self.progress = progress
+
+    def write(self, text):
+        match = self.pattern.match(text.strip())
+        if match:
+            done, total = map(int, match.groups())
+            if total:
+                self.progress(done / total, f'{done}/{total} rows')
+        return super().write(text)
+
+
+@register(JOB_IMPORT_CSV)
+def import_csv(job, progress):
+    path = job.Payload.get('path')
+    if not path:
+        raise ValueError('import_csv needs a "path" in its payload')
+    options = {'snapshot_pages': job.Payload.get('snapshot_pages', 1)}
+    call_command('extract_from_csv', path, stdout=_ProgressStream(progress), **options)
+
+
+@register(JOB_REFRESH_AGGREGATES)
+def refresh_aggregates(job, progress):
+    from . import aggregates, sketches, versioning
+
+    total = max(Order.objects.count(), 1)
+    with versioning.batch():
+        aggregates.rebuild_all(
+            batch_size=job.Payload.get('batch_size', 5000),
+            progress=lambda n: progress(0.8 * n / total, f'{n} orders'),
+        )
+        progress(0.8, 'sketches')
+        sketches.rebuild()
+        versioning.data_changed()
+
+
+@register(JOB_WARM_CACHE)
+def warm_cache(job, progress):
+    from . import snapshots
+
+    progress(0, 'rendering snapshots')
+    snapshots.generate(pages=job.Payload.get('pages', 1))
+
+
+@register(JOB_ARCHIVE_ORDERS)
+def archive_orders(job, progress):
+    from datetime import date
+
+    from . import archive
+
+    cutoff = date.fromisoformat(job.Payload['before'])
+    total = max(Order.objects.filter(OrderDate__lt=cutoff).count(), 1)
+    archive.archive_before(
+        cutoff,
+        batch_size=job.Payload.get('batch_size', 1000),
+        progress=lambda n: progress(n / total, f'{n} orders archived'),
+    )
@@ -0,0 +1,401 @@
+"""
+Top-N leaderboards for products, customers and sellers.
+
+LeaderboardEntries holds running totals per (board, period, key) for the
+all-time period and each calendar month. Order and OrderItem writes apply
+deltas through the signals in store.signals; bulk writers wrap their work in
+buffered() so deltas are merged in memory and written once. Reads are a
+top-k over the (Board, Period, -metric) indexes. reconcile_leaderboards
+checks the table against a full recompute.
+"""
+import calendar
+import threading
+from collections import defaultdict
+from contextlib import contextmanager
+from datetime import timedelta
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.db import transaction
+from django.db.models import Count, Q, Sum, Value
+from django.db.models.functions import TruncMonth
+
+from . import upserts
+from .models import ArchivedOrder, LeaderboardEntry, Order, OrderItem
+
+
+BOARD_PRODUCTS = LeaderboardEntry.BOARD_PRODUCTS
+BOARD_CUSTOMERS = LeaderboardEntry.BOARD_CUSTOMERS
+BOARD_SELLERS = LeaderboardEntry.BOARD_SELLERS
+PERIOD_ALL = LeaderboardEntry.PERIOD_ALL
+
+RANKED_BY = {
+    BOARD_PRODUCTS: 'Units',
+    BOARD_CUSTOMERS: 'Revenue',
+    BOARD_SELLERS: 'Revenue',
+}
+
+CENT = Decimal('0.01')
+
+_state = threading.local()
+
+
+def period_of(value):
+    return f'{value.year:04d}-{value.month:02d}'
+
+
+def _money(value):
+    if value is None:
+        return Decimal('0.00')
+    if not isinstance(value, Decimal):
+        value = Decimal(value)
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+class LeaderboardBuffer:
+    """Sums (orders, units, revenue) deltas per entry and applies them on flush."""
+
+    def __init__(self):
+        self.deltas = defaultdict(lambda: [0, 0, Decimal('0.00')])
+
+    def add(self, board, key, order_date, orders, units, revenue):
+        revenue = _money(revenue)
+        for period in (PERIOD_ALL, period_of(order_date)):
+            delta = self.deltas[(board, period, key)]
+            delta[0] += orders
+            delta[1] += units
+            delta[2] += revenue
+
+    def add_item(self, product_id, seller_id, order_date, quantity, line_total, sign=1):
+        self.add(BOARD_PRODUCTS, product_id, order_date, sign, sign * quantity, sign * _money(line_total))
+        self.add(BOARD_SELLERS, seller_id, order_date, sign, sign * quantity, sign * _money(line_total))
+
+    def add_order(self, customer_id, order_date, total_amount, sign=1):
+        self.add(BOARD_CUSTOMERS, customer_id, order_date, sign, 0, sign * _money(total_amount))
+
+    @transaction.atomic
+    def flush(self):
+        deltas = {key: delta for key, delta in self.deltas.items() if any(delta)}
+        self.deltas.clear()
+        if not deltas:
+            return 0
+
+        # added in the INSERT itself, so concurrent flushes of the same entries
+        # neither lose deltas nor collide creating a missing row
+        return upserts.upsert(
+            LeaderboardEntry,
+            ('Board', 'Period', 'Key'),
+            (
+                {'Board': board, 'Period': period, 'Key': key, 'Orders': orders, 'Units': units, 'Revenue': revenue}
+                for (board, period, key), (orders, units, revenue) in deltas.items()
+            ),
+            {'Orders': upserts.ADD, 'Units': upserts.ADD, 'Revenue': upserts.ADD},
+        )
+
+
+def _buffer():
+    return getattr(_state, 'buffer', None)
+
+
+@contextmanager
+def buffered():
+    """Collect deltas from Order/OrderItem writes and apply them once on exit."""
+    if _buffer() is not None:
+        yield
+        return
+
+    _state.buffer = LeaderboardBuffer()
+    try:
+        yield
+        buffer = _state.buffer
+    finally:
+        _state.buffer = None
+    buffer.flush()
+
+
+@contextmanager
+def preserved():
+    """Deletes inside this block leave the leaderboards untouched (used by archival)."""
+    previous = getattr(_state, 'preserve', False)
+    _state.preserve = True
+    try:
+        yield
+    finally:
+        _state.preserve = previous
+
+
+def _apply(change):
+    buffer = _buffer()
+    if buffer is not None:
+        change(buffer)
+        return
+    buffer = LeaderboardBuffer()
+    change(buffer)
+    buffer.flush()
+
+
+def remember_item(instance):
+    # called on pre_save so an update can back out the stored values
+    if instance._state.adding or instance.pk is None:
+        instance._leaderboard_previous = None
+        return
+    instance._leaderboard_previous = OrderItem.objects.filter(pk=instance.pk).values_list(
+        'product_id', 'seller_id', 'OrderDate', 'Quantity', 'LineTotal'
+    ).first()
+
+
+def item_saved(instance, created):
+    previous = None if created else getattr(instance, '_leaderboard_previous', None)
+
+    def change(buffer):
+        if previous is not None:
+            buffer.add_item(*previous, sign=-1)
+        buffer.add_item(
+            instance.product_id, instance.seller_id, instance.OrderDate,
+            instance.Quantity, instance.LineTotal,
+        )
+    _apply(change)
+
+
+def item_deleted(instance):
+    if getattr(_state, 'preserve', False):
+        return
+    _apply(lambda buffer: buffer.add_item(
+        instance.product_id, instance.seller_id, instance.OrderDate,
+        instance.Quantity, instance.LineTotal, sign=-1,
+    ))
+
+
+def remember_order(instance):
+    if instance._state.adding or instance.pk is None:
+        instance._leaderboard_previous = None
+        return
+    instance._leaderboard_previous = Order.objects.filter(pk=instance.pk).values_list(
+        'customer_id', 'OrderDate', 'TotalAmount'
+    ).first()
+
+
+def order_saved(instance, created):
+    previous = None if created else getattr(instance, '_leaderboard_previous', None)
+
+    def change(buffer):
+        if previous is not None:
+            buffer.add_order(*previous, sign=-1)
+        buffer.add_order(instance.customer_id, instance.OrderDate, instance.TotalAmount)
+    _apply(change)
+
+
+def items_redated(order_id, old_date, new_date):
+    """Move an order's items to the period of its new OrderDate; call before re-dating them."""
+    items = list(OrderItem.objects.filter(order_id=order_id).values_list(
+        'product_id', 'seller_id', 'Quantity', 'LineTotal'
+    ))
+
+    def change(buffer):
+        for product_id, seller_id, quantity, line_total in items:
+            buffer.add_item(product_id, seller_id, old_date, quantity, line_total, sign=-1)
+            buffer.add_item(product_id, seller_id, new_date, quantity, line_total)
+    _apply(change)
+
+
+def order_deleted(instance):
+    if getattr(_state, 'preserve', False):
+        return
+    _apply(lambda buffer: buffer.add_order(
+        instance.customer_id, instance.OrderDate, instance.TotalAmount, sign=-1,
+    ))
+
+
+def _whole_months(date_from, date_to):
+    if date_from is not None and date_from.day != 1:
+        return False
+    if date_to is not None and date_to.day != calendar.monthrange(date_to.year, date_to.month)[1]:
+        return False
+    return True
+
+
+def _order_totals(board, date_from=None, date_to=None, edges=Q()):
+    """Per-key [orders, units, revenue] summed from live and archived orders in the range."""
+    from .archive import unpack_items
+
+    if board == BOARD_CUSTOMERS:
+        key = 'customer_id'
+        rows = Order.objects.values(key).annotate(
+            orders=Count('OrderID'), units=Value(0), revenue=Sum('TotalAmount'),
+        )
+    else:
+        key = 'product_id' if board == BOARD_PRODUCTS else 'seller_id'
+        rows = OrderItem.objects.values(key).annotate(
+            orders=Count('OrderItemID'), units=Sum('Quantity'), revenue=Sum('LineTotal'),
+        )
+    archived = ArchivedOrder.objects.filter(edges).only('OrderDate', 'customer_id', 'TotalAmount', 'Items')
+    rows = rows.filter(edges)
+    if date_from:
+        rows, archived = rows.filter(OrderDate__gte=date_from), archived.filter(OrderDate__gte=date_from)
+    if date_to:
+        rows, archived = rows.filter(OrderDate__lte=date_to), archived.filter(OrderDate__lte=date_to)
+
+    totals = defaultdict(lambda: [0, 0, Decimal('0.00')])
+
+    def add(key, orders, units, revenue):
+        total = totals[key]
+        total[0] += orders
+        total[1] += units
+        total[2] += _money(revenue)
+
+    for row in rows.order_by().values_list(key, 'orders', 'units', 'revenue'):
+        add(*row)
+    for order in archived.order_by().iterator(chunk_size=2000):
+        if board == BOARD_CUSTOMERS:
+            add(order.customer_id, 1, 0, order.TotalAmount)
+            continue
+        for item in unpack_items(order.Items):
+            add(item[key], 1, item['Quantity'], item['LineTotal'])
+    return totals
+
+
+def _range_top(board, limit, date_from, date_to):
+    """
+    Top entries for a range that starts or ends mid-month.
+
+    Months wholly inside the range are summed from the monthly entries; the
+    partly covered months at either end from live and archived orders, so
+    both count the same orders, as in archive.archived_totals.
+    """
+    from .archive import month_of, next_month
+
+    entries = LeaderboardEntry.objects.filter(Board=board).exclude(Period=PERIOD_ALL)
+    edges = Q()
+    if date_from:
+        first_whole = date_from if date_from.day == 1 else next_month(date_from)
+        entries = entries.filter(Period__gte=period_of(first_whole))
+        edges |= Q(OrderDate__gte=date_from, OrderDate__lt=first_whole)
+    if date_to:
+        end_month = month_of(date_to + timedelta(days=1))
+        entries = entries.filter(Period__lt=period_of(end_month))
+        edges |= Q(OrderDate__gte=end_month, OrderDate__lte=date_to)
+
+    totals = _order_totals(board, date_from, date_to, edges)
+    for key, orders, units, revenue in (
+        entries.values('Key').annotate(orders=Sum('Orders'), units=Sum('Units'), revenue=Sum('Revenue'))
+        .order_by().values_list('Key', 'orders', 'units', 'revenue')
+    ):
+        total = totals[key]
+        total[0] += orders
+        total[1] += units
+        total[2] += revenue
+    return _ranked(board, totals, limit)
+
+
+def _ranked(board, totals, limit):
+    column = 2 if RANKED_BY[board] == 'Units' else 3
+    rows = sorted(((key, *total) for key, total in totals.items()), key=lambda row: (-row[column], row[0]))
+    return rows[:limit]
+
+
+def top(board, limit=10, date_from=None, date_to=None):
+    """
+    Return [(key, orders, units, revenue)] for the best `limit` entries.
+
+    Unfiltered and whole-month ranges are read from the table; other date
+    ranges add live and archived orders from the partly covered months.
+    """
+    ranked_by = RANKED_BY[board]
+    if not _whole_months(date_from, date_to):
+        return _range_top(board, limit, date_from, date_to)
+
+    if date_from is None and date_to is None:
+        return list(
+            LeaderboardEntry.objects
+            .filter(Board=board, Period=PERIOD_ALL)
+            .order_by(f'-{ranked_by}', 'Key')
+            .values_list('Key', 'Orders', 'Units', 'Revenue')[:limit]
+        )
+
+    rows = LeaderboardEntry.objects.filter(Board=board).exclude(Period=PERIOD_ALL)
+    if date_from:
+        rows = rows.filter(Period__gte=period_of(date_from))
+    if date_to:
+        rows = rows.filter(Period__lte=period_of(date_to))
+    return list(
+        rows.values('Key')
+        .annotate(orders=Sum('Orders'), units=Sum('Units'), revenue=Sum('Revenue'))
+        .order_by(f'-{ranked_by.lower()}', 'Key')
+        .values_list('Key', 'orders', 'units', 'revenue')[:limit]
+    )
+
+
+def recompute():
+    """Full recompute of every entry from live and archived orders."""
+    from .archive import unpack_items
+
+    buffer = LeaderboardBuffer()
+
+    item_rows = (
+        OrderItem.objects
+        .annotate(month=TruncMonth('OrderDate'))
+        .values('product_id', 'seller_id', 'month')
+        .annotate(lines=Count('OrderItemID'), units=Sum('Quantity'), revenue=Sum('LineTotal'))
+        .order_by()
+    )
+    for row in item_rows:
+        for board, key in ((BOARD_PRODUCTS, row['product_id']), (BOARD_SELLERS, row['seller_id'])):
+            buffer.add(board, key, row['month'], row['lines'], row['units'], row['revenue'])
+
+    order_rows = (
+        Order.objects
+        .annotate(month=TruncMonth('OrderDate'))
+        .values('customer_id', 'month')
+        .annotate(orders=Count('OrderID'), revenue=Sum('TotalAmount'))
+        .order_by()
+    )
+    for row in order_rows:
+        buffer.add(BOARD_CUSTOMERS, row['customer_id'], row['month'], row['orders'], 0, row['revenue'])
+
+    archived = ArchivedOrder.objects.only('OrderDate', 'customer_id', 'TotalAmount', 'Items')
+    for order in archived.iterator(chunk_size=2000):
+        buffer.add_order(order.customer_id, order.OrderDate, order.TotalAmount)
+        for item in unpack_items(order.Items):
+            buffer.add_item(
+                item['product_id'], item['seller_id'], order.OrderDate,
+                item['Quantity'], item['LineTotal'],
+            )
+
+    return {key: tuple(delta) for key, delta in buffer.deltas.items() if any(delta)}
+
+
+def stored():
+    return {
+        (board, period, key): (orders, units, revenue)
+        for board, period, key, orders, units, revenue in LeaderboardEntry.objects.values_list(
+            'Board', 'Period', 'Key', 'Orders', 'Units', 'Revenue'
+        ).iterator(chunk_size=5000)
+        if orders or units or revenue
+    }
+
+
+def differences(expected=None):
+    """Return [(board, period, key, stored, expected)] for entries that disagree."""
+    expected = recompute() if expected is None else expected
+    actual = stored()
+    return [
+        (board, period, key, actual.get((board, period, key)), expected.get((board, period, key)))
+        for board, period, key in sorted(set(actual) | set(expected))
+        if actual.get((board, period, key)) != expected.get((board, period, key))
+    ]
+
+
+@transaction.atomic
+def rebuild(expected=None):
+    expected = recompute() if expected is None else expected
+    LeaderboardEntry.objects.all().delete()
+    LeaderboardEntry.objects.bulk_create(
+        (
+            LeaderboardEntry(
+                Board=board, Period=period, Key=key,
+                Orders=orders, Units=units, Revenue=revenue,
+            )
+            for (board, period, key), (orders, units, revenue) in expected.items()
+        ),
+        batch_size=1000,
+    )
+    return len(expected)
@@ -0,0 +1,42 @@
+from datetime import date, timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import archive
+from store.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Move orders older than a cutoff into ArchivedOrders and ArchiveMonthlyTotals'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--before', help='Archive orders dated before YYYY-MM-DD')
+        parser.add_argument('--older-than-days', type=int,
+                            help='Archive orders older than this many days')
+        parser.add_argument('--batch-size', type=int, default=1000,
+                            help='Orders moved per transaction')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the orders that would be archived')
+
+    def handle(self, *args, **options):
+        if options['before']:
+            try:
+                cutoff = date.fromisoformat(options['before'])
+            except ValueError:
+                raise CommandError('--before must be a date in YYYY-MM-DD format')
+        elif options['older_than_days'] is not None:
+            cutoff = date.today() - timedelta(days=options['older_than_days'])
+        else:
+            raise CommandError('Pass --before or --older-than-days')
+
+        if options['dry_run']:
+            count = Order.objects.filter(OrderDate__lt=cutoff).count()
+            self.stdout.write(f'{count} orders dated before {cutoff} would be archived')
+            return
+
+        moved = archive.archive_before(
+            cutoff,
+            batch_size=options['batch_size'],
+            progress=lambda n: self.stdout.write(f'{n} orders archived'),
+        )
+        self.stdout.write(self.style.SUCCESS(f'Archived {moved} orders dated before {cutoff}'))
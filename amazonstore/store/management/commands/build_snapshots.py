@@ -0,0 +1,17 @@
+from django.core.management.base import BaseCommand
+
+from store import snapshots
+
+
+class Command(BaseCommand):
+    help = 'Pre-render dashboard snapshots for the current data version'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--pages', type=int, default=1,
+                            help='Pre-render pages 1..N of every table')
+
+    def handle(self, *args, **options):
+        written = snapshots.generate(pages=options['pages'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Wrote {len(written)} snapshots to {snapshots.snapshot_root()}'
+        ))
@@ -0,0 +1,54 @@
+from datetime import date, datetime
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import partitioning
+
+
+class Command(BaseCommand):
+    help = 'Create monthly range partitions of Orders/OrderItems ahead of time'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--months-ahead', type=int, default=3,
+                            help='How many months after the first one to create')
+        parser.add_argument('--from', dest='start', type=str, default=None,
+                            help='First month to create (YYYY-MM), defaults to the current month')
+        parser.add_argument('--convert', action='store_true',
+                            help='Convert the existing heap tables to partitioned tables first')
+
+    def handle(self, *args, **options):
+        if not partitioning.is_postgresql():
+            raise CommandError('Range partitioning requires PostgreSQL')
+
+        months_ahead = options['months_ahead']
+        if options['start']:
+            try:
+                start = datetime.strptime(options['start'], '%Y-%m').date()
+            except ValueError:
+                raise CommandError(f"Invalid month: {options['start']} (expected YYYY-MM)")
+        else:
+            start = date.today()
+        end = partitioning.add_months(partitioning.month_start(start), months_ahead)
+
+        if options['convert']:
+            self.stdout.write('Converting Orders/OrderItems to partitioned tables...')
+            try:
+                partitioning.convert_to_partitioned(months_ahead)
+            except RuntimeError as e:
+                raise CommandError(str(e))
+            self.stdout.write(self.style.SUCCESS('Conversion finished'))
+
+        missing = [t for t in partitioning.PARTITIONED_TABLES if not partitioning.is_partitioned(t)]
+        if missing:
+            self.stdout.write(self.style.WARNING(
+                f'Not partitioned: {", ".join(missing)} (run with --convert)'
+            ))
+        else:
+            # also repairs tables converted before every model index was recreated
+            for name in partitioning.ensure_model_indexes():
+                self.stdout.write(f'  restored index {name}')
+
+        created = partitioning.ensure_partitions(start, end)
+        for name in created:
+            self.stdout.write(f'  created {name}')
+        self.stdout.write(self.style.SUCCESS(f'Created {len(created)} partitions'))
@@ -0,0 +1,82 @@
+import statistics
+import threading
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import DEFAULT_DB_ALIAS, connections
+from django.db.utils import load_backend
+
+from store.db_pool import get_pool
+
+
+MODES = {
+    'direct': 'django.db.backends.postgresql',
+    'pooled': 'store.db_pool',
+}
+
+
+class Command(BaseCommand):
+    help = 'Compare per-request connect+query latency with and without the connection pool'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=500, help='Simulated requests per mode')
+        parser.add_argument('--threads', type=int, default=1,
+                            help='Concurrent threads; more than POOL MAX_SIZE shows waits')
+        parser.add_argument('--query', default='SELECT 1', help='Statement run by each request')
+        parser.add_argument('--database', default=DEFAULT_DB_ALIAS)
+
+    def run_thread(self, settings_dict, alias, count, query, latencies):
+        # one wrapper per thread, opened and closed per request like the request cycle does
+        wrapper = load_backend(settings_dict['ENGINE']).DatabaseWrapper(settings_dict, alias)
+        try:
+            for _ in range(count):
+                started = time.perf_counter()
+                wrapper.ensure_connection()
+                with wrapper.cursor() as cursor:
+                    cursor.execute(query)
+                    cursor.fetchall()
+                wrapper.close()
+                latencies.append(time.perf_counter() - started)
+        finally:
+            wrapper.close()
+
+    def run_mode(self, mode, options):
+        base = connections.settings[options['database']]
+        if 'postgresql' not in base['ENGINE'] and base['ENGINE'] != MODES['pooled']:
+            raise CommandError('The benchmark needs a PostgreSQL database')
+        alias = f"{options['database']}_benchmark_{mode}"
+        settings_dict = {**base, 'ENGINE': MODES[mode], 'CONN_MAX_AGE': 0}
+
+        latencies = []
+        per_thread = max(options['requests'] // options['threads'], 1)
+        threads = [
+            threading.Thread(target=self.run_thread,
+                             args=(settings_dict, alias, per_thread, options['query'], latencies))
+            for _ in range(options['threads'])
+        ]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        latencies.sort()
+        self.stdout.write(
+            f'{mode:8} {len(latencies):8} {statistics.mean(latencies) * 1000:9.3f} '
+            f'{latencies[len(latencies) // 2] * 1000:9.3f} '
+            f'{latencies[int(len(latencies) * 0.95)] * 1000:9.3f} {len(latencies) / elapsed:10.0f}'
+        )
+        if mode == 'pooled':
+            pool = get_pool(alias, settings_dict)
+            stats = pool.stats()
+            pool.close()
+            return stats
+        return None
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'mode':8} {'requests':>8} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9} {'req/s':>10}")
+        stats = None
+        for mode in MODES:
+            stats = self.run_mode(mode, options) or stats
+        self.stdout.write('pool: ' + ', '.join(f'{key}={value}' for key, value in stats.items()))
@@ -0,0 +1,29 @@
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store import jobs
+
+
+class Command(BaseCommand):
+    help = 'Add a job to the background queue'
+
+    def add_arguments(self, parser):
+        parser.add_argument('job_type', choices=sorted(jobs.HANDLERS))
+        parser.add_argument('--payload', type=str, default='{}', help='JSON payload')
+        parser.add_argument('--priority', type=int, default=0)
+        parser.add_argument('--max-attempts', type=int, default=3)
+
+    def handle(self, *args, **options):
+        try:
+            payload = json.loads(options['payload'])
+        except ValueError as e:
+            raise CommandError(f'Invalid payload: {e}')
+
+        job = jobs.enqueue(
+            options['job_type'],
+            payload=payload,
+            priority=options['priority'],
+            max_attempts=options['max_attempts'],
+        )
+        self.stdout.write(self.style.SUCCESS(f'Queued job {job.pk} ({job.JobType})'))
@@ -1,34 +1,44 @@
 import csv
 import os
 from datetime import datetime
-from django.core.management.base import BaseCommand
+from decimal import ROUND_HALF_UP, Decimal
+from django.core.management.base import BaseCommand, CommandError
 from django.db import transaction
+from store import aggregates, leaderboards, sketches, snapshots, versioning
 from store.models import (
-    Customer, Seller, Brand, Category, Product, 
-    ProductSeller, Order, OrderItem
+    Location, Customer, Seller, Brand, Category, Product, 
+    ProductSeller, Order, OrderItem, ArchivedOrder
 )
 
 
+CENT = Decimal('0.01')
+
+
 class Command(BaseCommand):
     def add_arguments(self, parser):
         parser.add_argument('csv_file', type=str, help='Path to the csv file')
+        parser.add_argument('--snapshot-pages', type=int, default=1,
+                            help='Pre-render dashboard pages 1..N after import (0 disables)')
 
     @transaction.atomic
     def handle(self, *args, **options):
-        path = 'store/data/Amazon.csv'
+        path = options['csv_file']
         
         if not os.path.exists(path):
-            self.stdout.write(self.style.ERROR(f'File not found: {path}'))
-            return
+            raise CommandError(f'File not found: {path}')
 
-        
+        locations_cache = {}
         brands_cache = {}
         categories_cache = {}
         sellers_cache = {}
         customers_cache = {}
         products_cache = {}
+        sketch_buffer = sketches.SketchBuffer()
+        # archived orders are already counted in totals and leaderboards; importing them again would double them
+        archived_ids = set(ArchivedOrder.objects.values_list('OrderID', flat=True))
+        skipped_archived = 0
         
-        with open(path, 'r', encoding='utf-8') as file:
+        with open(path, 'r', encoding='utf-8') as file, aggregates.deferred(), leaderboards.buffered(), versioning.batch():
             reader = csv.DictReader(file)
             total_rows = sum(1 for _ in open(path, 'r', encoding='utf-8')) - 1
             
@@ -37,32 +47,44 @@ class Command(BaseCommand):
             for i, row in enumerate(reader, 1):
                 if i % 100 == 0:
                     self.stdout.write(f'{i}/{total_rows}')
+
+                if row['OrderID'] in archived_ids:
+                    skipped_archived += 1
+                    continue
                 
-                # 1. Customer
+                # 1. Location
+                location_key = (row['City'], row['State'], row['Country'])
+                if location_key not in locations_cache:
+                    location, created = Location.objects.get_or_create(
+                        City=row['City'],
+                        State=row['State'],
+                        Country=row['Country']
+                    )
+                    locations_cache[location_key] = location
+
+                # 2. Customer
                 customer_id = row['CustomerID']
                 if customer_id not in customers_cache:
                     customer, created = Customer.objects.get_or_create(
                         CustomerID=customer_id,
                         defaults={
                             'CustomerName': row['CustomerName'],
-                            'City': row['City'],
-                            'State': row['State'],
-                            'Country': row['Country']
+                            'location': locations_cache[location_key]
                         }
                     )
                     customers_cache[customer_id] = customer
                 
-                # 2. Seller
+                # 3. Seller
                 seller_id = row['SellerID']
                 seller_name = row['SellerName']
                 if seller_id not in sellers_cache:
                     seller, created = Seller.objects.get_or_create(
                         SellerID=seller_id,
-                        SellerName=seller_name
+                        defaults={'SellerName': seller_name}
                     )
                     sellers_cache[seller_id] = seller
                 
-                # 3. Brand
+                # 4. Brand
                 brand_name = row['Brand']
                 if brand_name not in brands_cache:
                     brand, created = Brand.objects.get_or_create(
@@ -70,7 +92,7 @@ class Command(BaseCommand):
                     )
                     brands_cache[brand_name] = brand
                 
-                # 4. Category
+                # 5. Category
                 category_name = row['Category']
                 if category_name not in categories_cache:
                     category, created = Category.objects.get_or_create(
@@ -78,7 +100,7 @@ class Command(BaseCommand):
                     )
                     categories_cache[category_name] = category
                 
-                # 5. Product
+                # 6. Product
                 product_id = row['ProductID']
                 if product_id not in products_cache:
                     product, created = Product.objects.get_or_create(
@@ -91,45 +113,57 @@ class Command(BaseCommand):
                     )
                     products_cache[product_id] = product
                 
-                # 6. ProductSeller
+                # 7. ProductSeller
                 ProductSeller.objects.get_or_create(
                     product=products_cache[product_id],
                     seller=sellers_cache[seller_id]
                 )
                 
-                # 7. Order
+                # 8. Order
                 order, order_created = Order.objects.get_or_create(
                     OrderID=row['OrderID'],
                     defaults={
                         'OrderDate': datetime.strptime(row['OrderDate'], '%Y-%m-%d').date(),
                         'customer': customers_cache[customer_id],
-                        'PaymentMethod': row['PaymentMethod'],
-                        'OrderStatus': row['OrderStatus'],
+                        'PaymentMethod': Order.PAYMENT_METHOD_CODES[row['PaymentMethod']],
+                        'OrderStatus': Order.ORDER_STATUS_CODES[row['OrderStatus']],
                         'ShippingCost': float(row['ShippingCost']),
                         'TotalAmount': float(row['TotalAmount'])
                     }
                 )
                 
-                # 8. OrderItem
+                # 9. OrderItem
                 if order_created:  # Создаем OrderItem только если Order был создан
                     OrderItem.objects.create(
                         order=order,
                         product=products_cache[product_id],
                         seller=sellers_cache[seller_id],
+                        OrderDate=order.OrderDate,
                         Quantity=int(row['Quantity']),
                         UnitPrice=float(row['UnitPrice']),
                         Discount=float(row['Discount']),
                         Tax=float(row['Tax']),
-                        LineTotal=(
+                        # rounded here so the saved item and the leaderboard delta agree
+                        LineTotal=Decimal(
                             float(row['Quantity']) * float(row['UnitPrice']) *
                             (1 - float(row['Discount'])) +
                             float(row['Tax']) +
                             float(row['ShippingCost'])
-                        )
+                        ).quantize(CENT, rounding=ROUND_HALF_UP)
+                    )
+                    sketch_buffer.add(
+                        order.OrderDate, customer_id,
+                        customers_cache[customer_id].location.Country, category_name
                     )
 
+            sketch_buffer.flush()
+            versioning.data_changed()
+
         self.stdout.write(self.style.SUCCESS(f'Successfully imported {total_rows} rows!'))
+        if skipped_archived:
+            self.stdout.write(self.style.WARNING(f'Skipped {skipped_archived} rows of already archived orders'))
         self.stdout.write(self.style.SUCCESS(f'Total records created:'))
+        self.stdout.write(f'  Locations: {Location.objects.count()}')
         self.stdout.write(f'  Customers: {Customer.objects.count()}')
         self.stdout.write(f'  Sellers: {Seller.objects.count()}')
         self.stdout.write(f'  Brands: {Brand.objects.count()}')
@@ -137,4 +171,8 @@ class Command(BaseCommand):
         self.stdout.write(f'  Products: {Product.objects.count()}')
         self.stdout.write(f'  ProductSellers: {ProductSeller.objects.count()}')
         self.stdout.write(f'  Orders: {Order.objects.count()}')
-        self.stdout.write(f'  OrderItems: {OrderItem.objects.count()}')
\ No newline at end of file
+        self.stdout.write(f'  OrderItems: {OrderItem.objects.count()}')
+
+        if options['snapshot_pages'] > 0:
+            # runs after the data version bump, once the import is committed
+            transaction.on_commit(lambda: snapshots.generate(pages=options['snapshot_pages']))
\ No newline at end of file
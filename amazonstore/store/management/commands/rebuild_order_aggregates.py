@@ -0,0 +1,20 @@
+from django.core.management.base import BaseCommand
+
+from store import aggregates, versioning
+
+
+class Command(BaseCommand):
+    help = 'Recompute Order.item_count/unit_count/items_total from OrderItems'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=5000,
+                            help='Orders updated per statement')
+
+    def handle(self, *args, **options):
+        with versioning.batch():
+            updated = aggregates.rebuild_all(
+                batch_size=options['batch_size'],
+                progress=lambda n: self.stdout.write(f'{n} orders updated'),
+            )
+            versioning.data_changed()
+        self.stdout.write(self.style.SUCCESS(f'Rebuilt aggregates for {updated} orders'))
@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+
+from store import sketches, versioning
+
+
+class Command(BaseCommand):
+    help = 'Rebuild unique-buyer HyperLogLog sketches from OrderItems and ArchivedOrders'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--validate', action='store_true',
+                            help='Compare estimates against exact COUNT(DISTINCT) after rebuilding')
+
+    def handle(self, *args, **options):
+        with versioning.batch():
+            count = sketches.rebuild()
+            versioning.data_changed()
+        self.stdout.write(self.style.SUCCESS(f'Built {count} sketches'))
+
+        if not options['validate']:
+            return
+
+        self.stdout.write(f'Expected relative error: ±{sketches.STANDARD_ERROR:.2%}')
+        for dimension in (sketches.DIMENSION_ALL, sketches.DIMENSION_COUNTRY, sketches.DIMENSION_CATEGORY):
+            estimated = sketches.unique_buyers(dimension)
+            exact = sketches.exact_unique_buyers(dimension)
+            for key in sorted(exact):
+                actual = exact[key]
+                estimate = estimated.get(key, 0)
+                error = abs(estimate - actual) / actual if actual else 0
+                self.stdout.write(f'  {dimension:<8} {key or "-":<30} exact={actual:<8} estimate={estimate:<8} error={error:.2%}')
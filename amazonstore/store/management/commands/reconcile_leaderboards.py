@@ -0,0 +1,36 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store import leaderboards, versioning
+from store.models import LeaderboardEntry
+
+
+class Command(BaseCommand):
+    help = 'Compare the leaderboards with a full recompute from orders (and optionally rebuild them)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--fix', action='store_true',
+                            help='Rewrite the leaderboards from the recompute')
+        parser.add_argument('--show', type=int, default=20,
+                            help='Mismatched entries to print')
+
+    def handle(self, *args, **options):
+        expected = leaderboards.recompute()
+        mismatches = leaderboards.differences(expected)
+        boards = dict(LeaderboardEntry.BOARD_CHOICES)
+
+        for board, period, key, stored, wanted in mismatches[:options['show']]:
+            self.stdout.write(f'{boards[board]} {period} {key}: stored {stored}, expected {wanted}')
+
+        if not mismatches:
+            self.stdout.write(self.style.SUCCESS(f'{len(expected)} leaderboard entries match'))
+            return
+
+        if not options['fix']:
+            raise CommandError(f'{len(mismatches)} leaderboard entries differ; rerun with --fix')
+
+        with versioning.batch():
+            written = leaderboards.rebuild(expected)
+            versioning.data_changed()
+        self.stdout.write(self.style.SUCCESS(
+            f'Fixed {len(mismatches)} mismatches; rebuilt {written} leaderboard entries'
+        ))
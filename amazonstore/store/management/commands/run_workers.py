@@ -0,0 +1,129 @@
+import multiprocessing
+import signal
+import time
+
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from store import jobs
+from store.db_pool import close_pools
+
+
+STALE_CHECK_INTERVAL = 30  # seconds between stale-job sweeps in the supervisor
+MIN_UPTIME = 10  # a worker exiting sooner than this is restarted with a growing delay
+MAX_RESTART_DELAY = 60
+
+# Workers are forked from the set-up supervisor: a forkserver or spawn child
+# (the POSIX default from Python 3.14) would import store modules before
+# django.setup(). Connections are closed before every fork and the pool
+# forgets inherited ones, see release_connections() and store.db_pool.
+mp = multiprocessing.get_context('fork')
+
+
+def worker_loop(index, stop, poll_interval, once):
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    name = jobs.worker_name(index)
+    try:
+        while not stop.is_set():
+            close_old_connections()
+            job = jobs.run_next(name)
+            if job is None:
+                if once:
+                    break
+                stop.wait(poll_interval)
+    finally:
+        jobs.close_progress_connection()
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Run a pool of background job workers'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=2, help='Number of worker processes')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to wait when the queue is empty')
+        parser.add_argument('--stale-after', type=int, default=600,
+                            help='Requeue running jobs without a heartbeat for this many seconds')
+        parser.add_argument('--once', action='store_true',
+                            help='Exit once the queue is drained')
+
+    def requeue_stale(self, stale_after):
+        requeued = jobs.requeue_stale(stale_after)
+        if requeued:
+            self.stdout.write(self.style.WARNING(f'Requeued {requeued} stale jobs'))
+        self.release_connections()
+
+    def release_connections(self):
+        # children must not inherit the parent's open connection, pooled ones included
+        connections.close_all()
+        close_pools()
+
+    def handle(self, *args, **options):
+        self.requeue_stale(options['stale_after'])
+        stale_check_interval = min(options['stale_after'], STALE_CHECK_INTERVAL)
+        last_stale_check = time.monotonic()
+
+        stop = mp.Event()
+        args = (stop, options['poll_interval'], options['once'])
+        workers = {}
+        started_at = {}
+        quick_exits = {}
+        restart_at = {}
+
+        def start(index):
+            process = mp.Process(target=worker_loop, args=(index, *args), daemon=True)
+            process.start()
+            workers[index] = process
+            started_at[index] = time.monotonic()
+
+        def shutdown(signum, frame):
+            stop.set()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+
+        for index in range(options['workers']):
+            start(index)
+        self.stdout.write(self.style.SUCCESS(f'Started {len(workers)} workers'))
+
+        while not stop.is_set():
+            now = time.monotonic()
+            for index, when in list(restart_at.items()):
+                if now >= when:
+                    del restart_at[index]
+                    start(index)
+            for index, process in list(workers.items()):
+                if process.is_alive():
+                    continue
+                del workers[index]
+                requeued = jobs.requeue_worker(jobs.worker_name(index, pid=process.pid))
+                self.release_connections()
+                if requeued:
+                    self.stdout.write(self.style.WARNING(
+                        f'Requeued the job held by worker {index}'
+                    ))
+                if options['once']:
+                    continue
+                # a worker that keeps crashing on startup must not be restarted in a tight loop
+                if now - started_at[index] < MIN_UPTIME:
+                    quick_exits[index] = quick_exits.get(index, 0) + 1
+                else:
+                    quick_exits[index] = 0
+                delay = min(2 ** quick_exits[index] - 1, MAX_RESTART_DELAY)
+                self.stdout.write(self.style.WARNING(
+                    f'Worker {index} exited with code {process.exitcode}, restarting'
+                    + (f' in {delay}s' if delay else '')
+                ))
+                restart_at[index] = now + delay
+            if not workers and not restart_at:
+                break
+            if time.monotonic() - last_stale_check >= stale_check_interval:
+                self.requeue_stale(options['stale_after'])
+                last_stale_check = time.monotonic()
+            time.sleep(1)
+
+        stop.set()
+        for process in workers.values():
+            process.join(timeout=30)
+        self.stdout.write('Workers stopped')
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store import catalog
+
+
+class Command(BaseCommand):
+    help = 'Activate or deactivate product listings by seller and/or product in one UPDATE'
+
+    def add_arguments(self, parser):
+        state = parser.add_mutually_exclusive_group(required=True)
+        state.add_argument('--activate', action='store_true')
+        state.add_argument('--deactivate', action='store_true')
+        parser.add_argument('--seller', action='append', default=[],
+                            help='SellerID whose listings change; repeatable')
+        parser.add_argument('--product', action='append', default=[],
+                            help='ProductID whose listings change; repeatable')
+        parser.add_argument('--dry-run', action='store_true',
+                            help='Only count the listings that would change')
+
+    def handle(self, *args, **options):
+        active = options['activate']
+        try:
+            queryset = catalog.select_listings(products=options['product'], sellers=options['seller'])
+        except ValueError as e:
+            raise CommandError(f'{e}: pass --seller and/or --product')
+
+        if options['dry_run']:
+            count = queryset.exclude(IsActive=active).count()
+            self.stdout.write(f'{count} listings would be {"activated" if active else "deactivated"}')
+            return
+
+        changed = catalog.set_active(queryset, active)
+        self.stdout.write(self.style.SUCCESS(
+            f'{changed} listings {"activated" if active else "deactivated"}'
+        ))
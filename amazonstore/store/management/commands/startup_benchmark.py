@@ -0,0 +1,107 @@
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+
+# Runs in a fresh interpreter per sample so nothing is already imported
+CHILD = r'''
+import json, os, resource, sys, time
+start = time.perf_counter()
+import django
+django.setup()
+setup_done = time.perf_counter()
+from django.core.wsgi import get_wsgi_application
+from django.urls import get_resolver
+application = get_wsgi_application()
+get_resolver().url_patterns
+app_done = time.perf_counter()
+preload = {}
+if sys.argv[1] == '1':
+    from store.preload import preload as run_preload
+    preload = run_preload()
+preload_done = time.perf_counter()
+request_seconds = status = None
+if sys.argv[2]:
+    from django.conf import settings
+    from django.test import Client
+    hosts = [host for host in settings.ALLOWED_HOSTS if '*' not in host and not host.startswith('.')]
+    status = Client().get(sys.argv[2], HTTP_HOST=hosts[0] if hosts else 'localhost').status_code
+    request_seconds = time.perf_counter() - preload_done
+try:
+    with open('/proc/self/statm') as statm:
+        rss = int(statm.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+except OSError:
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * (1 if sys.platform == 'darwin' else 1024)
+print(json.dumps({
+    'setup': setup_done - start,
+    'app': app_done - setup_done,
+    'preload': preload_done - app_done if sys.argv[1] == '1' else None,
+    'request': request_seconds,
+    'status': status,
+    'rss': rss,
+    'modules': len(sys.modules),
+    'preload_steps': preload,
+}))
+'''
+
+
+class Command(BaseCommand):
+    help = 'Measure cold-start import time and resident memory of the web process per settings module'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--settings-modules', nargs='+',
+                            default=['amazonstore.settings', 'amazonstore.settings_production'],
+                            help='Settings modules to compare')
+        parser.add_argument('--repeat', type=int, default=5,
+                            help='Fresh interpreters started per settings module')
+        parser.add_argument('--preload', action='store_true',
+                            help='Also run store.preload (needs the database for the cache steps)')
+        parser.add_argument('--request', default='',
+                            help='Path of a first request to time after startup, e.g. /')
+
+    def sample(self, settings_module, options):
+        env = {**os.environ, 'DJANGO_SETTINGS_MODULE': settings_module, 'DJANGO_PRELOAD': '0'}
+        started = time.perf_counter()
+        result = subprocess.run(
+            [sys.executable, '-c', CHILD, '1' if options['preload'] else '0', options['request']],
+            cwd=settings.BASE_DIR, env=env, capture_output=True, text=True,
+        )
+        wall = time.perf_counter() - started
+        if result.returncode:
+            raise CommandError(f'{settings_module} failed to start:\n{result.stderr}')
+        sample = json.loads(result.stdout.strip().splitlines()[-1])
+        sample['wall'] = wall
+        if sample['status'] is not None and sample['status'] >= 400:
+            raise CommandError(f"{settings_module}: {options['request']} returned {sample['status']}")
+        return sample
+
+    def handle(self, *args, **options):
+        columns = ['wall', 'setup', 'app', 'preload', 'request']
+        self.stdout.write(
+            f"{'settings':40} " + ' '.join(f'{name + " ms":>11}' for name in columns)
+            + f" {'RSS MiB':>9} {'modules':>8}"
+        )
+        for settings_module in options['settings_modules']:
+            samples = [self.sample(settings_module, options) for _ in range(options['repeat'])]
+
+            def median(name):
+                values = [s[name] for s in samples if isinstance(s[name], (int, float))]
+                return statistics.median(values) if values else None
+
+            timings = ' '.join(
+                f'{median(name) * 1000:11.1f}' if median(name) is not None else f'{"-":>11}'
+                for name in columns
+            )
+            self.stdout.write(
+                f'{settings_module:40} {timings} {median("rss") / 2 ** 20:9.1f} {median("modules"):8.0f}'
+            )
+            skipped = {step: value for step, value in samples[-1]['preload_steps'].items()
+                       if isinstance(value, str)}
+            if skipped:
+                self.stdout.write(self.style.WARNING(f'  preload steps {skipped}'))
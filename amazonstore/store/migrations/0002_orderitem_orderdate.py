@@ -0,0 +1,35 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0001_initial"),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name="order",
+            name="OrderDate",
+            field=models.DateField(db_index=True),
+        ),
+        migrations.AddField(
+            model_name="orderitem",
+            name="OrderDate",
+            field=models.DateField(db_index=True, null=True),
+        ),
+        migrations.RunSQL(
+            sql="""
+                SET CONSTRAINTS ALL IMMEDIATE;
+                UPDATE "OrderItems" SET "OrderDate" = o."OrderDate"
+                FROM "Orders" o
+                WHERE o."OrderID" = "OrderItems"."OrderID"
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name="orderitem",
+            name="OrderDate",
+            field=models.DateField(db_index=True),
+        ),
+    ]
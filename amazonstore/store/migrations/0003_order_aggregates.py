@@ -0,0 +1,44 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0002_orderitem_orderdate"),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name="order",
+            name="item_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="unit_count",
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name="order",
+            name="items_total",
+            field=models.DecimalField(decimal_places=2, default=0, max_digits=14),
+        ),
+        migrations.RunSQL(
+            sql="""
+                UPDATE "Orders" SET
+                    item_count = a.item_count,
+                    unit_count = a.unit_count,
+                    items_total = a.items_total
+                FROM (
+                    SELECT "OrderID",
+                           COUNT(*) AS item_count,
+                           SUM("Quantity") AS unit_count,
+                           SUM("LineTotal") AS items_total
+                    FROM "OrderItems"
+                    GROUP BY "OrderID"
+                ) a
+                WHERE a."OrderID" = "Orders"."OrderID"
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,167 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+ORDER_STATUS_CODES = [
+    ('Delivered', 1),
+    ('Pending', 2),
+    ('Shipped', 3),
+    ('Cancelled', 4),
+    ('Returned', 5),
+]
+
+PAYMENT_METHOD_CODES = [
+    ('Debit Card', 1),
+    ('Credit Card', 2),
+    ('Amazon Pay', 3),
+    ('UPI', 4),
+    ('Net Banking', 5),
+    ('Cash on Delivery', 6),
+]
+
+
+def labels_to_codes_sql(column, mapping):
+    cases = ' '.join(f"WHEN '{label}' THEN '{code}'" for label, code in mapping)
+    return f'UPDATE "Orders" SET "{column}" = CASE "{column}" {cases} END'
+
+
+def codes_to_labels_sql(column, mapping):
+    cases = ' '.join(f"WHEN '{code}' THEN '{label}'" for label, code in mapping)
+    return f'UPDATE "Orders" SET "{column}" = CASE "{column}" {cases} END'
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0003_order_aggregates"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="Location",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                ("City", models.CharField(max_length=255)),
+                ("State", models.CharField(max_length=255)),
+                ("Country", models.CharField(max_length=255)),
+            ],
+            options={
+                "db_table": "Locations",
+                "ordering": ["Country", "State", "City"],
+                "unique_together": {("City", "State", "Country")},
+            },
+        ),
+        migrations.AddField(
+            model_name="customer",
+            name="location",
+            field=models.ForeignKey(
+                db_column="LocationID",
+                null=True,
+                on_delete=django.db.models.deletion.CASCADE,
+                to="store.location",
+            ),
+        ),
+        migrations.RunSQL(
+            sql="""
+                SET CONSTRAINTS ALL IMMEDIATE;
+                INSERT INTO "Locations" ("City", "State", "Country")
+                SELECT DISTINCT "City", "State", "Country" FROM "Customers";
+                UPDATE "Customers" c SET "LocationID" = l.id
+                FROM "Locations" l
+                WHERE l."City" = c."City" AND l."State" = c."State" AND l."Country" = c."Country";
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+        migrations.AlterField(
+            model_name="customer",
+            name="location",
+            field=models.ForeignKey(
+                db_column="LocationID",
+                on_delete=django.db.models.deletion.CASCADE,
+                to="store.location",
+            ),
+        ),
+        # Unapplying re-adds City/State/Country as nullable columns, copies the
+        # values back from Locations and only then makes them NOT NULL again
+        migrations.AlterField(
+            model_name="customer",
+            name="City",
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name="customer",
+            name="State",
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.AlterField(
+            model_name="customer",
+            name="Country",
+            field=models.CharField(max_length=255, null=True),
+        ),
+        migrations.RunSQL(
+            sql=migrations.RunSQL.noop,
+            reverse_sql="""
+                SET CONSTRAINTS ALL IMMEDIATE;
+                UPDATE "Customers" c SET "City" = l."City", "State" = l."State", "Country" = l."Country"
+                FROM "Locations" l
+                WHERE l.id = c."LocationID";
+            """,
+        ),
+        migrations.RemoveField(
+            model_name="customer",
+            name="City",
+        ),
+        migrations.RemoveField(
+            model_name="customer",
+            name="State",
+        ),
+        migrations.RemoveField(
+            model_name="customer",
+            name="Country",
+        ),
+        migrations.RunSQL(
+            sql=[
+                labels_to_codes_sql("OrderStatus", ORDER_STATUS_CODES),
+                labels_to_codes_sql("PaymentMethod", PAYMENT_METHOD_CODES),
+            ],
+            reverse_sql=[
+                codes_to_labels_sql("OrderStatus", ORDER_STATUS_CODES),
+                codes_to_labels_sql("PaymentMethod", PAYMENT_METHOD_CODES),
+            ],
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="OrderStatus",
+            field=models.SmallIntegerField(
+                choices=[
+                    (1, "Delivered"),
+                    (2, "Pending"),
+                    (3, "Shipped"),
+                    (4, "Cancelled"),
+                    (5, "Returned"),
+                ]
+            ),
+        ),
+        migrations.AlterField(
+            model_name="order",
+            name="PaymentMethod",
+            field=models.SmallIntegerField(
+                choices=[
+                    (1, "Debit Card"),
+                    (2, "Credit Card"),
+                    (3, "Amazon Pay"),
+                    (4, "UPI"),
+                    (5, "Net Banking"),
+                    (6, "Cash on Delivery"),
+                ]
+            ),
+        ),
+    ]
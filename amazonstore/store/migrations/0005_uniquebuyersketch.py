@@ -0,0 +1,43 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ("store", "0004_location_and_order_codes"),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name="UniqueBuyerSketch",
+            fields=[
+                (
+                    "id",
+                    models.BigAutoField(
+                        auto_created=True,
+                        primary_key=True,
+                        serialize=False,
+                        verbose_name="ID",
+                    ),
+                ),
+                (
+                    "Dimension",
+                    models.CharField(
+                        choices=[
+                            ("all", "All"),
+                            ("country", "Country"),
+                            ("category", "Category"),
+                        ],
+                        max_length=10,
+                    ),
+                ),
+                ("Month", models.DateField()),
+                ("Key", models.CharField(blank=True, max_length=255)),
+                ("Registers", models.BinaryField()),
+            ],
+            options={
+                "db_table": "UniqueBuyerSketches",
+                "unique_together": {("Dimension", "Month", "Key")},
+            },
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0005_uniquebuyersketch'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='location',
+            index=models.Index(fields=['Country'], name='Locations_Country_643f11_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['OrderStatus', '-OrderDate'], name='Orders_OrderSt_d6dc23_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='order',
+            index=models.Index(fields=['PaymentMethod', '-OrderDate'], name='Orders_Payment_e6f095_idx'),
+        ),
+    ]
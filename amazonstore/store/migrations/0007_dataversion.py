@@ -0,0 +1,22 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_admin_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='DataVersion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Version', models.BigIntegerField(default=0)),
+                ('UpdatedAt', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'DataVersions',
+            },
+        ),
+    ]
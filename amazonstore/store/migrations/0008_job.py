@@ -0,0 +1,37 @@
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0007_dataversion'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Job',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('JobType', models.CharField(max_length=50)),
+                ('Payload', models.JSONField(blank=True, default=dict)),
+                ('Status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('succeeded', 'Succeeded'), ('failed', 'Failed')], default='queued', max_length=10)),
+                ('Priority', models.SmallIntegerField(default=0)),
+                ('Attempts', models.IntegerField(default=0)),
+                ('MaxAttempts', models.IntegerField(default=3)),
+                ('Progress', models.FloatField(default=0)),
+                ('ProgressMessage', models.CharField(blank=True, max_length=255)),
+                ('Error', models.TextField(blank=True)),
+                ('LockedBy', models.CharField(blank=True, max_length=100)),
+                ('LockedAt', models.DateTimeField(blank=True, null=True)),
+                ('RunAfter', models.DateTimeField(default=django.utils.timezone.now)),
+                ('CreatedAt', models.DateTimeField(auto_now_add=True)),
+                ('FinishedAt', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'Jobs',
+                'ordering': ['-CreatedAt'],
+                'indexes': [models.Index(condition=models.Q(('Status', 'queued')), fields=['-Priority', 'RunAfter'], name='jobs_queued_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,52 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0008_job'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ArchivedOrder',
+            fields=[
+                ('OrderID', models.CharField(max_length=20, primary_key=True, serialize=False)),
+                ('OrderDate', models.DateField(db_index=True)),
+                ('PaymentMethod', models.SmallIntegerField(choices=[(1, 'Debit Card'), (2, 'Credit Card'), (3, 'Amazon Pay'), (4, 'UPI'), (5, 'Net Banking'), (6, 'Cash on Delivery')])),
+                ('OrderStatus', models.SmallIntegerField(choices=[(1, 'Delivered'), (2, 'Pending'), (3, 'Shipped'), (4, 'Cancelled'), (5, 'Returned')])),
+                ('ShippingCost', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('TotalAmount', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('item_count', models.IntegerField(default=0)),
+                ('unit_count', models.IntegerField(default=0)),
+                ('items_total', models.DecimalField(decimal_places=2, default=0, max_digits=14)),
+                ('Items', models.BinaryField()),
+                ('ArchivedAt', models.DateTimeField(auto_now_add=True)),
+                ('customer', models.ForeignKey(db_column='CustomerID', on_delete=django.db.models.deletion.CASCADE, to='store.customer')),
+            ],
+            options={
+                'db_table': 'ArchivedOrders',
+                'ordering': ['-OrderDate'],
+            },
+        ),
+        migrations.CreateModel(
+            name='ArchiveMonthlyTotal',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Month', models.DateField()),
+                ('OrderStatus', models.SmallIntegerField(choices=[(1, 'Delivered'), (2, 'Pending'), (3, 'Shipped'), (4, 'Cancelled'), (5, 'Returned')])),
+                ('PaymentMethod', models.SmallIntegerField(choices=[(1, 'Debit Card'), (2, 'Credit Card'), (3, 'Amazon Pay'), (4, 'UPI'), (5, 'Net Banking'), (6, 'Cash on Delivery')])),
+                ('Orders', models.IntegerField(default=0)),
+                ('Items', models.IntegerField(default=0)),
+                ('Units', models.IntegerField(default=0)),
+                ('Revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+                ('MinAmount', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+                ('MaxAmount', models.DecimalField(decimal_places=2, max_digits=12, null=True)),
+            ],
+            options={
+                'db_table': 'ArchiveMonthlyTotals',
+                'unique_together': {('Month', 'OrderStatus', 'PaymentMethod')},
+            },
+        ),
+    ]
@@ -0,0 +1,49 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0009_order_archive'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='LeaderboardEntry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('Board', models.SmallIntegerField(choices=[(1, 'Products'), (2, 'Customers'), (3, 'Sellers')])),
+                ('Period', models.CharField(max_length=7)),
+                ('Key', models.CharField(max_length=50)),
+                ('Orders', models.IntegerField(default=0)),
+                ('Units', models.IntegerField(default=0)),
+                ('Revenue', models.DecimalField(decimal_places=2, default=0, max_digits=16)),
+            ],
+            options={
+                'db_table': 'Leaderboards',
+                'indexes': [models.Index(fields=['Board', 'Period', '-Units'], name='leaderboard_units_idx'), models.Index(fields=['Board', 'Period', '-Revenue'], name='leaderboard_revenue_idx')],
+                'unique_together': {('Board', 'Period', 'Key')},
+            },
+        ),
+        migrations.RunSQL(
+            # live orders only; archived orders are folded in by reconcile_leaderboards --fix
+            sql="""
+                INSERT INTO "Leaderboards" ("Board", "Period", "Key", "Orders", "Units", "Revenue")
+                SELECT 1, p.period, i."ProductID", COUNT(*), SUM(i."Quantity"), SUM(i."LineTotal")
+                FROM "OrderItems" i
+                CROSS JOIN LATERAL (VALUES ('all'), (to_char(i."OrderDate", 'YYYY-MM'))) p(period)
+                GROUP BY p.period, i."ProductID"
+                UNION ALL
+                SELECT 3, p.period, i."SellerID", COUNT(*), SUM(i."Quantity"), SUM(i."LineTotal")
+                FROM "OrderItems" i
+                CROSS JOIN LATERAL (VALUES ('all'), (to_char(i."OrderDate", 'YYYY-MM'))) p(period)
+                GROUP BY p.period, i."SellerID"
+                UNION ALL
+                SELECT 2, p.period, o."CustomerID", COUNT(*), 0, SUM(o."TotalAmount")
+                FROM "Orders" o
+                CROSS JOIN LATERAL (VALUES ('all'), (to_char(o."OrderDate", 'YYYY-MM'))) p(period)
+                GROUP BY p.period, o."CustomerID"
+            """,
+            reverse_sql=migrations.RunSQL.noop,
+        ),
+    ]
@@ -0,0 +1,23 @@
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_leaderboards'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='orderitem',
+            index=models.Index(fields=['product', 'seller'], name='orderitem_product_seller_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productseller',
+            index=models.Index(condition=models.Q(('IsActive', True)), fields=['product', 'seller'], name='productseller_active_prod_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='productseller',
+            index=models.Index(condition=models.Q(('IsActive', True)), fields=['seller', 'product'], name='productseller_active_sell_idx'),
+        ),
+    ]
@@ -0,0 +1,17 @@
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0012_orderitem_orderdate_not_editable'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='customer',
+            name='location',
+            field=models.ForeignKey(db_column='LocationID', on_delete=django.db.models.deletion.PROTECT, to='store.location'),
+        ),
+    ]
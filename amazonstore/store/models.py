@@ -1,14 +1,28 @@
 from django.db import models
+from django.utils import timezone
 
 from django.core.validators import MinValueValidator, MaxValueValidator
 
-class Customer(models.Model):
-    CustomerID = models.CharField(max_length=20, primary_key=True)
-    CustomerName = models.CharField(max_length=255)
+class Location(models.Model):
     City = models.CharField(max_length=255)
     State = models.CharField(max_length=255)
     Country = models.CharField(max_length=255)
 
+    class Meta:
+        db_table = 'Locations'
+        unique_together = ('City', 'State', 'Country')
+        ordering = ['Country', 'State', 'City']
+        indexes = [models.Index(fields=['Country'])]
+
+    def __str__(self):
+        return f"{self.City}, {self.State}, {self.Country}"
+
+
+class Customer(models.Model):
+    CustomerID = models.CharField(max_length=20, primary_key=True)
+    CustomerName = models.CharField(max_length=255)
+    location = models.ForeignKey(Location, on_delete=models.PROTECT, db_column='LocationID')
+
 
     class Meta:
         db_table = 'Customers'
@@ -72,42 +86,77 @@ class ProductSeller(models.Model):
     class Meta:
         db_table = 'ProductSellers'
         unique_together = ('product', 'seller')
+        # listing lookups only ever ask for active rows; see store.catalog
+        indexes = [
+            models.Index(fields=['product', 'seller'], condition=models.Q(IsActive=True),
+                         name='productseller_active_prod_idx'),
+            models.Index(fields=['seller', 'product'], condition=models.Q(IsActive=True),
+                         name='productseller_active_sell_idx'),
+        ]
 
     def __str__(self):
-        return f"{self.product.ProductID} - {self.seller.SellerID}"
+        return f"{self.product_id} - {self.seller_id}"
 
 class Order(models.Model):
     ORDER_STATUS_CHOICES = [
-        ('Delivered', 'Delivered'),
-        ('Pending', 'Pending'),
-        ('Shipped', 'Shipped'),
-        ('Cancelled', 'Cancelled'),
-        ('Returned', 'Returned'),
+        (1, 'Delivered'),
+        (2, 'Pending'),
+        (3, 'Shipped'),
+        (4, 'Cancelled'),
+        (5, 'Returned'),
     ]
 
     PAYMENT_METHOD_CHOICES = [
-        ('Debit Card', 'Debit Card'),
-        ('Credit Card', 'Credit Card'),
-        ('Amazon Pay', 'Amazon Pay'),
-        ('UPI', 'UPI'),
-        ('Net Banking', 'Net Banking'),
-        ('Cash on Delivery', 'Cash on Delivery'),
+        (1, 'Debit Card'),
+        (2, 'Credit Card'),
+        (3, 'Amazon Pay'),
+        (4, 'UPI'),
+        (5, 'Net Banking'),
+        (6, 'Cash on Delivery'),
     ]
 
+    ORDER_STATUS_LABELS = dict(ORDER_STATUS_CHOICES)
+    ORDER_STATUS_CODES = {label: code for code, label in ORDER_STATUS_CHOICES}
+    PAYMENT_METHOD_LABELS = dict(PAYMENT_METHOD_CHOICES)
+    PAYMENT_METHOD_CODES = {label: code for code, label in PAYMENT_METHOD_CHOICES}
+
     OrderID = models.CharField(max_length=20, primary_key=True)
-    OrderDate = models.DateField()
+    OrderDate = models.DateField(db_index=True)
     customer = models.ForeignKey(Customer, on_delete=models.CASCADE, db_column='CustomerID')
-    PaymentMethod = models.CharField(max_length=20, choices=PAYMENT_METHOD_CHOICES)
-    OrderStatus = models.CharField(max_length=20, choices=ORDER_STATUS_CHOICES)
+    PaymentMethod = models.SmallIntegerField(choices=PAYMENT_METHOD_CHOICES)
+    OrderStatus = models.SmallIntegerField(choices=ORDER_STATUS_CHOICES)
     ShippingCost = models.DecimalField(max_digits=10, decimal_places=2)
     TotalAmount = models.DecimalField(max_digits=12, decimal_places=2)
 
+    # Denormalized from OrderItems, see store.aggregates
+    item_count = models.IntegerField(default=0)
+    unit_count = models.IntegerField(default=0)
+    items_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+
+    AGGREGATE_FIELDS = ('item_count', 'unit_count', 'items_total')
+
     class Meta:
         db_table = 'Orders'
         ordering = ['-OrderDate']
+        indexes = [
+            models.Index(fields=['OrderStatus', '-OrderDate']),
+            models.Index(fields=['PaymentMethod', '-OrderDate']),
+        ]
 
     def __str__(self):
-        return f"Order {self.OrderID} - {self.OrderStatus}"
+        return f"Order {self.OrderID} - {self.get_OrderStatus_display()}"
+
+    def save(self, *args, **kwargs):
+        # The aggregates are written only by the UPDATEs in store.aggregates, so
+        # saving an instance loaded before its items changed can't undo them
+        if not self._state.adding and not kwargs.get('force_insert') and kwargs.get('update_fields') is None:
+            deferred = self.get_deferred_fields()
+            kwargs['update_fields'] = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.AGGREGATE_FIELDS
+                and field.attname not in deferred
+            ]
+        super().save(*args, **kwargs)
 
 
 class OrderItem(models.Model):
@@ -115,6 +164,7 @@ class OrderItem(models.Model):
     order = models.ForeignKey(Order, on_delete=models.CASCADE, db_column='OrderID')
     product = models.ForeignKey(Product, on_delete=models.CASCADE, db_column='ProductID')
     seller = models.ForeignKey(Seller, on_delete=models.CASCADE, db_column='SellerID')
+    OrderDate = models.DateField(db_index=True, editable=False)  # copy of order.OrderDate, set by store.signals; partition key
     Quantity = models.IntegerField()
     UnitPrice = models.DecimalField(max_digits=10, decimal_places=2)
     Discount = models.DecimalField(max_digits=5, decimal_places=4, 
@@ -125,6 +175,161 @@ class OrderItem(models.Model):
     class Meta:
         db_table = 'OrderItems'
         unique_together = ('order', 'product', 'seller')
+        indexes = [models.Index(fields=['product', 'seller'], name='orderitem_product_seller_idx')]
+
+    def __str__(self):
+        return f"OrderItem {self.OrderItemID} for {self.order_id}"
+
+
+class ArchivedOrder(models.Model):
+    """Cold copy of an Order moved out by store.archive; items are zlib-compressed JSON."""
+    OrderID = models.CharField(max_length=20, primary_key=True)
+    OrderDate = models.DateField(db_index=True)
+    customer = models.ForeignKey(Customer, on_delete=models.CASCADE, db_column='CustomerID')
+    PaymentMethod = models.SmallIntegerField(choices=Order.PAYMENT_METHOD_CHOICES)
+    OrderStatus = models.SmallIntegerField(choices=Order.ORDER_STATUS_CHOICES)
+    ShippingCost = models.DecimalField(max_digits=10, decimal_places=2)
+    TotalAmount = models.DecimalField(max_digits=12, decimal_places=2)
+    item_count = models.IntegerField(default=0)
+    unit_count = models.IntegerField(default=0)
+    items_total = models.DecimalField(max_digits=14, decimal_places=2, default=0)
+    Items = models.BinaryField()
+    ArchivedAt = models.DateTimeField(auto_now_add=True)
+
+    class Meta:
+        db_table = 'ArchivedOrders'
+        ordering = ['-OrderDate']
+
+    def __str__(self):
+        return f"Archived order {self.OrderID}"
+
+
+class ArchiveMonthlyTotal(models.Model):
+    """Pre-aggregated totals of archived orders per month, status and payment method."""
+    Month = models.DateField()
+    OrderStatus = models.SmallIntegerField(choices=Order.ORDER_STATUS_CHOICES)
+    PaymentMethod = models.SmallIntegerField(choices=Order.PAYMENT_METHOD_CHOICES)
+    Orders = models.IntegerField(default=0)
+    Items = models.IntegerField(default=0)
+    Units = models.IntegerField(default=0)
+    Revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+    MinAmount = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+    MaxAmount = models.DecimalField(max_digits=12, decimal_places=2, null=True)
+
+    class Meta:
+        db_table = 'ArchiveMonthlyTotals'
+        unique_together = ('Month', 'OrderStatus', 'PaymentMethod')
+
+    def __str__(self):
+        return f"{self.Month:%Y-%m} {self.OrderStatus}/{self.PaymentMethod}: {self.Orders}"
+
+
+class LeaderboardEntry(models.Model):
+    BOARD_PRODUCTS = 1
+    BOARD_CUSTOMERS = 2
+    BOARD_SELLERS = 3
+
+    BOARD_CHOICES = [
+        (BOARD_PRODUCTS, 'Products'),
+        (BOARD_CUSTOMERS, 'Customers'),
+        (BOARD_SELLERS, 'Sellers'),
+    ]
+
+    PERIOD_ALL = 'all'
+
+    Board = models.SmallIntegerField(choices=BOARD_CHOICES)
+    Period = models.CharField(max_length=7)  # 'all' or 'YYYY-MM'
+    Key = models.CharField(max_length=50)  # ProductID, CustomerID or SellerID
+    Orders = models.IntegerField(default=0)  # order lines for products/sellers
+    Units = models.IntegerField(default=0)  # not tracked for customers
+    Revenue = models.DecimalField(max_digits=16, decimal_places=2, default=0)
+
+    class Meta:
+        db_table = 'Leaderboards'
+        unique_together = ('Board', 'Period', 'Key')
+        indexes = [
+            models.Index(fields=['Board', 'Period', '-Units'], name='leaderboard_units_idx'),
+            models.Index(fields=['Board', 'Period', '-Revenue'], name='leaderboard_revenue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.get_Board_display()} {self.Period} {self.Key}"
+
+
+class UniqueBuyerSketch(models.Model):
+    DIMENSION_ALL = 'all'
+    DIMENSION_COUNTRY = 'country'
+    DIMENSION_CATEGORY = 'category'
+
+    DIMENSION_CHOICES = [
+        (DIMENSION_ALL, 'All'),
+        (DIMENSION_COUNTRY, 'Country'),
+        (DIMENSION_CATEGORY, 'Category'),
+    ]
+
+    Dimension = models.CharField(max_length=10, choices=DIMENSION_CHOICES)
+    Month = models.DateField()
+    Key = models.CharField(max_length=255, blank=True)
+    Registers = models.BinaryField()  # HyperLogLog registers, see store.sketches
+
+    class Meta:
+        db_table = 'UniqueBuyerSketches'
+        unique_together = ('Dimension', 'Month', 'Key')
+
+    def __str__(self):
+        return f"{self.Dimension} {self.Month:%Y-%m} {self.Key}"
+
+
+class DataVersion(models.Model):
+    """Single-row stamp bumped on every store data change, see store.versioning."""
+    Version = models.BigIntegerField(default=0)
+    UpdatedAt = models.DateTimeField()
+
+    class Meta:
+        db_table = 'DataVersions'
+
+    def __str__(self):
+        return f"v{self.Version} ({self.UpdatedAt:%Y-%m-%d %H:%M:%S})"
+
+
+class Job(models.Model):
+    STATUS_QUEUED = 'queued'
+    STATUS_RUNNING = 'running'
+    STATUS_SUCCEEDED = 'succeeded'
+    STATUS_FAILED = 'failed'
+
+    STATUS_CHOICES = [
+        (STATUS_QUEUED, 'Queued'),
+        (STATUS_RUNNING, 'Running'),
+        (STATUS_SUCCEEDED, 'Succeeded'),
+        (STATUS_FAILED, 'Failed'),
+    ]
+
+    JobType = models.CharField(max_length=50)
+    Payload = models.JSONField(default=dict, blank=True)
+    Status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=STATUS_QUEUED)
+    Priority = models.SmallIntegerField(default=0)
+    Attempts = models.IntegerField(default=0)
+    MaxAttempts = models.IntegerField(default=3)
+    Progress = models.FloatField(default=0)
+    ProgressMessage = models.CharField(max_length=255, blank=True)
+    Error = models.TextField(blank=True)
+    LockedBy = models.CharField(max_length=100, blank=True)
+    LockedAt = models.DateTimeField(blank=True, null=True)
+    RunAfter = models.DateTimeField(default=timezone.now)
+    CreatedAt = models.DateTimeField(auto_now_add=True)
+    FinishedAt = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        db_table = 'Jobs'
+        ordering = ['-CreatedAt']
+        indexes = [
+            models.Index(
+                fields=['-Priority', 'RunAfter'],
+                condition=models.Q(Status='queued'),
+                name='jobs_queued_idx',
+            ),
+        ]
 
     def __str__(self):
-        return f"OrderItem {self.OrderItemID} for {self.order.OrderID}"
\ No newline at end of file
+        return f"Job {self.pk} {self.JobType} ({self.Status})"
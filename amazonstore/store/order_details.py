@@ -0,0 +1,112 @@
+import re
+
+from django.db.models import Prefetch, prefetch_related_objects
+
+from . import dimensions
+from .models import Order, OrderItem
+
+
+MAX_ORDER_IDS = 500
+ORDER_ID_PATTERN = re.compile(r'[A-Za-z0-9_-]+')
+ORDER_ID_MAX_LENGTH = Order._meta.get_field('OrderID').max_length
+
+
+def is_order_id(value):
+    return len(value) <= ORDER_ID_MAX_LENGTH and ORDER_ID_PATTERN.fullmatch(value) is not None
+
+
+def _money(value):
+    return None if value is None else str(value)
+
+
+def load_orders(order_ids):
+    """
+    Fetch orders with customer, location and items in two queries regardless of count.
+
+    Brand, category and seller names come from the dimension cache, so the
+    item query selects only their ids.
+    """
+    items = (
+        OrderItem.objects
+        .select_related('product')
+        .only(
+            'OrderItemID', 'order_id', 'seller_id', 'Quantity', 'UnitPrice',
+            'Discount', 'Tax', 'LineTotal',
+            'product__ProductID', 'product__ProductName',
+            'product__Brand_id', 'product__Category_id',
+        )
+        .order_by('OrderItemID')
+    )
+    orders = list(
+        Order.objects
+        .filter(pk__in=order_ids)
+        .select_related('customer__location')
+        .only(
+            'OrderID', 'OrderDate', 'OrderStatus', 'PaymentMethod', 'ShippingCost',
+            'TotalAmount', 'item_count', 'unit_count', 'items_total',
+            'customer__CustomerID', 'customer__CustomerName',
+            'customer__location__City', 'customer__location__State',
+            'customer__location__Country',
+        )
+    )
+    # Prefetched after the orders are loaded so the item query can also filter
+    # on their dates, which limits it to the matching OrderItems partitions
+    prefetch_related_objects(orders, Prefetch(
+        'orderitem_set',
+        queryset=items.filter(OrderDate__in={order.OrderDate for order in orders}),
+        to_attr='items',
+    ))
+    return orders
+
+
+def order_to_dict(order, dims):
+    customer = order.customer
+    location = customer.location
+    return {
+        'id': order.OrderID,
+        'date': order.OrderDate.isoformat(),
+        'status': order.get_OrderStatus_display(),
+        'payment_method': order.get_PaymentMethod_display(),
+        'shipping_cost': _money(order.ShippingCost),
+        'total': _money(order.TotalAmount),
+        'item_count': order.item_count,
+        'unit_count': order.unit_count,
+        'items_total': _money(order.items_total),
+        'customer': {
+            'id': customer.CustomerID,
+            'name': customer.CustomerName,
+            'city': location.City,
+            'state': location.State,
+            'country': location.Country,
+        },
+        'items': [
+            {
+                'id': item.OrderItemID,
+                'product': {
+                    'id': item.product.ProductID,
+                    'name': item.product.ProductName,
+                    'brand': dims.brands.label(item.product.Brand_id),
+                    'category': dims.categories.label(item.product.Category_id),
+                },
+                'seller': {
+                    'id': item.seller_id,
+                    'name': dims.sellers.label(item.seller_id),
+                },
+                'quantity': item.Quantity,
+                'unit_price': _money(item.UnitPrice),
+                'discount': _money(item.Discount),
+                'tax': _money(item.Tax),
+                'line_total': _money(item.LineTotal),
+            }
+            for item in order.items
+        ],
+    }
+
+
+def order_details(order_ids):
+    """Return (orders in request order, ids that were not found)."""
+    dims = dimensions.get()
+    found = {order.OrderID: order for order in load_orders(order_ids)}
+    orders = [order_to_dict(found[pk], dims) for pk in order_ids if pk in found]
+    missing = [pk for pk in order_ids if pk not in found]
+    return orders, missing
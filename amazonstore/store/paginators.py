@@ -0,0 +1,57 @@
+import json
+
+from django.core.paginator import Paginator
+from django.db import connections
+from django.utils.functional import cached_property
+
+
+class EstimatedCountPaginator(Paginator):
+    """
+    Paginator that avoids COUNT(*) on large PostgreSQL tables.
+
+    Unfiltered querysets use the planner's row estimate from pg_class, filtered
+    ones the estimate from EXPLAIN. Only when the estimate is below
+    `exact_threshold` is an exact count run.
+    """
+
+    exact_threshold = 100_000
+
+    def _estimate(self):
+        queryset = self.object_list
+        connection = connections[queryset.db]
+        if connection.vendor != 'postgresql':
+            return None
+
+        with connection.cursor() as cursor:
+            if not queryset.query.where:
+                # a partitioned table has no rows of its own (reltuples -1 or 0),
+                # so add up its partitions; -1 also means "never analyzed"
+                table = connection.ops.quote_name(queryset.model._meta.db_table)
+                cursor.execute(
+                    """
+                    SELECT (SUM(c.reltuples) FILTER (WHERE c.reltuples >= 0))::bigint
+                    FROM pg_class c
+                    WHERE c.relkind <> 'p'
+                      AND (c.oid = %s::regclass
+                           OR c.oid IN (SELECT inhrelid FROM pg_inherits WHERE inhparent = %s::regclass))
+                    """,
+                    [table, table],
+                )
+                row = cursor.fetchone()
+                return row[0] if row else None
+
+            sql, params = queryset.query.sql_with_params()
+            cursor.execute(f'EXPLAIN (FORMAT JSON) {sql}', params)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return plan[0]['Plan']['Plan Rows']
+
+    @cached_property
+    def count(self):
+        if not hasattr(self.object_list, 'query'):
+            return super().count
+        estimate = self._estimate()
+        if estimate is None or estimate < self.exact_threshold:
+            return super().count
+        return estimate
@@ -0,0 +1,68 @@
+"""
+Startup work for the web process, run from wsgi.py when PRELOAD_ON_STARTUP is set.
+
+With a pre-forking server loading the app in the parent (gunicorn --preload,
+uWSGI without lazy-apps) this runs once and workers inherit the result:
+URLconf and views imported, Jinja2 templates compiled, the dimension and
+typeahead caches filled. Database connections are opened only to load the
+backend and check the settings, then closed (pooled ones included) so no
+socket is shared across fork. gc.freeze() keeps the collector from touching,
+and so un-sharing, the preloaded objects in each worker.
+"""
+import gc
+import time
+
+from django.db import DatabaseError, connections
+from django.template import engines
+from django.template.backends.jinja2 import Jinja2
+from django.urls import get_resolver
+
+from . import dimensions, typeahead
+from .db_pool import close_pools
+
+
+def _timed(timings, name, func):
+    start = time.perf_counter()
+    try:
+        func()
+    except DatabaseError as exc:
+        # the database may come up after the web process; workers load lazily then
+        timings[name] = f'skipped: {exc.__class__.__name__}'
+    else:
+        timings[name] = time.perf_counter() - start
+
+
+def load_urls():
+    get_resolver().url_patterns
+
+
+def compile_templates():
+    for engine in engines.all():
+        if isinstance(engine, Jinja2):
+            for name in engine.env.list_templates():
+                engine.env.get_template(name)
+
+
+def connect_databases():
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+def warm_caches():
+    dimensions.warm()
+    for kind in typeahead.INDEXES:
+        typeahead.get_index(kind).refresh(force=True)
+
+
+def preload():
+    """Run every preload step; returns {step: seconds or 'skipped: ...'}."""
+    timings = {}
+    _timed(timings, 'urls', load_urls)
+    _timed(timings, 'templates', compile_templates)
+    _timed(timings, 'database', connect_databases)
+    _timed(timings, 'caches', warm_caches)
+    connections.close_all()
+    close_pools()
+    gc.collect()
+    gc.freeze()
+    return timings
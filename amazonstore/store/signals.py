@@ -0,0 +1,108 @@
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save, pre_save
+from django.dispatch import receiver
+
+from . import aggregates, leaderboards, typeahead, versioning
+from .models import (
+    Location, Customer, Seller, Brand, Category, Product,
+    ProductSeller, Order, OrderItem
+)
+
+
+@receiver(post_save, sender=Product)
+@receiver(post_save, sender=Customer)
+def update_typeahead_on_save(sender, instance, **kwargs):
+    transaction.on_commit(lambda: typeahead.notify_saved(instance))
+
+
+@receiver(post_delete, sender=Product)
+@receiver(post_delete, sender=Customer)
+def update_typeahead_on_delete(sender, instance, **kwargs):
+    # delete() clears instance.pk before the commit hook runs
+    pk = instance.pk
+    transaction.on_commit(lambda: typeahead.notify_deleted(sender, pk))
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def update_order_aggregates(sender, instance, **kwargs):
+    aggregates.order_items_changed(instance.order_id)
+
+
+@receiver(pre_save, sender=OrderItem)
+def copy_order_date(sender, instance, **kwargs):
+    # OrderItem.OrderDate is the partition key and always follows its order
+    instance.OrderDate = instance.order.OrderDate
+
+
+@receiver(pre_save, sender=Order)
+def remember_order_date(sender, instance, **kwargs):
+    if instance._state.adding or instance.pk is None:
+        instance._previous_order_date = None
+        return
+    instance._previous_order_date = Order.objects.filter(pk=instance.pk).values_list(
+        'OrderDate', flat=True
+    ).first()
+
+
+@receiver(post_save, sender=Order)
+def redate_order_items(sender, instance, created, **kwargs):
+    previous = getattr(instance, '_previous_order_date', None)
+    if created or previous is None or previous == instance.OrderDate:
+        return
+    leaderboards.items_redated(instance.pk, previous, instance.OrderDate)
+    # moves the rows to the new date's partition
+    OrderItem.objects.filter(order_id=instance.pk).update(OrderDate=instance.OrderDate)
+
+
+@receiver(pre_save, sender=OrderItem)
+def remember_order_item(sender, instance, **kwargs):
+    leaderboards.remember_item(instance)
+
+
+@receiver(post_save, sender=OrderItem)
+def update_item_leaderboards(sender, instance, created, **kwargs):
+    leaderboards.item_saved(instance, created)
+
+
+@receiver(post_delete, sender=OrderItem)
+def remove_item_from_leaderboards(sender, instance, **kwargs):
+    leaderboards.item_deleted(instance)
+
+
+@receiver(pre_save, sender=Order)
+def remember_order(sender, instance, **kwargs):
+    leaderboards.remember_order(instance)
+
+
+@receiver(post_save, sender=Order)
+def update_order_leaderboards(sender, instance, created, **kwargs):
+    leaderboards.order_saved(instance, created)
+
+
+@receiver(post_delete, sender=Order)
+def remove_order_from_leaderboards(sender, instance, **kwargs):
+    leaderboards.order_deleted(instance)
+
+
+VERSIONED_MODELS = (
+    Location, Customer, Seller, Brand, Category, Product,
+    ProductSeller, Order, OrderItem,
+)
+
+
+DIMENSION_MODELS = (Brand, Category, Seller)
+TYPEAHEAD_MODELS = (Product, Customer)
+
+
+def bump_data_version(sender, **kwargs):
+    versioning.data_changed()
+    if sender in DIMENSION_MODELS:
+        versioning.data_changed(versioning.DIMENSIONS_ID)
+    if sender in TYPEAHEAD_MODELS:
+        versioning.data_changed(versioning.TYPEAHEAD_ID)
+
+
+for model in VERSIONED_MODELS:
+    post_save.connect(bump_data_version, sender=model, dispatch_uid=f'data_version_save_{model.__name__}')
+    post_delete.connect(bump_data_version, sender=model, dispatch_uid=f'data_version_delete_{model.__name__}')
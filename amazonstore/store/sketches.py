@@ -0,0 +1,230 @@
+"""
+HyperLogLog sketches of unique buyers per (month, country) and (month, category).
+
+Each bucket keeps 2**PRECISION one-byte registers (4 KiB at the default
+precision), so merging any number of months is a register-wise max and the
+estimate's relative standard error is about 1.04 / sqrt(2**PRECISION) (~1.6%).
+"""
+import hashlib
+import math
+from collections import defaultdict
+from datetime import date
+from itertools import chain
+
+from django.db import transaction
+
+from .archive import unpack_items
+from .models import ArchivedOrder, Order, OrderItem, Product, UniqueBuyerSketch
+from .partitioning import add_months
+
+
+PRECISION = 12
+REGISTERS = 1 << PRECISION
+STANDARD_ERROR = 1.04 / math.sqrt(REGISTERS)
+
+DIMENSION_ALL = UniqueBuyerSketch.DIMENSION_ALL
+DIMENSION_COUNTRY = UniqueBuyerSketch.DIMENSION_COUNTRY
+DIMENSION_CATEGORY = UniqueBuyerSketch.DIMENSION_CATEGORY
+
+
+def _alpha(m):
+    if m == 16:
+        return 0.673
+    if m == 32:
+        return 0.697
+    if m == 64:
+        return 0.709
+    return 0.7213 / (1 + 1.079 / m)
+
+
+class HyperLogLog:
+    __slots__ = ('registers',)
+
+    def __init__(self, registers=None):
+        if registers is None:
+            self.registers = bytearray(REGISTERS)
+        else:
+            self.registers = bytearray(registers)
+            if len(self.registers) != REGISTERS:
+                raise ValueError(f'Expected {REGISTERS} registers, got {len(self.registers)}')
+
+    def add(self, value):
+        h = int.from_bytes(hashlib.blake2b(str(value).encode(), digest_size=8).digest(), 'big')
+        index = h >> (64 - PRECISION)
+        rest = h & ((1 << (64 - PRECISION)) - 1)
+        rank = (64 - PRECISION) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other):
+        self.registers = bytearray(map(max, self.registers, other.registers))
+        return self
+
+    def estimate(self):
+        m = REGISTERS
+        raw = _alpha(m) * m * m / sum(2.0 ** -r for r in self.registers)
+        zeros = self.registers.count(0)
+        if raw <= 2.5 * m and zeros:
+            return round(m * math.log(m / zeros))
+        return round(raw)
+
+    def to_bytes(self):
+        return bytes(self.registers)
+
+
+def month_of(value):
+    return date(value.year, value.month, 1)
+
+
+class SketchBuffer:
+    """Accumulates sketches in memory during an import and merges them into the table on flush."""
+
+    def __init__(self):
+        self.sketches = defaultdict(HyperLogLog)
+
+    def add(self, order_date, customer_id, country, category):
+        month = month_of(order_date)
+        self.sketches[(DIMENSION_ALL, month, '')].add(customer_id)
+        self.sketches[(DIMENSION_COUNTRY, month, country)].add(customer_id)
+        self.sketches[(DIMENSION_CATEGORY, month, category)].add(customer_id)
+
+    @transaction.atomic
+    def flush(self):
+        if not self.sketches:
+            return 0
+
+        keys = sorted(self.sketches)
+        # A concurrent import may be creating the same rows: insert whatever is
+        # missing without failing on conflicts, then lock every row and merge.
+        # The merge is a register-wise max, so re-merging a row inserted here
+        # changes nothing.
+        UniqueBuyerSketch.objects.bulk_create(
+            [
+                UniqueBuyerSketch(Dimension=dimension, Month=month, Key=key,
+                                  Registers=self.sketches[(dimension, month, key)].to_bytes())
+                for dimension, month, key in keys
+            ],
+            batch_size=500,
+            ignore_conflicts=True,
+        )
+        rows = (
+            UniqueBuyerSketch.objects
+            .select_for_update()
+            .filter(Month__in={month for _, month, _ in keys})
+            .order_by('Dimension', 'Month', 'Key')
+        )
+        to_update = []
+        for row in rows:
+            sketch = self.sketches.get((row.Dimension, row.Month, row.Key))
+            if sketch is None:
+                continue
+            registers = sketch.merge(HyperLogLog(row.Registers)).to_bytes()
+            if registers != bytes(row.Registers):
+                row.Registers = registers
+                to_update.append(row)
+
+        UniqueBuyerSketch.objects.bulk_update(to_update, ['Registers'], batch_size=500)
+        count = len(self.sketches)
+        self.sketches.clear()
+        return count
+
+
+def _sketch_rows(dimension, date_from=None, date_to=None, key=None):
+    rows = UniqueBuyerSketch.objects.filter(Dimension=dimension)
+    if date_from:
+        rows = rows.filter(Month__gte=month_of(date_from))
+    if date_to:
+        rows = rows.filter(Month__lte=date_to)
+    if key is not None:
+        rows = rows.filter(Key=key)
+    return rows
+
+
+def unique_buyers(dimension, date_from=None, date_to=None, key=None):
+    """Estimated unique buyers per key, merged over every month overlapping the date range."""
+    merged = {}
+    for row_key, registers in _sketch_rows(dimension, date_from, date_to, key).values_list('Key', 'Registers'):
+        sketch = HyperLogLog(registers)
+        if row_key in merged:
+            merged[row_key].merge(sketch)
+        else:
+            merged[row_key] = sketch
+    return {k: sketch.estimate() for k, sketch in merged.items()}
+
+
+def unique_buyers_by_month(dimension=DIMENSION_ALL, key='', date_from=None, date_to=None, limit=None):
+    """(month, estimate) for the latest `limit` months in the range, newest first."""
+    rows = _sketch_rows(dimension, date_from, date_to, key).order_by('-Month').values_list('Month', 'Registers')
+    if limit is not None:
+        rows = rows[:limit]
+    return [(month, HyperLogLog(registers).estimate()) for month, registers in rows]
+
+
+def _date_range(qs, date_field, date_from=None, date_to=None):
+    if date_from:
+        qs = qs.filter(**{f'{date_field}__gte': month_of(date_from)})
+    if date_to:
+        # sketches are monthly, so the last month is always counted whole
+        qs = qs.filter(**{f'{date_field}__lt': add_months(month_of(date_to), 1)})
+    return qs
+
+
+def archived_rows(date_from=None, date_to=None, batch_size=2000):
+    """(OrderDate, CustomerID, Country, CategoryName) per archived order item, like the OrderItem rows."""
+    categories = dict(Product.objects.order_by().values_list('ProductID', 'Category__CategoryName'))
+    orders = (
+        _date_range(ArchivedOrder.objects.order_by(), 'OrderDate', date_from, date_to)
+        .values_list('OrderDate', 'customer_id', 'customer__location__Country', 'Items')
+        .iterator(chunk_size=batch_size)
+    )
+    for order_date, customer_id, country, items in orders:
+        for item in unpack_items(items):
+            yield order_date, customer_id, country, categories.get(item['product_id'])
+
+
+def exact_unique_buyers(dimension, date_from=None, date_to=None, key=None):
+    """Distinct buyers over the same buckets, archived orders included; expensive, meant for validation."""
+    if dimension == DIMENSION_CATEGORY:
+        qs = OrderItem.objects.all()
+        date_field, key_field, customer = 'OrderDate', 'product__Category__CategoryName', 'order__customer'
+    else:
+        qs = Order.objects.all()
+        date_field, customer = 'OrderDate', 'customer'
+        key_field = 'customer__location__Country' if dimension == DIMENSION_COUNTRY else None
+
+    qs = _date_range(qs, date_field, date_from, date_to)
+    if key is not None and key_field is not None:
+        qs = qs.filter(**{key_field: key})
+
+    # live and archived orders can share buyers, so count distinct over both
+    buyers = defaultdict(set)
+    if key_field is None:
+        buyers[''].update(qs.order_by().values_list(customer, flat=True).distinct())
+    else:
+        for row_key, customer_id in qs.order_by().values_list(key_field, customer).distinct():
+            buyers[row_key].add(customer_id)
+
+    for _, customer_id, country, category in archived_rows(date_from, date_to):
+        row_key = '' if key_field is None else country if dimension == DIMENSION_COUNTRY else category
+        if key is None or key_field is None or row_key == key:
+            buyers[row_key].add(customer_id)
+    return {row_key: len(customers) for row_key, customers in buyers.items()}
+
+
+@transaction.atomic
+def rebuild(batch_size=5000):
+    """Drop all sketches and rebuild them from OrderItems and ArchivedOrders."""
+    UniqueBuyerSketch.objects.all().delete()
+    buffer = SketchBuffer()
+    rows = (
+        OrderItem.objects
+        .order_by()
+        .values_list(
+            'OrderDate', 'order__customer_id',
+            'order__customer__location__Country', 'product__Category__CategoryName',
+        )
+        .iterator(chunk_size=batch_size)
+    )
+    for order_date, customer_id, country, category in chain(rows, archived_rows(batch_size=batch_size)):
+        buffer.add(order_date, customer_id, country, category)
+    return buffer.flush()
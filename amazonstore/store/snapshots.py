@@ -0,0 +1,118 @@
+"""
+Pre-rendered copies of the dashboard, written after each import.
+
+Snapshots live under DASHBOARD_SNAPSHOT_ROOT/<version tag>/, one HTML file
+(plus a gzip copy) per pre-rendered view, so a request whose data version and
+query string match is served straight from disk.
+"""
+import gzip
+import os
+import shutil
+import tempfile
+from pathlib import Path
+
+from django.conf import settings
+from django.http import FileResponse
+from django.template.loader import render_to_string
+from django.utils.cache import patch_vary_headers
+
+from . import versioning
+
+
+PAGE_PARAMS = ('page_customers', 'page_orders', 'page_products', 'page_sellers')
+DEFAULT_NAME = 'index'
+
+
+def snapshot_root():
+    return Path(getattr(settings, 'DASHBOARD_SNAPSHOT_ROOT', settings.BASE_DIR / 'snapshots'))
+
+
+def snapshot_name(params):
+    """
+    File name for a dashboard query string, or None if it can't be pre-rendered.
+
+    Only pagination params are supported; page 1 is the default view.
+    """
+    parts = []
+    for key in params:
+        if key not in PAGE_PARAMS:
+            return None
+        value = params.get(key)
+        if not value.isdigit():
+            return None
+        if int(value) != 1:
+            parts.append(f'{key}-{int(value)}')
+    if len(parts) > 1:
+        return None
+    return parts[0] if parts else DEFAULT_NAME
+
+
+def find(tag, params):
+    """Path the snapshot for `params` would have; serve() checks whether it exists."""
+    name = snapshot_name(params)
+    if name is None:
+        return None
+    return snapshot_root() / tag / f'{name}.html'
+
+
+def serve(request, path):
+    """
+    FileResponse for the snapshot at `path`, gzipped if the client accepts it.
+
+    Returns None when the file is missing, e.g. not rendered yet or removed by
+    a concurrent generate() for a newer version; an open file stays readable.
+    """
+    candidates = [(path, None)]
+    if 'gzip' in request.META.get('HTTP_ACCEPT_ENCODING', ''):
+        candidates.insert(0, (path.with_name(path.name + '.gz'), 'gzip'))
+    for candidate, encoding in candidates:
+        try:
+            file = open(candidate, 'rb')
+        except OSError:
+            continue
+        response = FileResponse(file, content_type='text/html; charset=utf-8')
+        if encoding:
+            response['Content-Encoding'] = encoding
+        patch_vary_headers(response, ('Accept-Encoding',))
+        return response
+    return None
+
+
+def _write(directory, name, html):
+    data = html.encode('utf-8')
+    for filename, payload in ((f'{name}.html', data),
+                              (f'{name}.html.gz', gzip.compress(data, compresslevel=9))):
+        fd, tmp = tempfile.mkstemp(dir=directory)
+        with os.fdopen(fd, 'wb') as f:
+            f.write(payload)
+        os.replace(tmp, directory / filename)
+
+
+def generate(pages=1):
+    """
+    Render the default dashboard and the first `pages` pages of every table.
+
+    Returns the list of snapshot names written for the current data version.
+    """
+    from .views import build_index_context
+
+    tag = versioning.version_tag()
+    root = snapshot_root()
+    directory = root / tag
+    directory.mkdir(parents=True, exist_ok=True)
+
+    views = [{}]
+    for param in PAGE_PARAMS:
+        views.extend({param: str(page)} for page in range(2, pages + 1))
+
+    written = []
+    for params in views:
+        name = snapshot_name(params)
+        html = render_to_string('index.html', build_index_context(params))
+        _write(directory, name, html)
+        written.append(name)
+
+    for old in root.iterdir():
+        if old.is_dir() and old.name != tag:
+            shutil.rmtree(old, ignore_errors=True)
+    return written
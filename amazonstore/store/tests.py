@@ -1,3 +1,960 @@
-from django.test import TestCase
+import csv
+import itertools
+import multiprocessing
+import os
+import shutil
+import signal
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+from datetime import date, timedelta
+from decimal import Decimal
+from pathlib import Path
+from types import SimpleNamespace
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.core.management import call_command
+from django.db.models import Count, ProtectedError, Sum
+from django.db import connection, connections, transaction
+from django.test import SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.utils import timezone
+
+from . import aggregates, archive, catalog, jobs, leaderboards, order_details, partitioning, sketches, snapshots, timeseries, typeahead, versioning
+from .db_pool import ConnectionPool, PoolTimeout
+from .paginators import EstimatedCountPaginator
+from .models import (
+    Location, Customer, Seller, Brand, Category, Product,
+    ProductSeller, Order, OrderItem, ArchivedOrder, ArchiveMonthlyTotal, Job, LeaderboardEntry, UniqueBuyerSketch
+)
+
+
+FIRST_ORDER_DATE = date(2020, 5, 4)
+ORDER_COUNT = 17  # one a week, 2020-05-04 .. 2020-08-24
+
+
+def create_store():
+    """Three customers in two countries, two products/sellers, one single-item order a week."""
+    austin = Location.objects.create(City='Austin', State='TX', Country='United States')
+    pune = Location.objects.create(City='Pune', State='MH', Country='India')
+    brand = Brand.objects.create(BrandName='Acme')
+    books = Category.objects.create(CategoryName='Books')
+    toys = Category.objects.create(CategoryName='Toys')
+    products = [
+        Product.objects.create(ProductID='P1', ProductName='Novel', Brand=brand, Category=books),
+        Product.objects.create(ProductID='P2', ProductName='Kite', Brand=brand, Category=toys),
+    ]
+    sellers = [
+        Seller.objects.create(SellerID='S1', SellerName='First'),
+        Seller.objects.create(SellerID='S2', SellerName='Second'),
+    ]
+    customers = [
+        Customer.objects.create(CustomerID='C1', CustomerName='Ann', location=austin),
+        Customer.objects.create(CustomerID='C2', CustomerName='Bob', location=austin),
+        Customer.objects.create(CustomerID='C3', CustomerName='Chitra', location=pune),
+    ]
+    for product, seller in zip(products, sellers):
+        ProductSeller.objects.create(product=product, seller=seller)
+
+    for i in range(ORDER_COUNT):
+        quantity = 1 + i % 3
+        order = Order.objects.create(
+            OrderID=f'O{i:03d}',
+            OrderDate=FIRST_ORDER_DATE + timedelta(weeks=i),
+            customer=customers[i % 3],
+            PaymentMethod=1 + i % 2,
+            OrderStatus=1 + i % 3,
+            ShippingCost=Decimal('5.00'),
+            TotalAmount=Decimal(10 * quantity + 5),
+        )
+        OrderItem.objects.create(
+            order=order, product=products[i % 2], seller=sellers[i % 2],
+            Quantity=quantity, UnitPrice=Decimal('10.00'), Discount=Decimal('0'),
+            Tax=Decimal('0'), LineTotal=Decimal(10 * quantity),
+        )
+
+
+def dashboard_totals(date_from=None, date_to=None):
+    """The dashboard's order figures for a range: live orders merged with the archive."""
+    orders = Order.objects.all()
+    if date_from:
+        orders = orders.filter(OrderDate__gte=date_from)
+    if date_to:
+        orders = orders.filter(OrderDate__lte=date_to)
+    stats = archive.merge_order_stats(
+        orders.aggregate(total_orders=Count('OrderID'), total_revenue=Sum('TotalAmount'),
+                         total_units=Sum('unit_count')),
+        date_from, date_to,
+    )
+    statuses = archive.merge_grouped(
+        list(orders.values('OrderStatus').annotate(count=Count('OrderID'), total=Sum('TotalAmount'))
+             .order_by()),
+        'OrderStatus', date_from, date_to,
+    )
+    return (
+        stats['total_orders'], stats['total_revenue'] or 0, stats['total_units'] or 0,
+        sorted((row['OrderStatus'], row['count'], row['total']) for row in statuses),
+    )
+
+
+ARCHIVE_RANGES = [
+    (None, None),
+    (date(2020, 6, 1), date(2020, 6, 15)),   # part of an archived month
+    (date(2020, 5, 10), date(2020, 7, 20)),  # partial months at both ends
+    (date(2020, 5, 1), date(2020, 6, 30)),   # whole archived months
+    (None, date(2020, 6, 15)),
+    (date(2020, 6, 10), None),
+]
+
+
+class ArchiveTests(TestCase):
+    def setUp(self):
+        create_store()
+
+    def test_totals_are_unchanged_by_archiving(self):
+        before = {r: dashboard_totals(*r) for r in ARCHIVE_RANGES}
+        moved = archive.archive_before(date(2020, 7, 1), batch_size=3)
+
+        self.assertEqual(moved, 9)
+        self.assertEqual(ArchivedOrder.objects.count(), 9)
+        self.assertFalse(Order.objects.filter(OrderDate__lt=date(2020, 7, 1)).exists())
+        for date_range in ARCHIVE_RANGES:
+            with self.subTest(date_range=date_range):
+                self.assertEqual(dashboard_totals(*date_range), before[date_range])
+
+    def test_monthly_totals_include_archive(self):
+        archive.archive_before(date(2020, 7, 1))
+        months = archive.merge_monthly([], limit=12)
+        self.assertEqual(sum(row['orders'] for row in months), 9)
+        self.assertEqual([row['month'] for row in months],
+                         [date(2020, 6, 1), date(2020, 5, 1)])
+
+    def test_archived_order_details_keep_items(self):
+        archive.archive_before(date(2020, 6, 1))
+
+        class Labels:
+            def label(self, key, default=''):
+                return default
+
+        dims = type('Dims', (), {'brands': Labels(), 'categories': Labels(), 'sellers': Labels()})()
+        order = archive.archived_order_dicts(['O001'], dims)['O001']
+        self.assertTrue(order['archived'])
+        self.assertEqual(order['date'], '2020-05-11')
+        self.assertEqual([(item['product']['id'], item['quantity']) for item in order['items']],
+                         [('P2', 2)])
+
+    def test_reimport_skips_archived_orders(self):
+        archive.archive_before(date(2020, 7, 1))
+        before = dashboard_totals()
+
+        fields = [
+            'OrderID', 'OrderDate', 'CustomerID', 'CustomerName', 'ProductID', 'ProductName',
+            'Category', 'Brand', 'Quantity', 'UnitPrice', 'Discount', 'Tax', 'ShippingCost',
+            'TotalAmount', 'PaymentMethod', 'OrderStatus', 'City', 'State', 'Country',
+            'SellerID', 'SellerName',
+        ]
+        row = {
+            'CustomerID': 'C1', 'CustomerName': 'Ann', 'ProductID': 'P1', 'ProductName': 'Novel',
+            'Category': 'Books', 'Brand': 'Acme', 'Quantity': '1', 'UnitPrice': '10.00',
+            'Discount': '0', 'Tax': '0', 'ShippingCost': '5.00', 'TotalAmount': '15.00',
+            'PaymentMethod': 'UPI', 'OrderStatus': 'Delivered', 'City': 'Austin', 'State': 'TX',
+            'Country': 'United States', 'SellerID': 'S1', 'SellerName': 'First',
+        }
+        with tempfile.TemporaryDirectory() as directory:
+            path = Path(directory) / 'orders.csv'
+            with open(path, 'w', newline='', encoding='utf-8') as f:
+                writer = csv.DictWriter(f, fieldnames=fields)
+                writer.writeheader()
+                writer.writerow({**row, 'OrderID': 'O000', 'OrderDate': '2020-05-04'})  # archived
+                writer.writerow({**row, 'OrderID': 'NEW1', 'OrderDate': '2020-09-07'})
+            call_command('extract_from_csv', str(path), snapshot_pages=0, stdout=tempfile.TemporaryFile('w+'))
+
+        self.assertFalse(Order.objects.filter(pk='O000').exists())
+        self.assertTrue(Order.objects.filter(pk='NEW1').exists())
+        self.assertEqual(dashboard_totals()[0], before[0] + 1)
+        # the archived order can still be archived again without a key clash
+        self.assertEqual(archive.archive_before(date(2020, 7, 1)), 0)
+
+
+class SketchTests(TestCase):
+    def test_estimate_within_error(self):
+        sketch = sketches.HyperLogLog()
+        for i in range(20000):
+            sketch.add(f'C{i}')
+        self.assertLess(abs(sketch.estimate() - 20000) / 20000, 3 * sketches.STANDARD_ERROR)
+
+    def test_merge_is_union(self):
+        left, right, union = sketches.HyperLogLog(), sketches.HyperLogLog(), sketches.HyperLogLog()
+        for i in range(3000):
+            (left if i % 2 else right).add(i)
+            union.add(i)
+        self.assertEqual(left.merge(right).to_bytes(), union.to_bytes())
+
+    def test_rebuild_matches_exact_counts(self):
+        create_store()
+        sketches.rebuild()
+        for dimension in (sketches.DIMENSION_ALL, sketches.DIMENSION_COUNTRY, sketches.DIMENSION_CATEGORY):
+            with self.subTest(dimension=dimension):
+                # small cardinalities are estimated exactly by linear counting
+                self.assertEqual(sketches.unique_buyers(dimension), sketches.exact_unique_buyers(dimension))
+        self.assertEqual(sketches.unique_buyers(sketches.DIMENSION_COUNTRY),
+                         {'United States': 2, 'India': 1})
+
+    def test_rebuild_after_archiving_keeps_archived_buyers(self):
+        create_store()
+        sketches.rebuild()
+        before = {
+            dimension: sketches.unique_buyers(dimension, date(2020, 5, 1), date(2020, 6, 30))
+            for dimension in (sketches.DIMENSION_ALL, sketches.DIMENSION_COUNTRY, sketches.DIMENSION_CATEGORY)
+        }
+        archive.archive_before(date(2020, 7, 1))
+        sketches.rebuild()
+        for dimension, counts in before.items():
+            with self.subTest(dimension=dimension):
+                self.assertEqual(sketches.unique_buyers(dimension, date(2020, 5, 1), date(2020, 6, 30)), counts)
+                self.assertEqual(
+                    sketches.exact_unique_buyers(dimension, date(2020, 5, 1), date(2020, 6, 30)), counts
+                )
+
+    def test_by_month_returns_latest_months(self):
+        create_store()
+        sketches.rebuild()
+        months = sketches.unique_buyers_by_month(limit=2)
+        self.assertEqual([month for month, _ in months], [date(2020, 8, 1), date(2020, 7, 1)])
+        self.assertEqual(len(sketches.unique_buyers_by_month()), 4)
+
+
+class ConditionalGetTests(TestCase):
+    def setUp(self):
+        create_store()
+        self.snapshot_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.snapshot_root, ignore_errors=True)
+        settings = override_settings(DASHBOARD_SNAPSHOT_ROOT=self.snapshot_root)
+        settings.enable()
+        self.addCleanup(settings.disable)
+
+    def test_weak_etag_and_vary(self):
+        response = self.client.get('/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['ETag'], f'W/"{versioning.version_tag()}"')
+        self.assertIn('Accept-Encoding', response['Vary'])
+
+    def test_not_modified_until_data_changes(self):
+        etag = self.client.get('/')['ETag']
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+
+        versioning.bump_data_version()
+        response = self.client.get('/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_gzip_and_identity_snapshots_share_the_etag(self):
+        snapshots.generate(1)
+        gzipped = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip, deflate')
+        identity = self.client.get('/')
+        self.assertEqual(gzipped['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Encoding', identity)
+        self.assertEqual(gzipped['ETag'], identity['ETag'])
+
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=identity['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_missing_snapshot_falls_back_to_live_render(self):
+        snapshots.generate(1)
+        shutil.rmtree(self.snapshot_root)
+        response = self.client.get('/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertEqual(response.status_code, 200)
+        self.assertNotIn('Content-Encoding', response)
+        self.assertIn(b'<html', response.content.lower())
+
+
+class JobTests(TestCase):
+    def setUp(self):
+        self.calls = []
+        jobs.register('test_ok')(lambda job, progress: self.calls.append(job.pk))
+        jobs.register('test_fail')(lambda job, progress: 1 / 0)
+        self.addCleanup(jobs.HANDLERS.pop, 'test_ok')
+        self.addCleanup(jobs.HANDLERS.pop, 'test_fail')
+
+    def test_claim_by_priority_then_age(self):
+        first = jobs.enqueue('test_ok')
+        urgent = jobs.enqueue('test_ok', priority=5)
+        jobs.enqueue('test_ok', run_after=timezone.now() + timedelta(hours=1))
+
+        self.assertEqual(jobs.run_next('w').pk, urgent.pk)
+        self.assertEqual(jobs.run_next('w').pk, first.pk)
+        self.assertIsNone(jobs.run_next('w'))
+        self.assertEqual(self.calls, [urgent.pk, first.pk])
+        self.assertEqual(Job.objects.get(pk=first.pk).Status, Job.STATUS_SUCCEEDED)
+
+    def test_unknown_job_type_is_rejected(self):
+        with self.assertRaises(ValueError):
+            jobs.enqueue('no_such_job')
+
+    def test_failed_job_is_retried_with_backoff(self):
+        job = jobs.enqueue('test_fail', max_attempts=2)
+        jobs.run_next('w')
+        job.refresh_from_db()
+        self.assertEqual((job.Status, job.Attempts, job.LockedBy), (Job.STATUS_QUEUED, 1, ''))
+        self.assertIn('ZeroDivisionError', job.Error)
+        self.assertGreater(job.RunAfter, timezone.now() + timedelta(seconds=jobs.RETRY_BASE_DELAY - 5))
+        self.assertIsNone(jobs.run_next('w'))
+
+        Job.objects.filter(pk=job.pk).update(RunAfter=timezone.now())
+        jobs.run_next('w')
+        job.refresh_from_db()
+        self.assertEqual((job.Status, job.Attempts), (Job.STATUS_FAILED, 2))
+
+    def test_requeue_stale(self):
+        job = jobs.enqueue('test_ok')
+        jobs.claim('w')
+        self.assertEqual(jobs.requeue_stale(60), 0)
+
+        Job.objects.filter(pk=job.pk).update(LockedAt=timezone.now() - timedelta(minutes=5))
+        self.assertEqual(jobs.requeue_stale(60), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.Status, job.LockedBy, job.Error), (Job.STATUS_QUEUED, '', 'Worker timed out'))
+        self.assertEqual(jobs.run_next('w').pk, job.pk)
+        self.assertEqual(Job.objects.get(pk=job.pk).Attempts, 2)
+
+    def test_requeue_worker_only_touches_its_jobs(self):
+        mine = jobs.enqueue('test_ok', priority=1)
+        other = jobs.enqueue('test_ok')
+        jobs.claim(jobs.worker_name(0, pid=111))
+        jobs.claim(jobs.worker_name(0, pid=222))
+
+        self.assertEqual(jobs.requeue_worker(jobs.worker_name(0, pid=111)), 1)
+        self.assertEqual(Job.objects.get(pk=mine.pk).Status, Job.STATUS_QUEUED)
+        self.assertEqual(Job.objects.get(pk=other.pk).Status, Job.STATUS_RUNNING)
+
+    def test_requeue_fails_exhausted_jobs(self):
+        job = jobs.enqueue('test_ok', max_attempts=1)
+        jobs.claim('w')
+        self.assertEqual(jobs.requeue_worker('w'), 1)
+        job.refresh_from_db()
+        self.assertEqual((job.Status, job.Error), (Job.STATUS_FAILED, 'Worker exited'))
+        self.assertIsNotNone(job.FinishedAt)
+
+    def test_import_without_path_fails(self):
+        job = jobs.enqueue(jobs.JOB_IMPORT_CSV, max_attempts=1)
+        jobs.run_next('w')
+        job.refresh_from_db()
+        self.assertEqual(job.Status, Job.STATUS_FAILED)
+        self.assertIn('ValueError', job.Error)
+
+
+class LeaderboardTests(TestCase):
+    def setUp(self):
+        create_store()
+
+    def assertMatchesRecompute(self):
+        self.assertEqual(leaderboards.differences(), [])
+
+    def test_incremental_matches_recompute(self):
+        self.assertMatchesRecompute()
+        self.assertEqual(
+            leaderboards.top(leaderboards.BOARD_PRODUCTS, limit=1),
+            [('P1', 9, 18, Decimal('180.00'))],
+        )
+
+    def test_item_edit_and_delete(self):
+        item = OrderItem.objects.get(order_id='O004')
+        item.Quantity, item.LineTotal, item.product_id = 7, Decimal('70.00'), 'P1'
+        item.save()
+        self.assertMatchesRecompute()
+
+        OrderItem.objects.get(order_id='O005').delete()
+        Order.objects.get(pk='O006').delete()
+        self.assertMatchesRecompute()
+
+    def test_order_moved_to_another_month(self):
+        order = Order.objects.get(pk='O000')
+        order.OrderDate = date(2020, 8, 31)
+        order.save()
+        self.assertEqual(OrderItem.objects.get(order_id='O000').OrderDate, date(2020, 8, 31))
+        self.assertMatchesRecompute()
+
+    def test_buffered_writes(self):
+        with leaderboards.buffered():
+            for i in range(3):
+                order = Order.objects.create(
+                    OrderID=f'B{i}', OrderDate=date(2020, 9, 1), customer_id='C1',
+                    PaymentMethod=1, OrderStatus=1, ShippingCost=Decimal('0'), TotalAmount=Decimal('10'),
+                )
+                OrderItem.objects.create(
+                    order=order, product_id='P2', seller_id='S2', Quantity=1, UnitPrice=Decimal('10'),
+                    Discount=Decimal('0'), Tax=Decimal('0'), LineTotal=Decimal('10'),
+                )
+        self.assertMatchesRecompute()
+
+    def test_archiving_keeps_entries(self):
+        before = leaderboards.stored()
+        archive.archive_before(date(2020, 7, 1))
+        self.assertEqual(leaderboards.stored(), before)
+        self.assertMatchesRecompute()
+
+    def test_rebuild_matches_incremental(self):
+        before = leaderboards.stored()
+        leaderboards.rebuild()
+        self.assertEqual(leaderboards.stored(), before)
+
+    def test_whole_months_match_live_ranking(self):
+        for board in (leaderboards.BOARD_PRODUCTS, leaderboards.BOARD_CUSTOMERS, leaderboards.BOARD_SELLERS):
+            with self.subTest(board=board):
+                stored = leaderboards.top(board, date_from=date(2020, 6, 1), date_to=date(2020, 7, 31))
+                live = leaderboards._ranked(
+                    board, leaderboards._order_totals(board, date(2020, 6, 1), date(2020, 7, 31)), 10,
+                )
+                self.assertEqual([tuple(row) for row in stored], [tuple(row) for row in live])
+
+    def test_ranges_count_archived_orders(self):
+        boards = (leaderboards.BOARD_PRODUCTS, leaderboards.BOARD_CUSTOMERS, leaderboards.BOARD_SELLERS)
+        before = {
+            (board, date_from, date_to): leaderboards.top(board, 10, date_from, date_to)
+            for board in boards for date_from, date_to in ARCHIVE_RANGES
+        }
+        archive.archive_before(date(2020, 7, 1))
+        for (board, date_from, date_to), expected in before.items():
+            with self.subTest(board=board, date_from=date_from, date_to=date_to):
+                self.assertEqual(
+                    [tuple(row) for row in leaderboards.top(board, 10, date_from, date_to)],
+                    [tuple(row) for row in expected],
+                )
+
+
+class FakeConnection:
+    ids = itertools.count(1)
+
+    def __init__(self):
+        self.id = next(self.ids)
+        self.closed = 0
+        self.info = SimpleNamespace(transaction_status=0)  # TRANSACTION_STATUS_IDLE
+        self.rollbacks = 0
+
+    def close(self):
+        self.closed = 1
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.info.transaction_status = 0
+
+
+class ConnectionPoolTests(SimpleTestCase):
+    def make_pool(self, **options):
+        settings = {
+            'min_size': 0, 'max_size': 2, 'timeout': 0.05, 'max_lifetime': 60,
+            'max_idle': 60, 'check_after': 60, 'health_checks': False, **options,
+        }
+        return ConnectionPool('default', **settings)
+
+    def test_returned_connection_is_reused(self):
+        pool = self.make_pool()
+        first = pool.getconn(FakeConnection)
+        pool.putconn(first)
+        self.assertIs(pool.getconn(FakeConnection), first)
+        stats = pool.stats()
+        self.assertEqual((stats['connects'], stats['reused'], stats['in_use']), (1, 1, 1))
+
+    def test_open_transaction_is_rolled_back_on_return(self):
+        pool = self.make_pool()
+        connection = pool.getconn(FakeConnection)
+        connection.info.transaction_status = 2  # TRANSACTION_STATUS_INTRANS
+        pool.putconn(connection)
+        self.assertEqual(connection.rollbacks, 1)
+        self.assertFalse(connection.closed)
+
+    def test_checkout_waits_then_times_out(self):
+        pool = self.make_pool()
+        pool.getconn(FakeConnection)
+        pool.getconn(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            pool.getconn(FakeConnection)
+        self.assertEqual(pool.stats()['timeouts'], 1)
+
+    def test_expired_connection_is_replaced(self):
+        pool = self.make_pool(max_lifetime=0)
+        first = pool.getconn(FakeConnection)
+        pool.putconn(first)
+        self.assertTrue(first.closed)
+        self.assertIsNot(pool.getconn(FakeConnection), first)
+        self.assertEqual(pool.stats()['size'], 1)
+
+    def test_inherited_connections_are_not_closed_after_fork(self):
+        pool = self.make_pool()
+        idle, in_use = pool.getconn(FakeConnection), pool.getconn(FakeConnection)
+        pool.putconn(idle)
+        pool.forget_after_fork()
+
+        pool.putconn(in_use)
+        pool.close()
+        self.assertFalse(idle.closed)
+        self.assertFalse(in_use.closed)
+        fresh = pool.getconn(FakeConnection)
+        self.assertNotIn(fresh, (idle, in_use))
+        self.assertEqual(pool.stats()['size'], 1)
+
+
+class CatalogTests(TestCase):
+    def setUp(self):
+        create_store()
+        ProductSeller.objects.create(product_id='P1', seller_id='S2', IsActive=False)
+
+    def test_product_sellers_lists_active_listings_with_sales(self):
+        payload = self.client.get('/api/products/P1/sellers/').json()
+        self.assertEqual(payload['page']['count'], 1)
+        [seller] = payload['sellers']
+        self.assertEqual((seller['seller_id'], seller['orders'], seller['units']), ('S1', 9, 18))
+        self.assertEqual(Decimal(seller['revenue']), Decimal('180'))
+
+        payload = self.client.get('/api/products/P1/sellers/', {'include_inactive': '1'}).json()
+        self.assertEqual([(row['seller_id'], row['is_active'], row['orders']) for row in payload['sellers']],
+                         [('S1', True, 9), ('S2', False, 0)])
+
+    def test_seller_catalog_pages(self):
+        ProductSeller.objects.filter(product_id='P1').update(IsActive=True)
+        payload = self.client.get('/api/sellers/S2/catalog/', {'page_size': 1, 'page': 2}).json()
+        self.assertEqual(payload['page'], {'number': 2, 'num_pages': 2, 'count': 2, 'has_next': False})
+        self.assertEqual([row['product_id'] for row in payload['products']], ['P2'])
+        self.assertEqual(self.client.get('/api/sellers/S9/catalog/').status_code, 404)
+
+    def test_set_active_changes_only_differing_rows(self):
+        with self.assertRaises(ValueError):
+            catalog.select_listings()
+        listings = catalog.select_listings(sellers=['S2'])
+        self.assertEqual(catalog.set_active(listings, True), 1)
+        self.assertEqual(catalog.set_active(listings, True), 0)
+        self.assertEqual(catalog.set_active(catalog.select_listings(products=['P1']), False), 2)
+        self.assertEqual(list(catalog.product_sellers('P1', include_inactive=True)),
+                         [('S1', False), ('S2', False)])
+
+
+@unittest.skipUnless(partitioning.is_postgresql(), 'Range partitioning requires PostgreSQL')
+class PartitioningTests(TestCase):
+    def setUp(self):
+        # converted before any rows exist: ALTER TABLE refuses to run with
+        # deferred foreign key checks pending in the test transaction
+        partitioning.convert_to_partitioned(months_ahead=0)
+        partitioning.ensure_partitions(date(2020, 5, 1), date(2020, 8, 1))
+        create_store()
+
+    def test_conversion_recreates_model_indexes(self):
+        self.assertTrue(partitioning.is_partitioned(Order._meta.db_table))
+        self.assertEqual(partitioning.ensure_model_indexes(), [])
+
+    def test_create_partitions_counts_months_from_start(self):
+        call_command('create_partitions', '--from', '2031-01', '--months-ahead', '2',
+                     stdout=tempfile.TemporaryFile('w+'))
+        self.assertEqual(
+            sorted(name for name in partitioning.existing_partitions('Orders') if '2031' in name),
+            ['Orders_2031_01', 'Orders_2031_02', 'Orders_2031_03'],
+        )
+
+    def test_rows_land_in_month_partitions(self):
+        with connection.cursor() as cursor:
+            cursor.execute(
+                f'SELECT c.relname, COUNT(*) FROM {partitioning.qn("OrderItems")} i '
+                f'JOIN pg_class c ON c.oid = i.tableoid GROUP BY 1'
+            )
+            counts = dict(cursor.fetchall())
+        self.assertEqual(counts, {
+            partitioning.partition_name('OrderItems', date(2020, 5, 1)): 4,
+            partitioning.partition_name('OrderItems', date(2020, 6, 1)): 5,
+            partitioning.partition_name('OrderItems', date(2020, 7, 1)): 4,
+            partitioning.partition_name('OrderItems', date(2020, 8, 1)): 4,
+        })
+
+    def test_redated_order_moves_its_items(self):
+        order = Order.objects.get(pk='O000')
+        order.OrderDate = date(2020, 8, 31)
+        order.save()
+        self.assertEqual(OrderItem.objects.get(order_id='O000').OrderDate, date(2020, 8, 31))
+        self.assertEqual(leaderboards.differences(), [])
+
+
+class TypeaheadTests(TestCase):
+    def setUp(self):
+        create_store()
+        brand, category = Brand.objects.get(), Category.objects.first()
+        for product_id, name in (('P3', 'Kettle'), ('P4', '  KITCHEN   scale'), ('P5', 'kite string')):
+            Product.objects.create(ProductID=product_id, ProductName=name, Brand=brand, Category=category)
+        self.index = typeahead.get_index('products').refresh(force=True)
+
+    def names(self, prefix, limit=typeahead.DEFAULT_LIMIT):
+        return [row['name'] for row in self.index.complete(prefix, limit)]
+
+    def test_prefix_match_ignores_case_and_spacing(self):
+        self.assertEqual(self.names('KIT'), ['  KITCHEN   scale', 'Kite', 'kite string'])
+        self.assertEqual(self.names(' kitchen  s'), ['  KITCHEN   scale'])
+        self.assertEqual(self.names('ke'), ['Kettle'])
+        self.assertEqual(self.names('x'), [])
+        self.assertEqual(self.names('   '), [])
+
+    def test_limit(self):
+        self.assertEqual(self.names('k', limit=2), ['Kettle', '  KITCHEN   scale'])
+        response = self.client.get('/api/typeahead/', {'kind': 'products', 'q': 'k', 'limit': '500'})
+        self.assertEqual(len(response.json()['results']), 4)
+        self.assertEqual(self.client.get('/api/typeahead/', {'kind': 'orders'}).status_code, 400)
+
+    def test_saves_in_this_process_update_the_index(self):
+        product = Product.objects.get(pk='P3')
+        with self.captureOnCommitCallbacks(execute=True):
+            product.ProductName = 'Lamp'
+            product.save()
+        self.assertEqual(self.names('ke'), [])
+        self.assertEqual(self.names('la'), ['Lamp'])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            product.delete()
+        self.assertEqual(self.names('la'), [])
+
+    def test_writes_elsewhere_rebuild_on_the_next_check(self):
+        # bulk_create sends no signals: stands in for a write made by another process
+        Product.objects.bulk_create([Product(
+            ProductID='P9', ProductName='Kayak', Brand=Brand.objects.get(), Category=Category.objects.first(),
+        )])
+        versioning.bump_data_version(versioning.TYPEAHEAD_ID)
+        self.assertEqual(self.names('ka'), [])  # stamp not checked again yet
+
+        with mock.patch.object(typeahead, 'CHECK_INTERVAL', 0):
+            self.assertEqual(self.names('ka'), ['Kayak'])
+
+    def test_only_product_and_customer_writes_move_the_stamp(self):
+        version = versioning.get_data_version(versioning.TYPEAHEAD_ID).Version
+        with self.captureOnCommitCallbacks(execute=True):
+            Order.objects.filter(pk='O001').get().save()
+        self.assertEqual(versioning.get_data_version(versioning.TYPEAHEAD_ID).Version, version)
+
+        with self.captureOnCommitCallbacks(execute=True):
+            Customer.objects.create(CustomerID='C4', CustomerName='Dana', location=Location.objects.first())
+        self.assertEqual(versioning.get_data_version(versioning.TYPEAHEAD_ID).Version, version + 1)
+
+
+class OrderAggregateTests(TestCase):
+    def setUp(self):
+        create_store()
+
+    def counters(self, order_id='O000'):
+        return Order.objects.filter(pk=order_id).values_list('item_count', 'unit_count', 'items_total').get()
+
+    def add_item(self, order_id='O000', quantity=4):
+        return OrderItem.objects.create(
+            order=Order.objects.get(pk=order_id), product_id='P2', seller_id='S2',
+            Quantity=quantity, UnitPrice=Decimal('10.00'), Discount=Decimal('0'),
+            Tax=Decimal('0'), LineTotal=Decimal(10 * quantity),
+        )
+
+    def test_item_writes_update_the_order(self):
+        self.assertEqual(self.counters(), (1, 1, Decimal('10.00')))
+        item = self.add_item()
+        self.assertEqual(self.counters(), (2, 5, Decimal('50.00')))
+
+        item.Quantity, item.LineTotal = 2, Decimal('20.00')
+        item.save()
+        self.assertEqual(self.counters(), (2, 3, Decimal('30.00')))
+
+        item.delete()
+        self.assertEqual(self.counters(), (1, 1, Decimal('10.00')))
+        OrderItem.objects.filter(order_id='O000').delete()
+        self.assertEqual(self.counters(), (0, 0, Decimal('0.00')))
+
+    def test_saving_a_stale_order_keeps_the_counters(self):
+        order = Order.objects.get(pk='O000')
+        self.add_item()
+        order.OrderStatus = 4
+        order.save()
+        self.assertEqual(self.counters(), (2, 5, Decimal('50.00')))
+        self.assertEqual(Order.objects.get(pk='O000').OrderStatus, 4)
+
+        Order.objects.only('OrderID', 'OrderStatus').get(pk='O000').save()
+        self.assertEqual(self.counters(), (2, 5, Decimal('50.00')))
+
+    def test_deferred_writes_refresh_once(self):
+        with aggregates.deferred():
+            self.add_item('O000')
+            self.add_item('O002', quantity=1)
+            self.assertEqual(self.counters('O000'), (1, 1, Decimal('10.00')))
+        self.assertEqual(self.counters('O000'), (2, 5, Decimal('50.00')))
+        self.assertEqual(self.counters('O002'), (2, 4, Decimal('40.00')))
+
+    def test_rebuild_command_repairs_counters(self):
+        Order.objects.update(item_count=0, unit_count=0, items_total=0)
+        call_command('rebuild_order_aggregates', '--batch-size', '5', stdout=tempfile.TemporaryFile('w+'))
+        self.assertEqual(self.counters('O002'), (1, 3, Decimal('30.00')))
+        self.assertEqual(Order.objects.aggregate(units=Sum('unit_count'))['units'], 33)
+
+
+class LocationTests(TestCase):
+    def test_location_with_customers_cannot_be_deleted(self):
+        create_store()
+        with self.assertRaises(ProtectedError):
+            Location.objects.get(City='Pune').delete()
+        self.assertTrue(Order.objects.filter(customer_id='C3').exists())
+
+        Location.objects.create(City='Leeds', State='WYK', Country='United Kingdom').delete()
+
+
+def flush_concurrently(first, second):
+    """
+    Run first() and commit it only once second() is running in another thread,
+    so both create the same rows: the second writer has to wait on the first's
+    uncommitted insert. Returns the exception second() raised, if any.
+    """
+    flushed, release = threading.Event(), threading.Event()
+    errors = []
+
+    def run_first():
+        try:
+            with transaction.atomic():
+                first()
+                flushed.set()
+                release.wait(5)
+        finally:
+            flushed.set()
+            connections.close_all()
+
+    def run_second():
+        try:
+            second()
+        except Exception as exc:
+            errors.append(exc)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=run_first), threading.Thread(target=run_second)]
+    threads[0].start()
+    flushed.wait(5)
+    threads[1].start()
+    time.sleep(0.3)  # let the second writer block on the first's rows
+    release.set()
+    for thread in threads:
+        thread.join(10)
+    return errors[0] if errors else None
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'needs concurrent transactions')
+class ConcurrentFlushTests(TransactionTestCase):
+    def test_sketch_buffers_creating_the_same_rows(self):
+        buffers = [sketches.SketchBuffer(), sketches.SketchBuffer()]
+        expected = sketches.HyperLogLog()
+        for i in range(200):
+            buffers[i % 2].add(date(2024, 3, 5), f'C{i}', 'India', 'Books')
+            expected.add(f'C{i}')
+
+        self.assertIsNone(flush_concurrently(buffers[0].flush, buffers[1].flush))
+        row = UniqueBuyerSketch.objects.get(Dimension=sketches.DIMENSION_ALL, Month=date(2024, 3, 1))
+        self.assertEqual(bytes(row.Registers), expected.to_bytes())
+        self.assertEqual(UniqueBuyerSketch.objects.count(), 3)
+
+    def test_archive_runs_adding_to_the_same_totals(self):
+        @transaction.atomic  # as in archive_batch
+        def add(*amounts):
+            archive._add_to_totals([
+                SimpleNamespace(OrderDate=date(2020, 5, 4), OrderStatus=1, PaymentMethod=1,
+                                item_count=1, unit_count=2, TotalAmount=Decimal(amount))
+                for amount in amounts
+            ])
+
+        error = flush_concurrently(lambda: add('10.00', '30.00'), lambda: add('5.00'))
+        self.assertIsNone(error)
+        row = ArchiveMonthlyTotal.objects.get()
+        self.assertEqual(
+            (row.Orders, row.Items, row.Units, row.Revenue, row.MinAmount, row.MaxAmount),
+            (3, 3, 6, Decimal('45.00'), Decimal('5.00'), Decimal('30.00')),
+        )
+
+    def test_leaderboard_buffers_creating_the_same_entries(self):
+        buffers = [leaderboards.LeaderboardBuffer(), leaderboards.LeaderboardBuffer()]
+        for i in range(10):
+            buffers[i % 2].add_item('P1', 'S1', date(2020, 5, 4), 2, Decimal('20.00'))
+
+        self.assertIsNone(flush_concurrently(buffers[0].flush, buffers[1].flush))
+        self.assertEqual(
+            leaderboards.stored()[(leaderboards.BOARD_PRODUCTS, leaderboards.PERIOD_ALL, 'P1')],
+            (10, 20, Decimal('200.00')),
+        )
+        self.assertEqual(LeaderboardEntry.objects.count(), 4)
+
+
+class AdminChangelistTests(TestCase):
+    def setUp(self):
+        create_store()
+        self.client.force_login(User.objects.create_superuser('admin', 'admin@example.com', 'pw'))
+
+    def test_small_or_filtered_querysets_get_exact_counts(self):
+        for queryset in (Order.objects.all(), Order.objects.filter(OrderStatus=1), list(Order.objects.all())):
+            with self.subTest(queryset=type(queryset).__name__):
+                paginator = EstimatedCountPaginator(queryset, 5)
+                self.assertEqual(paginator.count, len(queryset) if isinstance(queryset, list) else queryset.count())
+        self.assertEqual(EstimatedCountPaginator(Order.objects.filter(OrderStatus=1), 5).num_pages, 2)
+
+    @unittest.skipUnless(connection.vendor == 'postgresql', 'estimates come from the PostgreSQL planner')
+    def test_large_querysets_use_planner_estimates(self):
+        with connection.cursor() as cursor:
+            cursor.execute('ANALYZE "Orders"')
+        paginator = EstimatedCountPaginator(Order.objects.all(), 5)
+        paginator.exact_threshold = 0
+        with self.assertNumQueries(1):
+            self.assertEqual(paginator.count, ORDER_COUNT)
+
+        paginator = EstimatedCountPaginator(Order.objects.filter(OrderStatus=1), 5)
+        paginator.exact_threshold = 0
+        with self.assertNumQueries(1):
+            self.assertGreater(paginator.count, 0)
+
+    def test_changelist_loads_only_listed_columns(self):
+        response = self.client.get('/admin/store/order/')
+        self.assertEqual(response.status_code, 200)
+        changelist = response.context['cl']
+        self.assertEqual(changelist.result_count, ORDER_COUNT)
+        fields, deferred = changelist.queryset.query.deferred_loading
+        self.assertFalse(deferred)
+        self.assertIn('customer__CustomerName', fields)
+        self.assertNotIn('ShippingCost', fields)
+        self.assertContains(response, 'O016')
+
+    def test_change_form_loads_every_column(self):
+        response = self.client.get('/admin/store/order/O001/change/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.context['original'].get_deferred_fields(), set())
+        self.assertContains(response, '5.00')
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'Time-series analytics require PostgreSQL')
+class TimeSeriesTests(TestCase):
+    def setUp(self):
+        create_store()
+
+    def points(self, granularity, date_from=None, date_to=None, **options):
+        [series] = timeseries.time_series(granularity, date_from=date_from, date_to=date_to, **options)
+        return series['points']
+
+    def test_gaps_are_filled_over_the_requested_range(self):
+        points = self.points('day', date(2020, 5, 1), date(2020, 5, 12), windows=[2])
+        self.assertEqual(len(points), 12)
+        self.assertEqual((points[0]['period'], points[-1]['period']), ('2020-05-01', '2020-05-12'))
+        self.assertEqual([p['period'] for p in points if p['orders']], ['2020-05-04', '2020-05-11'])
+        self.assertEqual(points[3]['revenue_ma_2'], 5.0)
+        self.assertIsNone(points[3]['growth'])  # after an empty day
+
+    def test_range_without_orders_is_all_zeros(self):
+        points = self.points('day', date(2021, 1, 1), date(2021, 1, 3))
+        self.assertEqual([(p['period'], p['orders'], p['revenue']) for p in points],
+                         [('2021-01-01', 0, 0.0), ('2021-01-02', 0, 0.0), ('2021-01-03', 0, 0.0)])
+
+    def test_monthly_running_total(self):
+        points = self.points('month', date(2020, 4, 15), date(2020, 10, 1))
+        self.assertEqual([p['period'] for p in points],
+                         ['2020-04-01', '2020-05-01', '2020-06-01', '2020-07-01',
+                          '2020-08-01', '2020-09-01', '2020-10-01'])
+        self.assertEqual([p['orders'] for p in points], [0, 4, 5, 4, 4, 0, 0])
+
+        revenue = OrderItem.objects.aggregate(total=Sum('LineTotal'))['total']
+        running = 0
+        for point in points:
+            running += point['revenue']
+            self.assertEqual(point['cumulative_revenue'], running)
+        self.assertEqual(points[-1]['cumulative_revenue'], float(revenue))
+
+    def test_weeks_start_on_monday_and_partial_weeks_keep_their_bucket(self):
+        points = self.points('week', date(2020, 5, 6), date(2020, 5, 20))
+        self.assertEqual([(p['period'], p['orders']) for p in points],
+                         [('2020-05-04', 0), ('2020-05-11', 1), ('2020-05-18', 1)])
+
+    def test_open_ranges_stop_at_the_data(self):
+        points = self.points('month')
+        self.assertEqual((points[0]['period'], points[-1]['period']), ('2020-05-01', '2020-08-01'))
+
+    def test_series_and_invalid_ranges(self):
+        series = timeseries.time_series('month', series='category',
+                                        date_from=date(2020, 5, 1), date_to=date(2020, 9, 30))
+        self.assertEqual({row['key']: len(row['points']) for row in series}, {'Books': 5, 'Toys': 5})
+        with self.assertRaises(timeseries.TimeSeriesError):
+            timeseries.time_series('day', date_from=date(2020, 6, 1), date_to=date(2020, 5, 1))
+        with self.assertRaises(timeseries.TimeSeriesError):
+            timeseries.time_series('day', date_from=date(1900, 1, 1))
+
+
+@unittest.skipUnless(connection.vendor == 'postgresql', 'workers need a database shared across processes')
+class WorkerSupervisorTests(TransactionTestCase):
+    def setUp(self):
+        jobs.register('test_ok')(lambda job, progress: progress(0.5, 'half way'))
+        jobs.register('test_crash')(lambda job, progress: os._exit(3))
+        self.addCleanup(jobs.HANDLERS.pop, 'test_ok')
+        self.addCleanup(jobs.HANDLERS.pop, 'test_crash')
+        for signum in (signal.SIGINT, signal.SIGTERM):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+        # the POSIX default from Python 3.14; workers must not depend on it
+        self.addCleanup(multiprocessing.set_start_method,
+                        multiprocessing.get_start_method(allow_none=True), force=True)
+        multiprocessing.set_start_method('forkserver', force=True)
+
+    def run_workers(self, *args):
+        out = tempfile.TemporaryFile('w+')
+        call_command('run_workers', '--once', '--poll-interval', '0.1', *args, stdout=out)
+        out.seek(0)
+        return out.read()
+
+    def test_workers_run_queued_jobs(self):
+        queued = [jobs.enqueue('test_ok') for _ in range(3)]
+        self.run_workers('--workers', '2')
+        for job in Job.objects.filter(pk__in=[job.pk for job in queued]):
+            self.assertEqual((job.Status, job.Progress), (Job.STATUS_SUCCEEDED, 1))
+            self.assertNotEqual(job.LockedBy.split(':')[1], str(os.getpid()))
+
+    def test_job_of_a_crashed_worker_is_requeued(self):
+        job = jobs.enqueue('test_crash')
+        output = self.run_workers('--workers', '1')
+        job.refresh_from_db()
+        self.assertEqual((job.Status, job.Attempts, job.Error), (Job.STATUS_QUEUED, 1, 'Worker exited'))
+        self.assertIn('Requeued the job held by worker 0', output)
+
+    def test_crashing_workers_are_restarted_with_a_delay(self):
+        job = jobs.enqueue('test_crash', max_attempts=2)
+        timer = threading.Timer(5, os.kill, (os.getpid(), signal.SIGTERM))
+        timer.start()
+        self.addCleanup(timer.cancel)
+        out = tempfile.TemporaryFile('w+')
+        call_command('run_workers', '--workers', '1', '--poll-interval', '0.1', stdout=out)
+        out.seek(0)
+        output = out.read()
+
+        job.refresh_from_db()
+        self.assertEqual((job.Status, job.Attempts), (Job.STATUS_FAILED, 2))
+        self.assertIn('Worker 0 exited with code 3, restarting in 1s', output)
+        self.assertIn('Worker 0 exited with code 3, restarting in 3s', output)
+
+
+class OrderDetailTests(TestCase):
+    def setUp(self):
+        create_store()
+
+    def test_two_queries_whatever_the_batch_size(self):
+        for order_ids in (['O003'], [f'O{i:03d}' for i in range(ORDER_COUNT)]):
+            with self.subTest(count=len(order_ids)):
+                with self.assertNumQueries(2):
+                    orders = order_details.load_orders(order_ids)
+                    rows = [(order.customer.location.Country, [item.product.ProductName for item in order.items])
+                            for order in orders]
+                self.assertEqual(len(rows), len(order_ids))
+        self.assertEqual(rows[-1], ('United States', ['Novel']))
+
+    def test_api_returns_orders_in_request_order(self):
+        payload = self.client.get('/api/orders/', {'ids': 'O002, ,O000,O002,NOPE'}).json()
+        self.assertEqual([order['id'] for order in payload['orders']], ['O002', 'O000'])
+        self.assertEqual(payload['missing'], ['NOPE'])
+        order = payload['orders'][0]
+        self.assertEqual((order['customer']['city'], order['item_count']), ('Pune', 1))
+        self.assertEqual([item['quantity'] for item in order['items']], [3])
+
+        response = self.client.post('/api/orders/', {'ids': ['O001', '  ']}, content_type='application/json')
+        self.assertEqual([order['id'] for order in response.json()['orders']], ['O001'])
+
+    def test_api_rejects_malformed_ids(self):
+        for ids in ('O001,O002;DROP', ' , ', 'x' * 21):
+            with self.subTest(ids=ids):
+                self.assertEqual(self.client.get('/api/orders/', {'ids': ids}).status_code, 400)
+        response = self.client.post('/api/orders/', {'ids': [1, 2]}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
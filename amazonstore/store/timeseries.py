@@ -0,0 +1,181 @@
+"""
+Time-series analytics over OrderItems computed in PostgreSQL window functions.
+
+One statement buckets line items by day/week/month, fills empty buckets with
+zeros over the whole requested date range, and computes moving averages, period-over-period growth and running
+totals per series.
+"""
+from datetime import date
+
+from django.db import connection
+
+from .models import Order
+
+
+GRANULARITIES = {
+    'day': '1 day',
+    'week': '1 week',
+    'month': '1 month',
+}
+
+DEFAULT_WINDOWS = {
+    'day': (7, 30),
+    'week': (4, 13),
+    'month': (3, 12),
+}
+
+MAX_WINDOW = 366
+MAX_POINTS = 5000  # per series, after gap filling
+BUCKET_DAYS = {'day': 1, 'week': 7, 'month': 28}
+
+SERIES_COLUMNS = {
+    None: "''",
+    'category': 'c."CategoryName"',
+    'brand': 'b."BrandName"',
+    'country': 'l."Country"',
+    'status': 'o."OrderStatus"',
+}
+
+FILTER_COLUMNS = {
+    'category': 'c."CategoryName"',
+    'brand': 'b."BrandName"',
+    'country': 'l."Country"',
+    'status': 'o."OrderStatus"',
+}
+
+
+class TimeSeriesError(ValueError):
+    pass
+
+
+def _build_sql(granularity, series, windows, filters, date_from, date_to):
+    where, params = [], {
+        'granularity': granularity,
+        'step': GRANULARITIES[granularity],
+        'date_from': date_from,
+        'date_to': date_to,
+    }
+    if date_from:
+        where.append('i."OrderDate" >= %(date_from)s')
+    if date_to:
+        where.append('i."OrderDate" <= %(date_to)s')
+    for name, value in filters.items():
+        where.append(f'{FILTER_COLUMNS[name]} = %({name})s')
+        params[name] = value
+
+    moving_averages = ',\n               '.join(
+        f'AVG(revenue) OVER (PARTITION BY series ORDER BY period '
+        f'ROWS BETWEEN {n - 1} PRECEDING AND CURRENT ROW) AS revenue_ma_{n}'
+        for n in windows
+    )
+
+    sql = f"""
+        WITH buckets AS (
+            SELECT date_trunc(%(granularity)s, i."OrderDate"::timestamp)::date AS period,
+                   {SERIES_COLUMNS[series]}::text AS series,
+                   COUNT(DISTINCT i."OrderID") AS orders,
+                   SUM(i."Quantity") AS units,
+                   SUM(i."LineTotal") AS revenue
+            FROM "OrderItems" i
+            JOIN "Orders" o ON o."OrderID" = i."OrderID" AND o."OrderDate" = i."OrderDate"
+            JOIN "Products" p ON p."ProductID" = i."ProductID"
+            JOIN "Categories" c ON c.id = p."CategoryID"
+            JOIN "Brands" b ON b.id = p."BrandID"
+            JOIN "Customers" cu ON cu."CustomerID" = o."CustomerID"
+            JOIN "Locations" l ON l.id = cu."LocationID"
+            {'WHERE ' + ' AND '.join(where) if where else ''}
+            GROUP BY 1, 2
+        ),
+        bounds AS (
+            -- the requested range; an open end stops at the first/last bucket with data
+            SELECT COALESCE(date_trunc(%(granularity)s, %(date_from)s::timestamp), MIN(period)::timestamp) AS lo,
+                   COALESCE(date_trunc(%(granularity)s, %(date_to)s::timestamp), MAX(period)::timestamp) AS hi
+            FROM buckets
+        ),
+        grid AS (
+            SELECT s.series, g::date AS period
+            FROM ({"SELECT ''::text AS series" if series is None else 'SELECT DISTINCT series FROM buckets'}) s
+            CROSS JOIN bounds
+            CROSS JOIN generate_series(bounds.lo, bounds.hi, %(step)s::interval) g
+        ),
+        filled AS (
+            SELECT grid.series, grid.period,
+                   COALESCE(buckets.orders, 0) AS orders,
+                   COALESCE(buckets.units, 0) AS units,
+                   COALESCE(buckets.revenue, 0) AS revenue
+            FROM grid
+            LEFT JOIN buckets USING (series, period)
+        )
+        SELECT series, period, orders, units, revenue,
+               {moving_averages},
+               revenue / NULLIF(LAG(revenue) OVER w, 0) - 1 AS growth,
+               SUM(revenue) OVER (w ROWS UNBOUNDED PRECEDING) AS cumulative_revenue
+        FROM filled
+        WINDOW w AS (PARTITION BY series ORDER BY period)
+        ORDER BY series, period
+    """
+    return sql, params
+
+
+def _number(value, digits=2):
+    return None if value is None else round(float(value), digits)
+
+
+def time_series(granularity='day', series=None, windows=None, filters=None,
+                date_from=None, date_to=None):
+    """
+    Return [{'key': series, 'points': [...]}, ...] for the requested buckets.
+
+    `filters` maps any of category/brand/country/status to a value; status
+    takes the label (e.g. 'Delivered').
+    """
+    if connection.vendor != 'postgresql':
+        raise TimeSeriesError('Time-series analytics require PostgreSQL')
+    if granularity not in GRANULARITIES:
+        raise TimeSeriesError(f'Unknown granularity: {granularity}')
+    if series not in SERIES_COLUMNS:
+        raise TimeSeriesError(f'Unknown series: {series}')
+
+    windows = tuple(sorted(set(windows or DEFAULT_WINDOWS[granularity])))
+    if any(n < 1 or n > MAX_WINDOW for n in windows):
+        raise TimeSeriesError(f'Moving average windows must be between 1 and {MAX_WINDOW}')
+
+    if date_from and date_to and date_from > date_to:
+        raise TimeSeriesError('date_from is after date_to')
+    span = (max(date_to or date.today(), date_from) - date_from).days if date_from else 0
+    if span > MAX_POINTS * BUCKET_DAYS[granularity]:
+        raise TimeSeriesError(f'Date range too long: more than {MAX_POINTS} {granularity} buckets')
+
+    filters = dict(filters or {})
+    unknown = set(filters) - set(FILTER_COLUMNS)
+    if unknown:
+        raise TimeSeriesError(f'Unknown filters: {", ".join(sorted(unknown))}')
+    if 'status' in filters:
+        if filters['status'] not in Order.ORDER_STATUS_CODES:
+            raise TimeSeriesError(f'Unknown status: {filters["status"]}')
+        filters['status'] = Order.ORDER_STATUS_CODES[filters['status']]
+
+    sql, params = _build_sql(granularity, series, windows, filters, date_from, date_to)
+    with connection.cursor() as cursor:
+        cursor.execute(sql, params)
+        columns = [col[0] for col in cursor.description]
+        rows = [dict(zip(columns, row)) for row in cursor.fetchall()]
+
+    result = {}
+    for row in rows:
+        key = row['series']
+        if series == 'status':
+            key = Order.ORDER_STATUS_LABELS.get(int(key), key)
+        point = {
+            'period': row['period'].isoformat(),
+            'orders': row['orders'],
+            'units': row['units'],
+            'revenue': _number(row['revenue']),
+            'growth': _number(row['growth'], 4),
+            'cumulative_revenue': _number(row['cumulative_revenue']),
+        }
+        for n in windows:
+            point[f'revenue_ma_{n}'] = _number(row[f'revenue_ma_{n}'])
+        result.setdefault(key, []).append(point)
+
+    return [{'key': key, 'points': points} for key, points in result.items()]
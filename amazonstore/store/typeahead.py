@@ -0,0 +1,167 @@
+"""
+Process-local prefix indexes for product and customer typeahead.
+
+Saves in this process update the index in place once they commit. Writes
+from other processes (imports, job workers, other web workers) move the
+typeahead DataVersion stamp instead; each index compares the stamp at most
+every TYPEAHEAD_CHECK_SECONDS and rebuilds when it changed.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right
+
+from django.conf import settings
+
+from . import versioning
+from .models import Customer, Product
+
+
+MAX_ENTRIES = getattr(settings, 'TYPEAHEAD_MAX_ENTRIES', 500_000)
+MAX_KEY_LENGTH = getattr(settings, 'TYPEAHEAD_MAX_KEY_LENGTH', 64)
+CHECK_INTERVAL = getattr(settings, 'TYPEAHEAD_CHECK_SECONDS', 5)
+DEFAULT_LIMIT = 10
+MAX_LIMIT = 50
+
+
+def normalize(value):
+    return ' '.join((value or '').split()).casefold()[:MAX_KEY_LENGTH]
+
+
+class PrefixIndex:
+    """Sorted-array prefix index: parallel lists searched with bisect."""
+
+    __slots__ = (
+        'model', 'name_field', '_keys', '_names', '_ids', '_key_by_id', '_lock',
+        'version', 'checked_at',
+    )
+
+    def __init__(self, model, name_field):
+        self.model = model
+        self.name_field = name_field
+        self._keys = []
+        self._names = []
+        self._ids = []
+        self._key_by_id = {}
+        self._lock = threading.RLock()
+        self.version = None
+        self.checked_at = 0.0
+
+    def __len__(self):
+        return len(self._keys)
+
+    @property
+    def built(self):
+        return self.version is not None
+
+    def build(self, version):
+        rows = (
+            self.model.objects
+            .order_by()
+            .values_list('pk', self.name_field)
+            .iterator(chunk_size=5000)
+        )
+        entries = []
+        for pk, name in rows:
+            if len(entries) >= MAX_ENTRIES:
+                break
+            entries.append((normalize(name), name, pk))
+        entries.sort()
+
+        with self._lock:
+            self._keys = [key for key, _, _ in entries]
+            self._names = [name for _, name, _ in entries]
+            self._ids = [pk for _, _, pk in entries]
+            self._key_by_id = {pk: key for key, _, pk in entries}
+            self.version = version
+
+    def refresh(self, force=False):
+        now = time.monotonic()
+        if not force and self.built and now - self.checked_at < CHECK_INTERVAL:
+            return self
+        with self._lock:
+            # read before the rows, so a write racing the build triggers another one
+            version = versioning.get_data_version(versioning.TYPEAHEAD_ID).Version
+            if force or version != self.version:
+                self.build(version)
+            self.checked_at = now
+        return self
+
+    def _position(self, key, pk):
+        lo = bisect_left(self._keys, key)
+        hi = bisect_right(self._keys, key, lo)
+        for i in range(lo, hi):
+            if self._ids[i] == pk:
+                return i
+        return None
+
+    def add(self, pk, name):
+        if not self.built:
+            return
+        with self._lock:
+            self._discard(pk)
+            if len(self._keys) >= MAX_ENTRIES:
+                return
+            key = normalize(name)
+            i = bisect_right(self._keys, key)
+            self._keys.insert(i, key)
+            self._names.insert(i, name)
+            self._ids.insert(i, pk)
+            self._key_by_id[pk] = key
+
+    def remove(self, pk):
+        if not self.built:
+            return
+        with self._lock:
+            self._discard(pk)
+
+    def _discard(self, pk):
+        key = self._key_by_id.pop(pk, None)
+        if key is None:
+            return
+        i = self._position(key, pk)
+        if i is not None:
+            del self._keys[i]
+            del self._names[i]
+            del self._ids[i]
+
+    def complete(self, prefix, limit=DEFAULT_LIMIT):
+        self.refresh()
+        prefix = normalize(prefix)
+        if not prefix:
+            return []
+
+        results = []
+        with self._lock:
+            i = bisect_left(self._keys, prefix)
+            end = len(self._keys)
+            while i < end and len(results) < limit and self._keys[i].startswith(prefix):
+                results.append({'id': self._ids[i], 'name': self._names[i]})
+                i += 1
+        return results
+
+
+INDEXES = {
+    'products': PrefixIndex(Product, 'ProductName'),
+    'customers': PrefixIndex(Customer, 'CustomerName'),
+}
+
+MODEL_INDEXES = {
+    Product: INDEXES['products'],
+    Customer: INDEXES['customers'],
+}
+
+
+def get_index(kind):
+    return INDEXES.get(kind)
+
+
+def notify_saved(instance):
+    index = MODEL_INDEXES.get(type(instance))
+    if index is not None:
+        index.add(instance.pk, getattr(instance, index.name_field))
+
+
+def notify_deleted(model, pk):
+    index = MODEL_INDEXES.get(model)
+    if index is not None:
+        index.remove(pk)
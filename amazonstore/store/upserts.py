@@ -0,0 +1,64 @@
+"""
+INSERT ... ON CONFLICT DO UPDATE for running totals.
+
+bulk_create(update_conflicts=True) can only overwrite a conflicting row with
+the new values; totals need the new values folded into the stored ones in
+the same statement, so concurrent writers never lose each other's deltas or
+trip over a row the other one inserted first. PostgreSQL and SQLite both
+accept this syntax.
+"""
+from django.db import connection
+
+
+ADD = '{old} + {new}'
+MIN = 'CASE WHEN {old} IS NULL OR {new} < {old} THEN {new} ELSE {old} END'
+MAX = 'CASE WHEN {old} IS NULL OR {new} > {old} THEN {new} ELSE {old} END'
+
+
+def qn(name):
+    return connection.ops.quote_name(name)
+
+
+def upsert(model, unique_fields, rows, merge, batch_size=500):
+    """
+    Insert rows ({field name: value}) into model's table, merging into rows that
+    already exist for unique_fields as {field name: ADD | MIN | MAX}.
+
+    Rows are written in unique-key order, so concurrent callers lock existing
+    rows in the same order. Returns the number of rows written.
+    """
+    rows = list(rows)
+    if not rows:
+        return 0
+
+    opts = model._meta
+    names = list(unique_fields) + list(merge)
+    fields = [opts.get_field(name) for name in names]
+    table = qn(opts.db_table)
+    values = sorted(
+        ([field.get_db_prep_save(row[field.name], connection) for field in fields] for row in rows),
+        key=lambda row: row[:len(unique_fields)],
+    )
+    updates = ', '.join(
+        '{col} = {expr}'.format(col=qn(field.column), expr=merge[field.name].format(
+            old=f'{table}.{qn(field.column)}', new=f'EXCLUDED.{qn(field.column)}',
+        ))
+        for field in fields[len(unique_fields):]
+    )
+    placeholder = '(' + ', '.join(['%s'] * len(fields)) + ')'
+
+    with connection.cursor() as cursor:
+        for i in range(0, len(values), batch_size):
+            batch = values[i:i + batch_size]
+            cursor.execute(
+                'INSERT INTO {table} ({columns}) VALUES {rows} '
+                'ON CONFLICT ({unique}) DO UPDATE SET {updates}'.format(
+                    table=table,
+                    columns=', '.join(qn(field.column) for field in fields),
+                    rows=', '.join([placeholder] * len(batch)),
+                    unique=', '.join(qn(field.column) for field in fields[:len(unique_fields)]),
+                    updates=updates,
+                ),
+                [value for row in batch for value in row],
+            )
+    return len(values)
@@ -0,0 +1,92 @@
+import threading
+from contextlib import contextmanager
+from functools import partial
+
+from django.db import transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .models import DataVersion
+
+
+# DataVersions rows: the store-wide stamp and narrower ones for the
+# Brand/Category/Seller dimension tables (see store.dimensions) and the
+# Product/Customer names behind typeahead (see store.typeahead)
+SINGLETON_ID = 1
+DIMENSIONS_ID = 2
+TYPEAHEAD_ID = 3
+
+_state = threading.local()
+
+
+def get_data_version(stamp=SINGLETON_ID):
+    """Return the current DataVersion row, creating it on first use."""
+    version, _ = DataVersion.objects.get_or_create(
+        pk=stamp, defaults={'Version': 0, 'UpdatedAt': timezone.now()}
+    )
+    return version
+
+
+def bump_data_version(stamp=SINGLETON_ID):
+    now = timezone.now()
+    updated = DataVersion.objects.filter(pk=stamp).update(
+        Version=F('Version') + 1, UpdatedAt=now
+    )
+    if not updated:
+        DataVersion.objects.get_or_create(
+            pk=stamp, defaults={'Version': 1, 'UpdatedAt': now}
+        )
+
+
+def is_batched():
+    return getattr(_state, 'dirty', None) is not None
+
+
+@contextmanager
+def batch():
+    """Coalesce the bumps of every write made inside the block into one per stamp."""
+    if is_batched():
+        yield
+        return
+
+    _state.dirty = set()
+    try:
+        yield
+        dirty = _state.dirty
+    finally:
+        _state.dirty = None
+
+    for stamp in sorted(dirty):
+        transaction.on_commit(partial(bump_data_version, stamp))
+
+
+def data_changed(stamp=SINGLETON_ID):
+    if is_batched():
+        _state.dirty.add(stamp)
+    else:
+        transaction.on_commit(partial(bump_data_version, stamp))
+
+
+def _request_version(request):
+    if not hasattr(request, '_data_version'):
+        request._data_version = get_data_version()
+    return request._data_version
+
+
+def version_tag(version=None):
+    version = version or get_data_version()
+    return f'v{version.Version}'
+
+
+def request_version_tag(request):
+    return version_tag(_request_version(request))
+
+
+def etag(request, *args, **kwargs):
+    # weak: a version's gzip snapshot, identity snapshot and live render carry
+    # the same data but not the same bytes (RFC 9110 section 8.8.3)
+    return f'W/"{request_version_tag(request)}"'
+
+
+def last_modified(request, *args, **kwargs):
+    return _request_version(request).UpdatedAt
@@ -1,12 +1,37 @@
-from django.shortcuts import render
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404, render
+from django.views.decorators.cache import cache_control
+from django.views.decorators.csrf import csrf_exempt
+from django.views.decorators.http import condition, require_http_methods
+from django.views.decorators.vary import vary_on_headers
 from django.core.paginator import Paginator
 from django.db.models import Count, Sum, Avg, Max, Min
 from django.db.models.functions import TruncMonth
+import json
+import os
 from datetime import datetime
 from .models import (
     Customer, Seller, Brand, Category, Product, 
-    ProductSeller, Order, OrderItem
+    ProductSeller, Order, OrderItem, Job
 )
+from . import jobs as job_queue
+from . import archive, catalog, dimensions, leaderboards, order_details, sketches, snapshots, timeseries, versioning
+from . import typeahead as typeahead_index
+from .db_pool import pool_stats
+
+
+def data_versioned(view):
+    # ETag/Last-Modified come from the store-wide DataVersion, so a matching
+    # conditional GET gets a 304 before any dashboard query runs
+    view = condition(etag_func=versioning.etag, last_modified_func=versioning.last_modified)(view)
+    view = cache_control(
+        public=True,
+        must_revalidate=True,
+        max_age=getattr(settings, 'DASHBOARD_CACHE_MAX_AGE', 0),
+    )(view)
+    # snapshots come gzipped or not depending on the request
+    return vary_on_headers('Accept-Encoding')(view)
 
 
 def format_currency(value):
@@ -27,11 +52,31 @@ def get_order_status_badge(status):
     return f'<span class="status-badge {badge_class.get(status, "status-returned")}">{status}</span>'
 
 
-def index(request):
-    page_customers = request.GET.get('page_customers', 1)
-    page_orders = request.GET.get('page_orders', 1)
-    page_products = request.GET.get('page_products', 1)
-    page_sellers = request.GET.get('page_sellers', 1)
+def parse_date_param(value):
+    try:
+        return datetime.strptime(value, '%Y-%m-%d').date()
+    except (TypeError, ValueError):
+        return None
+
+
+def order_date_filter(date_from, date_to, field='OrderDate'):
+    # Bounded ranges on OrderDate let PostgreSQL prune Orders/OrderItems partitions
+    filters = {}
+    if date_from:
+        filters[f'{field}__gte'] = date_from
+    if date_to:
+        filters[f'{field}__lte'] = date_to
+    return filters
+
+
+def build_index_context(params):
+    page_customers = params.get('page_customers', 1)
+    page_orders = params.get('page_orders', 1)
+    page_products = params.get('page_products', 1)
+    page_sellers = params.get('page_sellers', 1)
+    date_from = parse_date_param(params.get('date_from'))
+    date_to = parse_date_param(params.get('date_to'))
+    include_archive = params.get('include_archive') == '1'
     
     items_per_page = 20
     
@@ -44,63 +89,80 @@ def index(request):
         extra_params['page_products'] = page_products
     if page_sellers != '1':
         extra_params['page_sellers'] = page_sellers
+    if date_from:
+        extra_params['date_from'] = date_from.isoformat()
+    if date_to:
+        extra_params['date_to'] = date_to.isoformat()
+    if include_archive:
+        extra_params['include_archive'] = '1'
+    
+    orders_scope = Order.objects.filter(**order_date_filter(date_from, date_to))
     
-    customers_all = Customer.objects.all().order_by('CustomerID')
+    customers_all = Customer.objects.select_related('location').order_by('CustomerID')
     customers_paginator = Paginator(customers_all, items_per_page)
     customers_page = customers_paginator.get_page(page_customers)
     
     customers_data = {
         'headers': ['ID', 'Name', 'City', 'Country'],
         'rows': [
-            [customer.CustomerID, customer.CustomerName, customer.City, customer.Country]
+            [customer.CustomerID, customer.CustomerName, customer.location.City, customer.location.Country]
             for customer in customers_page
         ],
         'page_obj': customers_page,
         'extra_params': {k: v for k, v in extra_params.items() if k != 'page_customers'}
     }
     
-    sellers_all = Seller.objects.all().order_by('SellerID')
-    sellers_paginator = Paginator(sellers_all, items_per_page)
+    dims = dimensions.get()
+    
+    sellers_paginator = Paginator(dims.sellers, items_per_page)
     sellers_page = sellers_paginator.get_page(page_sellers)
     
     sellers_data = {
         'headers': ['Seller ID', 'Name'],
         'rows': [
-            [seller.SellerID, seller.SellerName or f"Seller {seller.SellerID}"]
-            for seller in sellers_page
+            [seller_id, seller_name]
+            for seller_id, seller_name in sellers_page
         ],
         'page_obj': sellers_page,
         'extra_params': {k: v for k, v in extra_params.items() if k != 'page_sellers'}
     }
     
-    products_all = Product.objects.select_related('Brand', 'Category').all().order_by('ProductID')
+    products_all = Product.objects.values_list(
+        'ProductID', 'ProductName', 'Brand_id', 'Category_id'
+    ).order_by('ProductID')
     products_paginator = Paginator(products_all, items_per_page)
     products_page = products_paginator.get_page(page_products)
     
     products_data = {
         'headers': ['Product ID', 'Name', 'Brand', 'Category'],
         'rows': [
-            [product.ProductID, product.ProductName, product.Brand.BrandName, product.Category.CategoryName]
-            for product in products_page
+            [product_id, product_name, dims.brands.label(brand_id), dims.categories.label(category_id)]
+            for product_id, product_name, brand_id, category_id in products_page
         ],
         'page_obj': products_page,
         'extra_params': {k: v for k, v in extra_params.items() if k != 'page_products'}
     }
     
-    orders_all = Order.objects.select_related('customer').all().order_by('-OrderDate')
+    orders_all = orders_scope.select_related('customer').all().order_by('-OrderDate')
+    if include_archive:
+        orders_all = archive.orders_including_archive(date_from, date_to)
+    else:
+        orders_all = orders_all.values_list(
+            'OrderID', 'OrderDate', 'customer__CustomerName', 'OrderStatus', 'TotalAmount'
+        )
     orders_paginator = Paginator(orders_all, items_per_page)
     orders_page = orders_paginator.get_page(page_orders)
     
 
     orders_rows = [
         [
-            order.OrderID,
-            order.OrderDate.strftime('%Y-%m-%d'),
-            order.customer.CustomerName,
-            get_order_status_badge(order.OrderStatus),
-            format_currency(order.TotalAmount) 
+            order_id,
+            order_date.strftime('%Y-%m-%d'),
+            customer_name,
+            get_order_status_badge(Order.ORDER_STATUS_LABELS.get(status)),
+            format_currency(total_amount) 
         ]
-        for order in orders_page
+        for order_id, order_date, customer_name, status, total_amount in orders_page
     ]
     
     orders_data = {
@@ -111,26 +173,30 @@ def index(request):
     }
     
     
-    order_stats = Order.objects.aggregate(
+    order_stats = orders_scope.aggregate(
         total_orders=Count('OrderID'),
         total_revenue=Sum('TotalAmount'),
         avg_order_value=Avg('TotalAmount'),
         max_order=Max('TotalAmount'),
-        min_order=Min('TotalAmount')
+        min_order=Min('TotalAmount'),
+        total_units=Sum('unit_count'),
+        avg_items=Avg('item_count'),
     )
+    order_stats = archive.merge_order_stats(order_stats, date_from, date_to)
     
     
     total_revenue_formatted = format_currency(order_stats.get('total_revenue', 0) or 0)
     avg_order_value_formatted = format_currency(order_stats.get('avg_order_value', 0) or 0)
     
    
-    status_stats_data = Order.objects.values('OrderStatus').annotate(
+    status_stats_data = orders_scope.values('OrderStatus').annotate(
         count=Count('OrderID'),
         total=Sum('TotalAmount')
     ).order_by('-count')
+    status_stats_data = archive.merge_grouped(status_stats_data, 'OrderStatus', date_from, date_to)
     
     status_stats_rows = [
-        [stat['OrderStatus'], stat['count'], format_currency(stat['total'])]
+        [Order.ORDER_STATUS_LABELS.get(stat['OrderStatus']), stat['count'], format_currency(stat['total'])]
         for stat in status_stats_data
     ]
     
@@ -140,13 +206,14 @@ def index(request):
     }
     
     
-    payment_stats_data = Order.objects.values('PaymentMethod').annotate(
+    payment_stats_data = orders_scope.values('PaymentMethod').annotate(
         count=Count('OrderID'),
         total=Sum('TotalAmount')
     ).order_by('-count')
+    payment_stats_data = archive.merge_grouped(payment_stats_data, 'PaymentMethod', date_from, date_to)
     
     payment_stats_rows = [
-        [stat['PaymentMethod'], stat['count'], format_currency(stat['total'])]
+        [Order.PAYMENT_METHOD_LABELS.get(stat['PaymentMethod']), stat['count'], format_currency(stat['total'])]
         for stat in payment_stats_data
     ]
     
@@ -156,16 +223,15 @@ def index(request):
     }
     
     
-    top_products_data = OrderItem.objects.values(
-        'product__ProductName'
-    ).annotate(
-        total_quantity=Sum('Quantity'),
-        total_revenue=Sum('LineTotal')
-    ).order_by('-total_quantity')[:10]
+    top_products_data = leaderboards.top(leaderboards.BOARD_PRODUCTS, 10, date_from, date_to)
+    product_names = dict(
+        Product.objects.filter(pk__in=[key for key, *_ in top_products_data])
+        .values_list('ProductID', 'ProductName')
+    )
     
     top_products_rows = [
-        [item['product__ProductName'], item['total_quantity'], format_currency(item['total_revenue'])]
-        for item in top_products_data
+        [product_names.get(product_id, product_id), units, format_currency(revenue)]
+        for product_id, _, units, revenue in top_products_data
     ]
     
     top_products = {
@@ -174,17 +240,17 @@ def index(request):
     }
     
     
-    top_customers_data = Order.objects.values(
-        'customer__CustomerName', 'customer__Country'
-    ).annotate(
-        total_orders=Count('OrderID'),
-        total_spent=Sum('TotalAmount')
-    ).order_by('-total_spent')[:10]
+    top_customers_data = leaderboards.top(leaderboards.BOARD_CUSTOMERS, 10, date_from, date_to)
+    customer_names = {
+        customer_id: (name, country)
+        for customer_id, name, country in Customer.objects.filter(
+            pk__in=[key for key, *_ in top_customers_data]
+        ).values_list('CustomerID', 'CustomerName', 'location__Country')
+    }
     
     top_customers_rows = [
-        [item['customer__CustomerName'], item['customer__Country'], 
-         item['total_orders'], format_currency(item['total_spent'])]
-        for item in top_customers_data
+        [*customer_names.get(customer_id, (customer_id, '')), orders, format_currency(revenue)]
+        for customer_id, orders, _, revenue in top_customers_data
     ]
     
     top_customers = {
@@ -193,12 +259,26 @@ def index(request):
     }
     
     
-    monthly_sales_data = Order.objects.annotate(
+    top_sellers_rows = [
+        [dims.sellers.label(seller_id, seller_id), units, format_currency(revenue)]
+        for seller_id, _, units, revenue in leaderboards.top(
+            leaderboards.BOARD_SELLERS, 10, date_from, date_to
+        )
+    ]
+    
+    top_sellers = {
+        'headers': ['Seller', 'Units Sold', 'Revenue'],
+        'rows': top_sellers_rows
+    }
+    
+    
+    monthly_sales_data = orders_scope.annotate(
         month=TruncMonth('OrderDate')
     ).values('month').annotate(
         orders=Count('OrderID'),
         revenue=Sum('TotalAmount')
     ).order_by('-month')[:6]
+    monthly_sales_data = archive.merge_monthly(monthly_sales_data, date_from, date_to)
     
     monthly_sales_rows = [
         [item['month'].strftime('%B %Y'), item['orders'], format_currency(item['revenue'])]
@@ -210,16 +290,29 @@ def index(request):
         'rows': monthly_sales_rows
     }
     
+    unique_buyers_rows = [
+        [month.strftime('%B %Y'), estimate]
+        for month, estimate in sketches.unique_buyers_by_month(date_from=date_from, date_to=date_to, limit=6)
+    ]
+    
+    unique_buyers = {
+        'headers': ['Month', 'Unique Customers (approx.)'],
+        'rows': unique_buyers_rows,
+        'error': f"{sketches.STANDARD_ERROR:.1%}",
+    }
+    
     context = {
         'total_customers': Customer.objects.count(),
-        'total_sellers': Seller.objects.count(),
+        'total_sellers': len(dims.sellers),
         'total_products': Product.objects.count(),
-        'total_orders': Order.objects.count(),
+        'total_orders': order_stats['total_orders'],
         'total_revenue': total_revenue_formatted,  
         'order_stats': {
             'avg_order_value': avg_order_value_formatted,  
             'max_order': format_currency(order_stats.get('max_order', 0) or 0),
             'min_order': format_currency(order_stats.get('min_order', 0) or 0),
+            'total_units': order_stats.get('total_units') or 0,
+            'avg_items': f"{order_stats.get('avg_items') or 0:.2f}",
         },
         
         'customers_data': customers_data,
@@ -231,9 +324,238 @@ def index(request):
         'payment_stats': payment_stats, 
         'top_products': top_products, 
         'top_customers': top_customers, 
+        'top_sellers': top_sellers, 
         'monthly_sales': monthly_sales, 
+        'unique_buyers': unique_buyers, 
         
-        'current_date': datetime.now().strftime('%B %d, %Y'), 
+        'date_from': date_from.isoformat() if date_from else '',
+        'date_to': date_to.isoformat() if date_to else '',
     }
     
-    return render(request, 'index.html', context)
\ No newline at end of file
+    return context
+
+
+@data_versioned
+def index(request):
+    snapshot = snapshots.find(versioning.request_version_tag(request), request.GET)
+    response = snapshots.serve(request, snapshot) if snapshot is not None else None
+    if response is not None:
+        return response
+    return render(request, 'index.html', build_index_context(request.GET))
+
+
+def typeahead(request):
+    kind = request.GET.get('kind', 'products')
+    index = typeahead_index.get_index(kind)
+    if index is None:
+        return JsonResponse({'error': f'Unknown kind: {kind}'}, status=400)
+
+    try:
+        limit = int(request.GET.get('limit', typeahead_index.DEFAULT_LIMIT))
+    except ValueError:
+        limit = typeahead_index.DEFAULT_LIMIT
+    limit = max(1, min(limit, typeahead_index.MAX_LIMIT))
+
+    query = request.GET.get('q', '')
+    return JsonResponse({
+        'kind': kind,
+        'query': query,
+        'results': index.complete(query, limit),
+    })
+
+
+@data_versioned
+def unique_buyers(request):
+    dimension = request.GET.get('dimension', sketches.DIMENSION_ALL)
+    if dimension not in (sketches.DIMENSION_ALL, sketches.DIMENSION_COUNTRY, sketches.DIMENSION_CATEGORY):
+        return JsonResponse({'error': f'Unknown dimension: {dimension}'}, status=400)
+
+    date_from = parse_date_param(request.GET.get('date_from'))
+    date_to = parse_date_param(request.GET.get('date_to'))
+    key = request.GET.get('key')
+    exact = request.GET.get('exact') == '1'
+
+    if exact:
+        counts = sketches.exact_unique_buyers(dimension, date_from, date_to, key)
+    else:
+        counts = sketches.unique_buyers(dimension, date_from, date_to, key)
+
+    return JsonResponse({
+        'dimension': dimension,
+        'exact': exact,
+        'relative_error': 0 if exact else sketches.STANDARD_ERROR,
+        'results': [
+            {'key': k, 'unique_customers': v}
+            for k, v in sorted(counts.items(), key=lambda item: -item[1])
+        ],
+    })
+
+
+@data_versioned
+def sales_timeseries(request):
+    try:
+        windows = [int(n) for n in request.GET.get('ma', '').split(',') if n]
+    except ValueError:
+        return JsonResponse({'error': 'ma must be a comma-separated list of integers'}, status=400)
+
+    granularity = request.GET.get('granularity', 'day')
+    filters = {
+        name: request.GET[name]
+        for name in timeseries.FILTER_COLUMNS
+        if request.GET.get(name)
+    }
+    try:
+        series = timeseries.time_series(
+            granularity=granularity,
+            series=request.GET.get('series') or None,
+            windows=windows,
+            filters=filters,
+            date_from=parse_date_param(request.GET.get('date_from')),
+            date_to=parse_date_param(request.GET.get('date_to')),
+        )
+    except timeseries.TimeSeriesError as e:
+        return JsonResponse({'error': str(e)}, status=400)
+
+    return JsonResponse({
+        'granularity': granularity,
+        'filters': filters,
+        'series': series,
+    })
+
+
+def job_list(request):
+    queryset = Job.objects.all()
+    status = request.GET.get('status')
+    if status:
+        queryset = queryset.filter(Status=status)
+    return JsonResponse({'jobs': [job_queue.job_to_dict(job) for job in queryset[:50]]})
+
+
+def job_detail(request, pk):
+    job = get_object_or_404(Job, pk=pk)
+    return JsonResponse(job_queue.job_to_dict(job))
+
+
+@csrf_exempt
+@require_http_methods(['GET', 'POST'])
+def orders_detail(request):
+    if request.method == 'POST':
+        try:
+            ids = json.loads(request.body or b'{}').get('ids', [])
+        except (ValueError, AttributeError):
+            return JsonResponse({'error': 'Body must be a JSON object with an "ids" list'}, status=400)
+    else:
+        ids = [pk for pk in request.GET.get('ids', '').split(',') if pk]
+
+    if not isinstance(ids, list) or not all(isinstance(pk, str) for pk in ids):
+        return JsonResponse({'error': 'ids must be a list of OrderIDs'}, status=400)
+    ids = list(dict.fromkeys(pk.strip() for pk in ids if pk.strip()))
+    invalid = [pk for pk in ids if not order_details.is_order_id(pk)]
+    if invalid:
+        return JsonResponse({'error': f'Invalid OrderIDs: {", ".join(invalid[:10])}'}, status=400)
+    if not ids:
+        return JsonResponse({'error': 'No OrderIDs given'}, status=400)
+    if len(ids) > order_details.MAX_ORDER_IDS:
+        return JsonResponse(
+            {'error': f'At most {order_details.MAX_ORDER_IDS} OrderIDs per request'}, status=400
+        )
+
+    orders, missing = order_details.order_details(ids)
+    if missing and request.GET.get('include_archive') == '1':
+        archived = archive.archived_order_dicts(missing, dimensions.get())
+        orders += [archived[pk] for pk in missing if pk in archived]
+        missing = [pk for pk in missing if pk not in archived]
+    return JsonResponse({'orders': orders, 'missing': missing})
+
+
+def page_params(params):
+    try:
+        page_size = int(params.get('page_size', catalog.DEFAULT_PAGE_SIZE))
+    except ValueError:
+        page_size = catalog.DEFAULT_PAGE_SIZE
+    return params.get('page', 1), max(1, min(page_size, catalog.MAX_PAGE_SIZE))
+
+
+def page_info(page):
+    return {
+        'number': page.number,
+        'num_pages': page.paginator.num_pages,
+        'count': page.paginator.count,
+        'has_next': page.has_next(),
+    }
+
+
+def sales_dict(sales):
+    return {
+        'orders': sales['orders'],
+        'units': sales['units'],
+        'revenue': str(sales['revenue']),
+    }
+
+
+NO_SALES = {'orders': 0, 'units': 0, 'revenue': '0.00'}
+
+
+@data_versioned
+def product_sellers(request, product_id):
+    product = get_object_or_404(Product.objects.only('ProductID', 'ProductName'), pk=product_id)
+    number, page_size = page_params(request.GET)
+    page = Paginator(
+        catalog.product_sellers(product_id, request.GET.get('include_inactive') == '1'), page_size
+    ).get_page(number)
+
+    rows = list(page)
+    sales = catalog.sales_by_seller(product_id, [seller_id for seller_id, _ in rows])
+    sellers = dimensions.get().sellers
+    return JsonResponse({
+        'product_id': product.ProductID,
+        'product_name': product.ProductName,
+        'page': page_info(page),
+        'sellers': [
+            {
+                'seller_id': seller_id,
+                'seller_name': sellers.label(seller_id),
+                'is_active': is_active,
+                **(sales_dict(sales[seller_id]) if seller_id in sales else NO_SALES),
+            }
+            for seller_id, is_active in rows
+        ],
+    })
+
+
+@data_versioned
+def seller_catalog(request, seller_id):
+    seller = get_object_or_404(Seller.objects.only('SellerID'), pk=seller_id)
+    number, page_size = page_params(request.GET)
+    page = Paginator(
+        catalog.seller_catalog(seller_id, request.GET.get('include_inactive') == '1'), page_size
+    ).get_page(number)
+
+    rows = list(page)
+    sales = catalog.sales_by_product(seller_id, [row[0] for row in rows])
+    dims = dimensions.get()
+    return JsonResponse({
+        'seller_id': seller.SellerID,
+        'seller_name': dims.sellers.label(seller.SellerID),
+        'page': page_info(page),
+        'products': [
+            {
+                'product_id': product_id,
+                'product_name': name,
+                'brand': dims.brands.label(brand_id),
+                'category': dims.categories.label(category_id),
+                'is_active': is_active,
+                **(sales_dict(sales[product_id]) if product_id in sales else NO_SALES),
+            }
+            for product_id, name, brand_id, category_id, is_active in rows
+        ],
+    })
+
+
+def db_pool(request):
+    # pools are per process, so this reports the worker that served the request
+    return JsonResponse({
+        'pid': os.getpid(),
+        'engines': {alias: settings.DATABASES[alias]['ENGINE'] for alias in settings.DATABASES},
+        'pools': pool_stats(),
+    })